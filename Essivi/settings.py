@@ -63,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'logistics.audit.AuditLogMiddleware',
 ]
 
 ROOT_URLCONF = 'Essivi.urls'
@@ -132,6 +133,9 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -143,7 +147,7 @@ AUTHENTICATION_BACKENDS = [
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -190,7 +194,7 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
     'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
     'JTI_CLAIM': 'jti',
-    'TOKEN_OBTAIN_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenObtainPairSerializer',
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.CustomTokenObtainPairSerializer',
     'TOKEN_REFRESH_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenRefreshSerializer',
     'TOKEN_VERIFY_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenVerifySerializer',
     'TOKEN_BLACKLIST_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenBlacklistSerializer',
@@ -210,6 +214,7 @@ REST_AUTH = {
     'REGISTER_SERIALIZER': 'accounts.serializers.CustomRegisterSerializer',
     'USER_DETAILS_SERIALIZER': 'accounts.serializers.CustomUserDetailsSerializer',
     'LOGIN_SERIALIZER': 'accounts.serializers.CustomLoginSerializer',
+    'JWT_TOKEN_CLAIMS_SERIALIZER': 'accounts.serializers.CustomTokenObtainPairSerializer',
 }
 
 # CORS Configuration
@@ -239,6 +244,119 @@ DEFAULT_FROM_EMAIL = 'noreply@essivi.com'
 OTP_VALIDITY_DURATION = 10 * 60  # 10 minutes
 OTP_LENGTH = 6
 
+# Pagination: page-number counts are cached for this many seconds; on
+# PostgreSQL, unfiltered tables above the threshold use the planner estimate
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+PAGINATION_APPROXIMATE_COUNT_THRESHOLD = 100000
+
+# Maximum number of GPS fixes accepted per batch upload
+GPS_BATCH_MAX_FIXES = 1000
+
+# Orders accepted by one POST /commandes/batch/ request
+COMMANDE_BATCH_MAX_SIZE = 500
+
+# Zone index: grid cell size in degrees (~1.1 km) and how often workers
+# check the shared cache for zone changes, in seconds
+ZONE_INDEX_CELL_SIZE = 0.01
+ZONE_INDEX_CHECK_INTERVAL = 5
+
+# Maximum distance in meters between a delivery's GPS fix and the client
+PROXIMITY_THRESHOLD_METERS = 2
+
+# Heatmap grid cell sizes in degrees, coarse to fine (~11 km, ~1.1 km, ~110 m),
+# and the most cells a single heatmap response may cover
+HEATMAP_CELL_SIZES = (0.1, 0.01, 0.001)
+HEATMAP_MAX_CELLS = 10000
+
+# Route planning: tricycle load capacity (in ordered units) and the depot
+# tours start from (None = the agent's current position)
+TRICYCLE_CAPACITY = 500
+DEPOT_LATITUDE = None
+DEPOT_LONGITUDE = None
+
+# Auto-dispatch (logistics.dispatch): farthest agent an order is offered to,
+# extra cost of an agent outside the client's zone (both in meters), and the
+# grid cell size used to find nearby agents, in degrees (~5.5 km)
+DISPATCH_MAX_DISTANCE_M = 10000
+DISPATCH_OUT_OF_ZONE_PENALTY_M = 2000
+DISPATCH_CELL_SIZE = 0.05
+
+# Time zone the business operates in: dashboard days and hour-of-day
+# buckets are computed in it rather than in UTC
+BUSINESS_TIME_ZONE = 'Africa/Lome'
+
+# Tagged response cache (logistics.caching): lifetime of a cached GET
+# response, in seconds; model changes evict entries earlier
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Dashboard: how long computed rankings/aggregates are cached, in seconds
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Finance: days a client has to pay a delivery, and the client types whose
+# revenue counts as wholesale (the others are tricycle sales)
+FINANCE_PAYMENT_TERMS_DAYS = 30
+FINANCE_WHOLESALE_CLIENT_TYPES = ('revendeur', 'entreprise')
+
+# JWT authentication (accounts.authentication): how long a user's active
+# flag and role are trusted before being read again, in seconds; saving the
+# user drops them at once
+AUTH_STATE_CACHE_TIMEOUT = 60
+
+# Email outbox (accounts.outbox): emails sent per send_queued_emails batch,
+# attempts before giving up, and delay before the first retry in seconds
+# (doubled on each attempt)
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+
+# Token retention (accounts.retention): rows deleted per transaction by
+# purge_tokens
+TOKEN_PURGE_CHUNK_SIZE = 5000
+
+# Audit log (logistics.audit): requests with these methods are recorded in
+# LogActivite, buffered per process and written once AUDIT_BUFFER_SIZE
+# entries are queued or the oldest is AUDIT_FLUSH_INTERVAL seconds old.
+# The age is only checked when a new entry comes in (and at exit): a worker
+# that stops receiving writes keeps its entries until then, and loses them
+# if it is killed (SIGKILL, OOM). Keep AUDIT_BUFFER_SIZE small if that matters.
+# archive_logs moves the months before the last AUDIT_RETENTION_MONTHS to
+# AUDIT_ARCHIVE_DIR.
+AUDIT_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+AUDIT_BUFFER_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 5
+AUDIT_RETENTION_MONTHS = 3
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'archives' / 'logs'
+
+# Delivery image pipeline (logistics.images): uploads are re-encoded within
+# IMAGE_MAX_DIMENSION pixels and get preview and thumbnail variants, by the
+# process_images worker, IMAGE_JOB_BATCH_SIZE images per transaction.
+IMAGE_MAX_DIMENSION = 2048
+IMAGE_PREVIEW_SIZE = 1024
+IMAGE_THUMBNAIL_SIZE = 320
+IMAGE_JPEG_QUALITY = 82
+IMAGE_JOB_BATCH_SIZE = 20
+IMAGE_JOB_MAX_ATTEMPTS = 3
+IMAGE_JOB_RETRY_DELAY = 60
+
+# Resumable uploads (logistics.uploads): chunks are assembled in
+# UPLOAD_SESSION_DIR; clients are advised to send UPLOAD_CHUNK_SIZE bytes per
+# PUT. Sessions idle for UPLOAD_SESSION_TTL seconds are purged by
+# purge_uploads.
+UPLOAD_SESSION_DIR = BASE_DIR / 'uploads'
+UPLOAD_CHUNK_SIZE = 256 * 1024
+UPLOAD_CHUNK_MAX_SIZE = 4 * 1024 * 1024
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+UPLOAD_SESSION_TTL = 24 * 3600
+
+# Proof images (logistics.media_views): 'django' streams them with range
+# support; 'x-accel-redirect' (nginx, internal location at
+# MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' (Apache)
+# hands them to the front server once access is checked. Stored names are
+# immutable, so browsers keep them for MEDIA_CACHE_MAX_AGE seconds.
+MEDIA_SERVE_MODE = 'django'
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 3600
+
 # Frontend URL for email links
 FRONTEND_URL = 'http://localhost:3000'
 
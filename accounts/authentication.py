@@ -0,0 +1,110 @@
+"""
+JWT authentication that does not load the User row on every request.
+
+Access tokens issued by CustomTokenObtainPairSerializer carry the user's
+email, user_type, is_verified and admin_role. ClaimsJWTAuthentication builds
+a ClaimsUser from them: permission checks (IsVerifiedUser, IsAdminUser...)
+and anything reading ``pk``/``id``/``email`` never touch the database, and
+the row is only fetched the first time a view reads another attribute
+(first_name, a relation, save()...).
+
+A token stays valid until it expires, so each request also checks the
+user's current state (is_active, user_type, is_verified, admin role, which
+take precedence over the claims), cached for AUTH_STATE_CACHE_TIMEOUT seconds and dropped whenever the user
+or its admin profile is saved: deactivating a user locks them out on their
+next request on a shared cache backend, and within the timeout otherwise.
+Tokens without the custom claims fall back to the regular lookup.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+STATE_PREFIX = 'accounts:auth-state:'
+
+# State fields read from the database and their ClaimsUser attribute
+STATE_FIELDS = {
+    'is_active': 'is_active',
+    'user_type': 'user_type',
+    'is_verified': 'is_verified',
+    'admin_profile__role': 'admin_role',
+}
+
+# Claims needed to authenticate without the database
+REQUIRED_CLAIMS = ('email', 'user_type', 'is_verified')
+
+
+def state_cache_key(user_id):
+    return f'{STATE_PREFIX}{user_id}'
+
+
+def forget_user_state(user_id):
+    cache.delete(state_cache_key(user_id))
+
+
+def user_state(user_id):
+    """{'is_active', 'user_type', 'is_verified', 'admin_role'} of a user, or None if it no longer exists."""
+    key = state_cache_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = get_user_model().objects.filter(pk=user_id).values_list(*STATE_FIELDS).first()
+        # Deleted users are cached too, as False, so they are not looked up on every request
+        state = dict(zip(STATE_FIELDS.values(), row)) if row else False
+        cache.set(key, state, getattr(settings, 'AUTH_STATE_CACHE_TIMEOUT', 60))
+    return state or None
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    A User known from its token claims, loaded from the database on demand.
+
+    Claim attributes live in the instance dict so reading them does not
+    trigger the load; every other attribute, method or isinstance() check
+    goes to the real User instance.
+    """
+
+    def __init__(self, user_id, email, state):
+        super().__init__(lambda: get_user_model().objects.get(pk=user_id))
+        self.__dict__.update(
+            pk=user_id, id=user_id, email=email,
+            is_authenticated=True, is_anonymous=False, **state,
+        )
+
+    def __repr__(self):
+        return f'<ClaimsUser: {self.email}>'
+
+    def __str__(self):
+        return self.email
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        return self.pk == getattr(other, 'pk', None)
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication returning a ClaimsUser for tokens carrying the custom claims."""
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in REQUIRED_CLAIMS):
+            return super().get_user(validated_token)
+        try:
+            user_id = uuid.UUID(str(validated_token[api_settings.USER_ID_CLAIM]))
+        except (KeyError, ValueError) as e:
+            raise InvalidToken('Token contained no recognizable user identification') from e
+
+        state = user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not state['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return ClaimsUser(user_id, validated_token['email'], state)
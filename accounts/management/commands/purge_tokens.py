@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from accounts.retention import purge_tokens
+
+
+class Command(BaseCommand):
+    help = 'Deletes used or expired verification, reset, OTP and JWT rows in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Rows deleted per transaction, defaults to TOKEN_PURGE_CHUNK_SIZE')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to wait between chunks')
+        parser.add_argument('--every', type=float, help='Keep running, purging every this many seconds')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] is not None and options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        if options['every'] is not None and options['every'] <= 0:
+            raise CommandError('--every must be positive')
+
+        while True:
+            reclaimed = purge_tokens(chunk_size=options['chunk_size'], pause=options['pause'])
+            for label, count in sorted(reclaimed.items()):
+                self.stdout.write(f'{label}: {count} rows deleted')
+            self.stdout.write(self.style.SUCCESS(f'Purge done: {sum(reclaimed.values())} rows reclaimed'))
+            if options['every'] is None:
+                break
+            time.sleep(options['every'])
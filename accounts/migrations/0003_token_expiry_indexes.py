@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_outboundemail'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailverification',
+            index=models.Index(fields=['expires_at'], name='accounts_em_expires_858ceb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otptoken',
+            index=models.Index(fields=['expires_at'], name='accounts_ot_expires_4348db_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordreset',
+            index=models.Index(fields=['expires_at'], name='accounts_pa_expires_b21c08_idx'),
+        ),
+        # simplejwt does not index OutstandingToken.expires_at, which purge_tokens filters on
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS token_blacklist_outstanding_expires_idx '
+            'ON token_blacklist_outstandingtoken (expires_at)',
+            'DROP INDEX IF EXISTS token_blacklist_outstanding_expires_idx',
+        ),
+    ]
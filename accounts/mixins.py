@@ -0,0 +1,103 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+class EagerLoadingMixin:
+    """
+    Derive select_related/prefetch_related from the serializer tree.
+
+    Nested serializers and dotted sources that follow a foreign key or a
+    one-to-one (forward or reverse) are joined with select_related; anything
+    reached through a to-many relation is prefetched. SerializerMethodFields
+    cannot be inspected, so a serializer lists the relations its methods read
+    in a ``related_lookups`` attribute.
+
+    Serializers whose shape depends on the request (sparse fieldsets,
+    expansion) expose an ``expansion_key`` so each shape gets its own plan.
+    """
+
+    _eager_loading_plans = {}
+
+    def get_queryset(self):
+        return self.apply_eager_loading(super().get_queryset())
+
+    def get_eager_loading_plan(self):
+        """Return the (select_related, prefetch_related) lookups for this view."""
+        serializer = self.get_serializer()
+        key = (type(serializer), getattr(serializer, 'expansion_key', None))
+        plan = self._eager_loading_plans.get(key)
+        if plan is None:
+            plan = build_eager_loading_plan(serializer)
+            self._eager_loading_plans[key] = plan
+        return plan
+
+    def apply_eager_loading(self, queryset):
+        select, prefetch = self.get_eager_loading_plan()
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+def build_eager_loading_plan(serializer):
+    """Walk a ModelSerializer (class or instance) and collect the relations it will read."""
+    if isinstance(serializer, type):
+        serializer = serializer()
+    select, prefetch = set(), set()
+    meta = getattr(serializer, 'Meta', None)
+    model = getattr(meta, 'model', None)
+    if model is not None:
+        _walk_serializer(serializer, model, '', False, select, prefetch)
+    return tuple(sorted(select)), tuple(sorted(prefetch))
+
+
+def _walk_serializer(serializer, model, prefix, through_many, select, prefetch):
+    for lookup in getattr(serializer, 'related_lookups', ()):
+        _resolve_relation(model, lookup.split('__'), prefix, through_many, select, prefetch)
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if field.source == '*':
+            if isinstance(nested, serializers.BaseSerializer):
+                _walk_serializer(nested, model, prefix, through_many, select, prefetch)
+            continue
+
+        attrs = field.source.split('.')
+        if isinstance(nested, serializers.BaseSerializer):
+            target = _resolve_relation(model, attrs, prefix, through_many, select, prefetch)
+            if target is not None:
+                _walk_serializer(nested, *target, select, prefetch)
+        elif isinstance(field, serializers.ManyRelatedField):
+            _resolve_relation(model, attrs, prefix, True, select, prefetch)
+        elif isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            _resolve_relation(model, attrs, prefix, through_many, select, prefetch)
+        elif len(attrs) > 1:
+            # e.g. source='user.email' only needs the relation, not the final attribute
+            _resolve_relation(model, attrs[:-1], prefix, through_many, select, prefetch)
+
+
+def _resolve_relation(model, attrs, prefix, through_many, select, prefetch):
+    """
+    Follow ``attrs`` across model relations, registering each hop.
+
+    Returns (related_model, lookup_prefix, through_many) for the last hop, or
+    None when the path is not made of relations (properties, methods...).
+    """
+    lookup = prefix
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not field.is_relation:
+            return None
+        lookup = f"{lookup}{attr}"
+        through_many = through_many or field.one_to_many or field.many_to_many
+        (prefetch if through_many else select).add(lookup)
+        model = field.related_model
+        lookup = f"{lookup}__"
+    return model, lookup, through_many
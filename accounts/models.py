@@ -142,6 +142,8 @@ class EmailVerification(models.Model):
         indexes = [
             models.Index(fields=['token']),
             models.Index(fields=['user']),
+            # Purge of expired rows (accounts.retention)
+            models.Index(fields=['expires_at']),
         ]
     
     def __str__(self):
@@ -182,6 +184,8 @@ class PasswordReset(models.Model):
         indexes = [
             models.Index(fields=['token']),
             models.Index(fields=['user']),
+            # Purge of expired rows (accounts.retention)
+            models.Index(fields=['expires_at']),
         ]
     
     def __str__(self):
@@ -221,6 +225,8 @@ class OTPToken(models.Model):
         indexes = [
             models.Index(fields=['user']),
             models.Index(fields=['code']),
+            # Purge of expired rows (accounts.retention)
+            models.Index(fields=['expires_at']),
         ]
     
     def __str__(self):
@@ -276,4 +282,34 @@ class AdminUser(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.name} ({self.get_role_display()})"
\ No newline at end of file
+        return f"{self.name} ({self.get_role_display()})"
+
+class OutboundEmail(models.Model):
+    """Email queued for delivery by the send_queued_emails worker."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(help_text='Recipient addresses')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} - {', '.join(self.to)}"
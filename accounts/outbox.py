@@ -0,0 +1,117 @@
+"""
+Email outbox.
+
+Views never talk to the mail server: `queue_email` stores an OutboundEmail
+row, in the caller's transaction, so an email exists exactly when the token
+or account it refers to does. The send_queued_emails worker drains due
+emails in batches over a single connection of the configured EMAIL_BACKEND.
+A failed email is retried after EMAIL_OUTBOX_RETRY_DELAY seconds, doubled
+on each attempt, and given up after EMAIL_OUTBOX_MAX_ATTEMPTS.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def build_email(subject, body, recipients, from_email=None):
+    """An unsaved OutboundEmail, for callers queueing emails with bulk_create."""
+    return OutboundEmail(
+        subject=subject, body=body, to=list(recipients),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def queue_email(subject, body, recipients, from_email=None):
+    email = build_email(subject, body, recipients, from_email)
+    email.save()
+    return email
+
+
+def verification_email(user, verification):
+    subject = 'Verify Your ESSIVI Account'
+    verification_link = f"{settings.FRONTEND_URL}/verify-email/?token={verification.token}"
+    message = f"""
+        Hello {user.first_name},
+
+        Please verify your email by clicking the link below:
+        {verification_link}
+
+        This link will expire in 24 hours.
+
+        Best regards,
+        ESSIVI Team
+        """
+    return build_email(subject, message, [verification.email])
+
+
+def queue_verification_email(user, verification):
+    email = verification_email(user, verification)
+    email.save()
+    return email
+
+
+def record_failure(row, error, now, max_attempts, retry_delay, permanent=False):
+    """
+    Count a failed attempt of a queued row (an OutboundEmail, an ImageJob...):
+    retry it ``retry_delay`` seconds later, doubled on each attempt, unless
+    the error is permanent or ``max_attempts`` is reached, which fails it.
+    """
+    row.attempts += 1
+    row.last_error = str(error)
+    if permanent or row.attempts >= max_attempts:
+        row.status = type(row).Status.FAILED
+    else:
+        row.next_attempt_at = now + timedelta(seconds=retry_delay * 2 ** (row.attempts - 1))
+
+
+def send_queued_emails(batch_size=None):
+    """Send one batch of due emails over a single connection. Returns (sent, failed)."""
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    retry = (getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5), getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60))
+    now = timezone.now()
+    sent = failed = 0
+    with transaction.atomic():
+        # Concurrent workers skip the rows another one is sending
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except (smtplib.SMTPException, OSError) as e:
+            # The server could not be reached: the whole batch is retried later
+            for email in batch:
+                record_failure(email, e, now, *retry)
+            failed = len(batch)
+        else:
+            try:
+                for email in batch:
+                    message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+                    try:
+                        message.send()
+                    except Exception as e:
+                        # Any error (BadHeaderError, encoding...) stays with its email:
+                        # raising would roll back the batch and resend the emails already sent
+                        record_failure(email, e, now, *retry)
+                        failed += 1
+                    else:
+                        email.attempts += 1
+                        email.status = OutboundEmail.Status.SENT
+                        email.sent_at = timezone.now()
+                        sent += 1
+            finally:
+                connection.close()
+
+        OutboundEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, failed
@@ -51,4 +51,4 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.user_type == 'admin':
             return True
-        return obj.user == request.user
+        return obj.user_id == request.user.pk
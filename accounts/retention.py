@@ -0,0 +1,55 @@
+"""
+Retention of short-lived authentication rows.
+
+Email verifications, password resets and OTP codes are dead once used or
+expired, and simplejwt's outstanding tokens (with their blacklist entries)
+once their expiry has passed; nothing reads them afterwards. `purge_tokens`
+deletes them in chunks of primary keys, each chunk in its own short
+transaction, so no statement holds locks on a large part of a table while
+the site keeps issuing and checking tokens. Expired rows are found through
+the expires_at indexes.
+"""
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailVerification, OTPToken, PasswordReset
+
+
+def purgeable_querysets(now):
+    """(label, queryset) pairs of the rows that can be deleted."""
+    querysets = []
+    for model in (EmailVerification, PasswordReset, OTPToken):
+        querysets.append((model._meta.label, model.objects.filter(expires_at__lt=now)))
+        querysets.append((model._meta.label, model.objects.filter(is_used=True)))
+    if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+        from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+        # Blacklist entries are deleted with their token (on_delete=CASCADE)
+        querysets.append((OutstandingToken._meta.label, OutstandingToken.objects.filter(expires_at__lt=now)))
+    return querysets
+
+
+def purge_tokens(chunk_size=None, pause=0, now=None):
+    """Delete every purgeable row. Returns {model label: rows deleted}, cascades included."""
+    chunk_size = chunk_size or getattr(settings, 'TOKEN_PURGE_CHUNK_SIZE', 5000)
+    now = now or timezone.now()
+    reclaimed = {}
+    for label, queryset in purgeable_querysets(now):
+        reclaimed.setdefault(label, 0)
+        while True:
+            pks = list(queryset.order_by().values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                _, deleted = queryset.model.objects.filter(pk__in=pks).delete()
+            for deleted_label, count in deleted.items():
+                reclaimed[deleted_label] = reclaimed.get(deleted_label, 0) + count
+            if len(pks) < chunk_size:
+                break
+            if pause:
+                # Let concurrent writers through between chunks
+                time.sleep(pause)
+    return reclaimed
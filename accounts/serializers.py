@@ -60,6 +60,9 @@ class CustomUserDetailsSerializer(UserDetailsSerializer):
     
     profile = UserProfileSerializer(read_only=True)
     admin_role = serializers.SerializerMethodField()
+
+    # Relations read by the method fields, for EagerLoadingMixin
+    related_lookups = ('admin_profile',)
     
     @extend_schema_field(serializers.CharField)
     def get_full_name(self, obj):
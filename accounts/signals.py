@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import User, UserProfile, EmailVerification
+from .authentication import forget_user_state
+from .models import User, UserProfile, EmailVerification, AdminUser
+from .outbox import queue_verification_email
 import string
 import random
 
@@ -35,7 +37,26 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def create_email_verification(sender, instance, created, **kwargs):
     """
-    Signal to create an EmailVerification token when a User is created.
+    Signal to create an EmailVerification token when a User is created
+    and queue the verification email.
     """
     if created and not instance.is_verified:
-        EmailVerification.create_for_user(instance)
+        verification = EmailVerification.create_for_user(instance)
+        queue_verification_email(instance, verification)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_auth_state(sender, instance, **kwargs):
+    """
+    Drop the cached authentication state so a deactivated user is refused
+    on their next request.
+    """
+    forget_user_state(instance.pk)
+
+
+@receiver(post_save, sender=AdminUser)
+@receiver(post_delete, sender=AdminUser)
+def forget_admin_auth_state(sender, instance, **kwargs):
+    """Drop the cached authentication state, which holds the admin role."""
+    forget_user_state(instance.user_id)
@@ -3,8 +3,26 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import EmailVerification, OTPToken
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .authentication import ClaimsJWTAuthentication
+from .models import AdminUser, EmailVerification, OTPToken, OutboundEmail, PasswordReset
+from .outbox import queue_email, send_queued_emails
+from .permissions import IsAdminUser
+from .retention import purge_tokens
+from .serializers import CustomTokenObtainPairSerializer
 import json
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
 
 User = get_user_model()
 
@@ -353,3 +371,150 @@ class AuthenticationE2ETests(TestCase):
         print(f"4. [OK] Profile accessed: {profile_response.data['data']['profile']['client_code']}")
         
         print("=== CLIENT FLOW COMPLETE ===\n")
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """Requests are authenticated from the token claims, without loading the user."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='admin@essivi.com', password='SecurePass123', user_type='admin',
+            first_name='Ada', last_name='Admin', is_verified=True
+        )
+        AdminUser.objects.create(user=self.user, name='Ada', role=AdminUser.AdminRole.GESTIONNAIRE)
+        self.token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_user_from_claims(self):
+        authentication = ClaimsJWTAuthentication()
+        with self.assertNumQueries(1):
+            authentication.authenticate(self.request)
+        with self.assertNumQueries(0):
+            user, _ = authentication.authenticate(self.request)
+            self.assertTrue(IsAdminUser().has_permission(SimpleNamespace(user=user), None))
+            self.assertEqual((user.pk, user.email, user.user_type), (self.user.pk, self.user.email, 'admin'))
+            self.assertEqual(user.admin_role, 'gestionnaire')
+            self.assertTrue(user.is_verified)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.first_name, 'Ada')
+        self.assertIsInstance(user, User)
+
+    def test_deactivation_revokes_tokens(self):
+        authentication = ClaimsJWTAuthentication()
+        authentication.authenticate(self.request)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate(self.request)
+
+    def test_login_token_carries_claims(self):
+        response = APIClient().post(
+            reverse('accounts:rest_login'), {'email': 'admin@essivi.com', 'password': 'SecurePass123'}, format='json'
+        )
+        self.assertEqual(AccessToken(response.data['access'])['admin_role'], 'gestionnaire')
+
+
+class UnreachableBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+
+class RejectingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            # Raises BadHeaderError for a subject with a newline
+            message.message()
+        return len(email_messages)
+
+
+class EmailOutboxTests(TestCase):
+    """Emails are queued with the request's writes and sent by the worker."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='agent@essivi.com', password='SecurePass123', user_type='agent',
+            first_name='John', last_name='Doe'
+        )
+
+    def test_registration_and_resend_are_queued(self):
+        self.client.post(reverse('accounts:resend_verification'), {'email': self.user.email})
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.Status.PENDING).count(), 2)
+
+        call_command('send_queued_emails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertIn(str(self.user.email_verifications.last().token), mail.outbox[0].body)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.Status.SENT).exists())
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.UnreachableBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        email = OutboundEmail.objects.get()
+        self.assertEqual(send_queued_emails(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        send_queued_emails()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.FAILED, 2))
+        self.assertIn('Connection unexpectedly closed', email.last_error)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.RejectingBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=1)
+    def test_unexpected_error_only_fails_its_email(self):
+        queue_email('Header\ninjection', 'Body', ['other@essivi.com'])
+        self.assertEqual(send_queued_emails(), (1, 1))
+        statuses = dict(OutboundEmail.objects.values_list('subject', 'status'))
+        self.assertEqual(statuses['Header\ninjection'], OutboundEmail.Status.FAILED)
+        self.assertEqual(statuses['Verify Your ESSIVI Account'], OutboundEmail.Status.SENT)
+        self.assertIn('newline', OutboundEmail.objects.get(status=OutboundEmail.Status.FAILED).last_error)
+
+
+class TokenPurgeTests(TestCase):
+    """Chunked purge of used and expired token rows."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='agent@essivi.com', password='SecurePass123', user_type='agent',
+            first_name='John', last_name='Doe'
+        )
+        now = timezone.now()
+        past, future = now - timedelta(hours=1), now + timedelta(hours=1)
+        # The signal created a live verification for the new user
+        EmailVerification.objects.create(user=self.user, email=self.user.email, expires_at=past)
+        EmailVerification.objects.create(user=self.user, email=self.user.email, expires_at=future, is_used=True)
+        for _ in range(3):
+            PasswordReset.objects.create(user=self.user, expires_at=past)
+        self.live_reset = PasswordReset.objects.create(user=self.user, expires_at=future)
+        OTPToken.objects.create(user=self.user, code='123456', expires_at=past)
+
+        self.live_refresh = RefreshToken.for_user(self.user)
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=past)
+
+    def test_purges_used_and_expired_rows_in_chunks(self):
+        reclaimed = purge_tokens(chunk_size=2)
+        self.assertEqual(reclaimed['accounts.EmailVerification'], 2)
+        self.assertEqual(reclaimed['accounts.PasswordReset'], 3)
+        self.assertEqual(reclaimed['accounts.OTPToken'], 1)
+        self.assertEqual(reclaimed['token_blacklist.OutstandingToken'], 1)
+        self.assertEqual(reclaimed['token_blacklist.BlacklistedToken'], 1)
+
+        self.assertEqual(EmailVerification.objects.count(), 1)
+        self.assertEqual(list(PasswordReset.objects.all()), [self.live_reset])
+        self.assertFalse(OTPToken.objects.exists())
+        self.assertEqual(OutstandingToken.objects.get().jti, self.live_refresh['jti'])
+        self.assertFalse(BlacklistedToken.objects.exists())
+        # Nothing left to purge
+        self.assertEqual(sum(purge_tokens().values()), 0)
+
+    def test_command_reports_reclaimed_rows(self):
+        out = StringIO()
+        call_command('purge_tokens', '--chunk-size', '1', stdout=out)
+        self.assertIn('accounts.PasswordReset: 3 rows deleted', out.getvalue())
+        self.assertIn('Purge done: 8 rows reclaimed', out.getvalue())
@@ -6,8 +6,8 @@ from dj_rest_auth.views import LoginView as DJRestAuthLoginView
 from drf_spectacular.utils import extend_schema
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 import random
 import string
 
@@ -20,7 +20,9 @@ from .serializers import (
     CustomPasswordChangeSerializer, SendOTPSerializer, VerifyOTPSerializer,
     AdminUserSerializer, AdminUserCreateSerializer
 )
+from .outbox import queue_email, queue_verification_email
 from .permissions import IsVerifiedUser, IsAdminUser, IsAgentUser, IsClientUser
+from .mixins import EagerLoadingMixin
 
 User = get_user_model()
 
@@ -34,9 +36,10 @@ class RegisterView(APIView):
         serializer = CustomRegisterSerializer(data=request.data)
         if serializer.is_valid():
             try:
-                user = serializer.save()
+                with transaction.atomic():
+                    user = serializer.save()
                 
-                # Verification email will be sent by signal
+                # Verification email is queued by signal
                 return Response({
                     'status': 'success',
                     'message': 'Registration successful. Please check your email to verify your account.',
@@ -113,11 +116,10 @@ class ResendVerificationEmailView(APIView):
             try:
                 user = User.objects.get(email=serializer.validated_data['email'])
                 
-                # Create new verification token
-                verification = EmailVerification.create_for_user(user)
-                
-                # Send verification email
-                self._send_verification_email(user, verification)
+                # Create new verification token and queue the email with it
+                with transaction.atomic():
+                    verification = EmailVerification.create_for_user(user)
+                    queue_verification_email(user, verification)
                 
                 return Response({
                     'status': 'success',
@@ -134,23 +136,6 @@ class ResendVerificationEmailView(APIView):
             'message': 'Failed to resend verification email',
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
-    
-    def _send_verification_email(self, user, verification):
-        """Send verification email to user."""
-        subject = 'Verify Your ESSIVI Account'
-        verification_link = f"{settings.FRONTEND_URL}/verify-email/?token={verification.token}"
-        message = f"""
-        Hello {user.first_name},
-        
-        Please verify your email by clicking the link below:
-        {verification_link}
-        
-        This link will expire in 24 hours.
-        
-        Best regards,
-        ESSIVI Team
-        """
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
 
 class PasswordResetRequestView(APIView):
@@ -170,11 +155,10 @@ class PasswordResetRequestView(APIView):
         try:
             user = User.objects.get(email=email)
             
-            # Create password reset token
-            reset_token = PasswordReset.create_for_user(user)
-            
-            # Send password reset email
-            self._send_password_reset_email(user, reset_token)
+            # Create password reset token and queue the email with it
+            with transaction.atomic():
+                reset_token = PasswordReset.create_for_user(user)
+                self._queue_password_reset_email(user, reset_token)
             
             return Response({
                 'status': 'success',
@@ -187,8 +171,8 @@ class PasswordResetRequestView(APIView):
                 'message': 'If the email exists, you will receive a password reset link.'
             }, status=status.HTTP_200_OK)
     
-    def _send_password_reset_email(self, user, reset_token):
-        """Send password reset email to user."""
+    def _queue_password_reset_email(self, user, reset_token):
+        """Queue password reset email to user."""
         subject = 'Reset Your ESSIVI Password'
         reset_link = f"{settings.FRONTEND_URL}/reset-password/?token={reset_token.token}"
         message = f"""
@@ -204,7 +188,7 @@ class PasswordResetRequestView(APIView):
         Best regards,
         ESSIVI Team
         """
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        queue_email(subject, message, [user.email])
 
 
 class PasswordResetConfirmView(APIView):
@@ -271,19 +255,18 @@ class SendOTPView(APIView):
         # Generate OTP
         otp_code = generate_otp()
         
-        # Create OTP token
-        otp_token = OTPToken.create_for_user(user, otp_code)
-        
-        # Send OTP via email
-        self._send_otp_email(user, otp_code)
+        # Create OTP token and queue the email with it
+        with transaction.atomic():
+            otp_token = OTPToken.create_for_user(user, otp_code)
+            self._queue_otp_email(user, otp_code)
         
         return Response({
             'status': 'success',
             'message': 'OTP sent to your email.'
         }, status=status.HTTP_200_OK)
     
-    def _send_otp_email(self, user, code):
-        """Send OTP via email."""
+    def _queue_otp_email(self, user, code):
+        """Queue OTP email."""
         subject = 'Your ESSIVI 2FA Code'
         message = f"""
         Hello {user.first_name},
@@ -297,7 +280,7 @@ class SendOTPView(APIView):
         Best regards,
         ESSIVI Team
         """
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        queue_email(subject, message, [user.email])
 
 
 class VerifyOTPView(APIView):
@@ -331,7 +314,7 @@ class VerifyOTPView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for user management.
     - Authenticated users can view/update their own profile
@@ -343,9 +326,10 @@ class UserViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return only verified users, or all users if admin."""
+        queryset = super().get_queryset()
         if self.request.user.user_type == 'admin':
-            return User.objects.all()
-        return User.objects.filter(is_verified=True)
+            return queryset
+        return queryset.filter(is_verified=True)
 
     def retrieve(self, request, *args, **kwargs):
         """Allow users to view their own profile."""
@@ -359,7 +343,8 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated, IsVerifiedUser])
     def me(self, request):
         """Get current user profile."""
-        serializer = self.get_serializer(request.user)
+        # request.user is built from the token claims: load the row with its relations in one query
+        serializer = self.get_serializer(self.get_queryset().get(pk=request.user.pk))
         return Response({
             'status': 'success',
             'data': serializer.data
@@ -382,20 +367,16 @@ class UserViewSet(viewsets.ModelViewSet):
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
-class AdminUserViewSet(viewsets.ModelViewSet):
+class AdminUserViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet for managing admin users."""
     
+    queryset = AdminUser.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
     filter_backends = [__import__('rest_framework.filters', fromlist=['SearchFilter']).SearchFilter]
     search_fields = ['name', 'user__email', 'role']
     ordering_fields = ['created_at', 'name', 'role', 'status']
     ordering = ['-created_at']
     
-    def get_queryset(self):
-        """Get admin users queryset."""
-        from .models import AdminUser
-        return AdminUser.objects.all()
-    
     def get_serializer_class(self):
         """Return serializer based on action."""
         from .serializers import AdminUserSerializer, AdminUserCreateSerializer
@@ -415,10 +396,9 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def by_role(self, request):
         """Get admins filtered by role."""
-        from .models import AdminUser
         role = request.query_params.get('role')
         if role:
-            admins = AdminUser.objects.filter(role=role)
+            admins = self.get_queryset().filter(role=role)
             serializer = self.get_serializer(admins, many=True)
             return Response({
                 'status': 'success',
@@ -432,10 +412,9 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def by_status(self, request):
         """Get admins filtered by status."""
-        from .models import AdminUser
         admin_status = request.query_params.get('status')
         if admin_status:
-            admins = AdminUser.objects.filter(status=admin_status)
+            admins = self.get_queryset().filter(status=admin_status)
             serializer = self.get_serializer(admins, many=True)
             return Response({
                 'status': 'success',
@@ -0,0 +1,29 @@
+from django.contrib import admin
+from .models import AgentDailyRollup, ClientDailyRollup, DailyStatusRollup, HourlyZoneRollup, ZoneDailyRollup
+
+@admin.register(DailyStatusRollup)
+class DailyStatusRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'statut', 'deliveries_count', 'validated_count', 'quantity', 'amount')
+    list_filter = ('statut', 'day')
+
+@admin.register(AgentDailyRollup)
+class AgentDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'agent', 'statut', 'deliveries_count', 'quantity', 'amount')
+    list_filter = ('statut', 'day')
+    raw_id_fields = ('agent',)
+
+@admin.register(ClientDailyRollup)
+class ClientDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'client', 'statut', 'deliveries_count', 'quantity', 'amount')
+    list_filter = ('statut', 'day')
+    raw_id_fields = ('client',)
+
+@admin.register(ZoneDailyRollup)
+class ZoneDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'zone', 'statut', 'deliveries_count', 'quantity', 'amount')
+    list_filter = ('statut', 'zone', 'day')
+
+@admin.register(HourlyZoneRollup)
+class HourlyZoneRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'hour', 'zone', 'statut', 'deliveries_count', 'quantity', 'amount')
+    list_filter = ('statut', 'zone', 'day')
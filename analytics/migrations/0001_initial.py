@@ -0,0 +1,77 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('logistics', '0005_heatmapcell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('statut', models.CharField(choices=[('en_preparation', 'En Préparation'), ('en_route', 'En Route'), ('livre', 'Livré'), ('echec', 'Échec')], max_length=20)),
+                ('deliveries_count', models.IntegerField(default=0)),
+                ('validated_count', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'statut'), name='dailystatusrollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ZoneDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('statut', models.CharField(choices=[('en_preparation', 'En Préparation'), ('en_route', 'En Route'), ('livre', 'Livré'), ('echec', 'Échec')], max_length=20)),
+                ('deliveries_count', models.IntegerField(default=0)),
+                ('validated_count', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('zone', models.CharField(help_text='Client zone at the time of the delivery', max_length=50)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'zone', 'statut'), name='zonedailyrollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('statut', models.CharField(choices=[('en_preparation', 'En Préparation'), ('en_route', 'En Route'), ('livre', 'Livré'), ('echec', 'Échec')], max_length=20)),
+                ('deliveries_count', models.IntegerField(default=0)),
+                ('validated_count', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('agent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='logistics.agentcommercial')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'agent', 'statut'), name='agentdailyrollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClientDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('statut', models.CharField(choices=[('en_preparation', 'En Préparation'), ('en_route', 'En Route'), ('livre', 'Livré'), ('echec', 'Échec')], max_length=20)),
+                ('deliveries_count', models.IntegerField(default=0)),
+                ('validated_count', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='logistics.client')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'client', 'statut'), name='clientdailyrollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='zonedailyrollup',
+            name='zone',
+            field=models.CharField(blank=True, help_text='Client zone at the time of the delivery, empty if none', max_length=50),
+        ),
+        migrations.CreateModel(
+            name='HourlyZoneRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('statut', models.CharField(choices=[('en_preparation', 'En Préparation'), ('en_route', 'En Route'), ('livre', 'Livré'), ('echec', 'Échec')], max_length=20)),
+                ('deliveries_count', models.IntegerField(default=0)),
+                ('validated_count', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('zone', models.CharField(blank=True, help_text='Client zone at the time of the delivery, empty if none', max_length=50)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'hour', 'zone', 'statut'), name='hourlyzonerollup_unique')],
+            },
+        ),
+    ]
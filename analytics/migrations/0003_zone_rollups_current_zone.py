@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_hourlyzonerollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='zonedailyrollup',
+            name='zone',
+            field=models.CharField(blank=True, help_text="Current zone of the delivery's client, empty if none", max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='hourlyzonerollup',
+            name='zone',
+            field=models.CharField(blank=True, help_text="Current zone of the delivery's client, empty if none", max_length=50),
+        ),
+    ]
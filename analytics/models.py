@@ -0,0 +1,76 @@
+from django.db import models
+
+from logistics.models import AgentCommercial, Client, Livraison
+
+
+class DailyRollup(models.Model):
+    """Per-day delivery totals, maintained incrementally from Livraison"""
+    day = models.DateField()
+    statut = models.CharField(max_length=20, choices=Livraison.Status.choices)
+    deliveries_count = models.IntegerField(default=0)
+    validated_count = models.IntegerField(default=0)
+    quantity = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailyStatusRollup(DailyRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'statut'], name='dailystatusrollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.statut}"
+
+
+class AgentDailyRollup(DailyRollup):
+    agent = models.ForeignKey(AgentCommercial, on_delete=models.CASCADE, related_name='daily_rollups')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'agent', 'statut'], name='agentdailyrollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.agent_id} {self.statut}"
+
+
+class ClientDailyRollup(DailyRollup):
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='daily_rollups')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'client', 'statut'], name='clientdailyrollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.client_id} {self.statut}"
+
+
+class ZoneDailyRollup(DailyRollup):
+    zone = models.CharField(max_length=50, blank=True, help_text="Current zone of the delivery's client, empty if none")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'zone', 'statut'], name='zonedailyrollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.zone} {self.statut}"
+
+
+class HourlyZoneRollup(DailyRollup):
+    """Hour-of-day x zone histogram of one day, in BUSINESS_TIME_ZONE"""
+    hour = models.PositiveSmallIntegerField()
+    zone = models.CharField(max_length=50, blank=True, help_text="Current zone of the delivery's client, empty if none")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'hour', 'zone', 'statut'], name='hourlyzonerollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.hour:02d}h {self.zone} {self.statut}"
@@ -0,0 +1,89 @@
+"""
+Agent performance ranking for the production report.
+
+One grouped query sums each agent's delivered rollup rows over the period;
+tiers are then assigned in a single NumPy pass from each agent's percentile
+rank on total amount (ties share a rank). Agents without deliveries are
+always "Faible". Results are cached per period and day until a delivery
+or an agent changes.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from logistics.caching import cached, counter
+from logistics.models import AgentCommercial, Livraison
+
+from .rollups import business_timezone
+
+# Minimum percentile rank for each tier, best first
+TIERS = (
+    (0.9, 'Top Performer'),
+    (0.75, 'Excellent'),
+    (0.5, 'Bon'),
+    (0.25, 'Moyen'),
+)
+LOWEST_TIER = 'Faible'
+
+CACHE_NAME = counter('analytics.agent_performance')
+
+
+def percentile_ranks(values):
+    """Share of the other values strictly below each value (1.0 for a single value)."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return np.ones(len(values))
+    below = np.searchsorted(np.sort(values), values, side='left')
+    return below / (len(values) - 1)
+
+
+def assign_tiers(amounts, counts):
+    ranks = percentile_ranks(amounts)
+    thresholds = np.array([threshold for threshold, _ in TIERS])
+    labels = np.array([label for _, label in TIERS] + [LOWEST_TIER])
+    # Index of the first threshold the rank reaches, len(TIERS) if none
+    tiers = labels[(ranks[:, None] < thresholds[None, :]).sum(axis=1)] if len(ranks) else labels[:0]
+    return np.where(np.asarray(counts) > 0, tiers, LOWEST_TIER)
+
+
+def agent_performance(period_days, today=None):
+    today = today or timezone.localdate(timezone=business_timezone())
+    return cached(
+        CACHE_NAME, f'{period_days}:{today.isoformat()}', ('Livraison', 'AgentCommercial'),
+        lambda: compute_agent_performance(period_days, today), getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+    )
+
+
+def compute_agent_performance(period_days, today):
+    delivered = Q(
+        daily_rollups__statut=Livraison.Status.LIVRE,
+        daily_rollups__day__gt=today - timedelta(days=period_days),
+        daily_rollups__day__lte=today,
+    )
+    rows = list(
+        AgentCommercial.objects.annotate(
+            deliveries_count=Coalesce(Sum('daily_rollups__deliveries_count', filter=delivered), Value(0)),
+            quantity_delivered=Coalesce(Sum('daily_rollups__quantity', filter=delivered), Value(0)),
+            total_amount=Sum('daily_rollups__amount', filter=delivered),
+        ).values_list('id', 'prenom', 'nom', 'deliveries_count', 'quantity_delivered', 'total_amount')
+    )
+    amounts = [float(row[5] or 0) for row in rows]
+    tiers = assign_tiers(amounts, [row[3] for row in rows])
+
+    ranking = [
+        {
+            'agent_id': str(agent_id),
+            'agent_name': f"{prenom} {nom}",
+            'deliveries_count': count,
+            'quantity_delivered': quantity,
+            'total_amount': amount or 0,
+            'status': str(tier),
+        }
+        for (agent_id, prenom, nom, count, quantity, amount), tier in zip(rows, tiers)
+    ]
+    ranking.sort(key=lambda row: (row['total_amount'], row['deliveries_count']), reverse=True)
+    return ranking
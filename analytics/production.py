@@ -0,0 +1,59 @@
+"""
+Peak hours and top zones for the statistics tab.
+
+Both charts merge the per-day HourlyZoneRollup histograms of the period
+with one grouped query each, so the cost depends on days x active hours x
+zones rather than on the number of deliveries; a 365-day request reads the
+same kind of rows as a 30-day one. Results are cached per period and day
+until a delivery or a zone changes.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from logistics.caching import cached, counter
+from logistics.models import Livraison, Zone
+
+from .models import DailyStatusRollup, HourlyZoneRollup
+from .rollups import business_timezone
+
+TOP_ZONES_LIMIT = 10
+
+CACHE_NAME = counter('analytics.production_charts')
+
+
+def production_charts(period_days, today=None):
+    today = today or timezone.localdate(timezone=business_timezone())
+    return cached(
+        CACHE_NAME, f'{period_days}:{today.isoformat()}', ('Livraison', 'Zone'),
+        lambda: compute_production_charts(period_days, today), getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+    )
+
+
+def compute_production_charts(period_days, today):
+    period = {
+        'statut': Livraison.Status.LIVRE,
+        'day__gt': today - timedelta(days=period_days),
+        'day__lte': today,
+    }
+    histograms = HourlyZoneRollup.objects.filter(**period).order_by()
+
+    peak_hours = [
+        {'hour': f"{row['hour']:02d}:00", 'sales': row['sales']}
+        for row in histograms.values('hour').annotate(sales=Sum('deliveries_count')).order_by('hour')
+        if row['sales']
+    ]
+
+    zones = list(
+        histograms.exclude(zone='').values('zone').annotate(value=Sum('quantity')).order_by('-value')[:TOP_ZONES_LIMIT]
+    )
+    names = dict(Zone.objects.filter(pk__in=[row['zone'] for row in zones]).values_list('id', 'name'))
+    top_zones = [{'zone': names.get(row['zone'], row['zone']), 'value': row['value']} for row in zones]
+
+    sales_over_time = [
+        {'date': row['day'], 'sales': row['deliveries_count'], 'amount': row['amount']}
+        for row in DailyStatusRollup.objects.filter(**period).order_by('day').values('day', 'deliveries_count', 'amount')
+    ]
+    return {'peak_hours': peak_hours, 'top_zones': top_zones, 'sales_over_time': sales_over_time}
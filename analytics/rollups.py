@@ -0,0 +1,232 @@
+"""
+Daily delivery rollups.
+
+Every Livraison adds (count, validated count, quantity, amount) to one row
+of each rollup table: per day and status, per day and status for its agent,
+its client and its client's zone, and per day, hour of day, zone and status.
+Days and hours are taken in BUSINESS_TIME_ZONE. Saving or deleting a
+delivery applies the difference between its old and new contribution in
+the transaction of the save; a client changing zone moves its deliveries
+between zone rows (`move_client_zones`), so zone rollups follow the
+clients' current zones. `rebuild_rollups` recomputes a date range from
+grouped queries (e.g. after bulk updates that bypass signals).
+"""
+import zoneinfo
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+from django.utils import timezone
+
+from logistics.caching import invalidate_tags
+from logistics.counters import upsert_increment
+from logistics.models import Client, Livraison
+
+from .models import AgentDailyRollup, ClientDailyRollup, DailyStatusRollup, HourlyZoneRollup, ZoneDailyRollup
+
+Contribution = namedtuple('Contribution', 'day hour statut agent_id client_id zone quantity amount validated')
+
+# (rollup model, Contribution attributes it is keyed on besides day and statut)
+DIMENSIONS = (
+    (DailyStatusRollup, ()),
+    (AgentDailyRollup, ('agent_id',)),
+    (ClientDailyRollup, ('client_id',)),
+    (ZoneDailyRollup, ('zone',)),
+    (HourlyZoneRollup, ('hour', 'zone')),
+)
+
+SNAPSHOT_FIELDS = ('statut', 'date_heure', 'agent_id', 'client_id', 'quantite_livree', 'montant_total', 'is_validated')
+
+
+def business_timezone():
+    name = getattr(settings, 'BUSINESS_TIME_ZONE', None)
+    return zoneinfo.ZoneInfo(name) if name else timezone.get_current_timezone()
+
+
+def day_bounds(start, end):
+    """Aware datetimes bounding the business days [start, end]."""
+    tz = business_timezone()
+    return (
+        datetime.combine(start, time.min, tzinfo=tz),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def contribution(statut, date_heure, agent_id, client_id, zone, quantity, amount, validated):
+    if not statut or date_heure is None:
+        return None
+    local = timezone.localtime(date_heure, business_timezone())
+    return Contribution(
+        local.date(), local.hour, statut, agent_id, client_id, zone or '',
+        quantity or 0, Decimal(amount or 0), bool(validated)
+    )
+
+
+def client_zone(livraison, client_id):
+    """Zone of a delivery's client, without loading the client when it is not cached."""
+    if client_id is None:
+        return None
+    if client_id == livraison.client_id and Livraison.client.is_cached(livraison):
+        return livraison.client.zone
+    return Client.objects.filter(pk=client_id).values_list('zone', flat=True).first()
+
+
+def snapshot(state):
+    """The fields the rollups depend on, from a delivery state of logistics.signals (or None)."""
+    if state is None:
+        return None
+    return tuple(state[field] for field in SNAPSHOT_FIELDS)
+
+
+def snapshot_contribution(state, livraison):
+    """Contribution recorded in a snapshot taken before the delivery changed."""
+    if state is None:
+        return None
+    statut, date_heure, agent_id, client_id, quantity, amount, validated = state
+    zone = client_zone(livraison, client_id)
+    return contribution(statut, date_heure, agent_id, client_id, zone, quantity, amount, validated)
+
+
+def rollup_keys(value):
+    for model, fields in DIMENSIONS:
+        key = {'day': value.day, 'statut': value.statut}
+        key.update((field, getattr(value, field)) for field in fields)
+        if None not in key.values():
+            yield model, key
+
+
+def apply_contribution(value, sign):
+    """Add (sign=1) or remove (sign=-1) a contribution from every rollup table."""
+    if value is None:
+        return
+    deltas = {
+        'deliveries_count': sign,
+        'validated_count': sign if value.validated else 0,
+        'quantity': sign * value.quantity,
+        'amount': sign * value.amount,
+    }
+    for model, key in rollup_keys(value):
+        # A missing row on removal means the agent/client is being deleted with its rollups
+        upsert_increment(model, key, deltas, create=sign > 0)
+
+
+def apply_change(old, new):
+    """Move a delivery from its old contribution to its new one, in the caller's transaction."""
+    if old == new:
+        return
+    apply_contribution(old, -1)
+    apply_contribution(new, 1)
+
+
+def totals():
+    return {
+        'count': Count('pk'),
+        'validated': Count('pk', filter=Q(is_validated=True)),
+        'total_quantity': Sum('quantite_livree'),
+        'total_amount': Sum('montant_total'),
+    }
+
+
+def move_client_zones(changes):
+    """Move the zone rollups of clients whose zone changed, given {client_id: (old_zone, new_zone)}."""
+    changes = {pk: (old or '', new or '') for pk, (old, new) in changes.items() if (old or '') != (new or '')}
+    if not changes:
+        return
+    tz = business_timezone()
+    moved = defaultdict(lambda: [0, 0, 0, Decimal(0)])
+    rows = Livraison.objects.filter(client_id__in=changes).annotate(
+        slot=TruncHour('date_heure', tzinfo=tz)
+    ).order_by().values('client_id', 'slot', 'statut').annotate(**totals())
+    for row in rows:
+        slot = timezone.localtime(row['slot'], tz)
+        values = (row['count'], row['validated'], row['total_quantity'] or 0, row['total_amount'] or 0)
+        for model, key in ((ZoneDailyRollup, ()), (HourlyZoneRollup, (('hour', slot.hour),))):
+            total = moved[(model, row['client_id'], slot.date(), row['statut'], key)]
+            for index, value in enumerate(values):
+                total[index] += value
+
+    for (model, client_id, day, statut, key), (count, validated, quantity, amount) in moved.items():
+        old, new = changes[client_id]
+        key = {'day': day, 'statut': statut, **dict(key)}
+        deltas = {'deliveries_count': count, 'validated_count': validated, 'quantity': quantity, 'amount': amount}
+        upsert_increment(model, {**key, 'zone': old}, {field: -value for field, value in deltas.items()}, create=False)
+        upsert_increment(model, {**key, 'zone': new}, deltas)
+
+
+def rebuild_rollups(start, end):
+    """Recompute every rollup table for days in [start, end]. Returns the number of rows written."""
+    tz = business_timezone()
+    since, until = day_bounds(start, end)
+    deliveries = Livraison.objects.filter(date_heure__gte=since, date_heure__lt=until).annotate(
+        day=TruncDate('date_heure', tzinfo=tz),
+        slot=TruncHour('date_heure', tzinfo=tz),
+        zone=Coalesce('client__zone', Value('')),
+    ).order_by()
+
+    written = 0
+    with transaction.atomic():
+        for model, fields in DIMENSIONS:
+            model.objects.filter(day__gte=start, day__lte=end).delete()
+            hourly = 'hour' in fields
+            group = ['slot' if hourly else 'day', 'statut'] + [field for field in fields if field != 'hour']
+            rows = []
+            for row in deliveries.values(*group).annotate(**totals()):
+                key = {field: row[field] for field in fields if field != 'hour'}
+                if hourly:
+                    slot = timezone.localtime(row['slot'], tz)
+                    key.update(day=slot.date(), hour=slot.hour)
+                else:
+                    key['day'] = row['day']
+                rows.append(model(
+                    statut=row['statut'], deliveries_count=row['count'], validated_count=row['validated'],
+                    quantity=row['total_quantity'] or 0, amount=row['total_amount'] or 0, **key
+                ))
+            model.objects.bulk_create(rows, batch_size=1000)
+            written += len(rows)
+    transaction.on_commit(lambda: invalidate_tags('Livraison'))
+    return written
+
+
+def growth(current, previous):
+    """Percentage change, 0 when both are empty and 100 when starting from nothing."""
+    if not previous:
+        return 100.0 if current else 0.0
+    return round(float((current - previous) * 100 / previous), 1)
+
+
+def dashboard_stats(today=None):
+    """
+    Delivered totals and month-over-month growth, from DailyStatusRollup.
+
+    Growth compares the current month to date with the same span of the
+    previous month, so a month that has just started is not compared
+    against a full one.
+    """
+    today = today or timezone.localdate(timezone=business_timezone())
+    month_start = today.replace(day=1)
+    previous_start = (month_start - timedelta(days=1)).replace(day=1)
+    previous_end = min(previous_start + (today - month_start), month_start - timedelta(days=1))
+    current = Q(day__gte=month_start, day__lte=today)
+    previous = Q(day__gte=previous_start, day__lte=previous_end)
+
+    measures = {'deliveries': 'deliveries_count', 'quantity': 'quantity', 'amount': 'amount'}
+    aggregates = {}
+    for name, field in measures.items():
+        aggregates[f'total_{name}'] = Sum(field)
+        aggregates[f'current_{name}'] = Sum(field, filter=current)
+        aggregates[f'previous_{name}'] = Sum(field, filter=previous)
+    values = DailyStatusRollup.objects.filter(statut=Livraison.Status.LIVRE).aggregate(**aggregates)
+    values = {key: value or 0 for key, value in values.items()}
+
+    return {
+        'total_deliveries': values['total_deliveries'],
+        'total_quantity': values['total_quantity'],
+        'total_amount': values['total_amount'],
+        'delivery_growth': growth(values['current_deliveries'], values['previous_deliveries']),
+        'quantity_growth': growth(values['current_quantity'], values['previous_quantity']),
+        'amount_growth': growth(values['current_amount'], values['previous_amount']),
+    }
@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from logistics.geo import clients_rezoned
+from logistics.models import Client, Livraison
+
+from . import rollups
+
+
+@receiver(post_save, sender=Livraison)
+def update_rollups(sender, instance, created, **kwargs):
+    """Move the delivery's totals from its old rollup rows to its new ones (states from logistics.signals)."""
+    old_state = rollups.snapshot(instance._previous_state)
+    new_state = rollups.snapshot(instance._saved_state)
+    if old_state != new_state:
+        rollups.apply_change(
+            rollups.snapshot_contribution(old_state, instance),
+            rollups.snapshot_contribution(new_state, instance),
+        )
+
+
+@receiver(post_delete, sender=Livraison)
+def remove_from_rollups(sender, instance, **kwargs):
+    rollups.apply_change(rollups.snapshot_contribution(rollups.snapshot(instance._previous_state), instance), None)
+
+
+@receiver(post_init, sender=Client)
+def remember_client_zone(sender, instance, **kwargs):
+    instance._rollup_zone = instance.__dict__.get('zone', DEFERRED)
+
+
+@receiver(pre_save, sender=Client)
+def load_client_zone(sender, instance, **kwargs):
+    """Clients loaded without their zone read the stored one."""
+    if instance._rollup_zone is DEFERRED and not instance._state.adding:
+        instance._rollup_zone = Client.objects.filter(pk=instance.pk).values_list('zone', flat=True).first()
+
+
+@receiver(post_save, sender=Client)
+def move_zone_rollups(sender, instance, created, **kwargs):
+    """Zone rollups follow the client's current zone."""
+    if not created and instance._rollup_zone != instance.zone:
+        with transaction.atomic():
+            rollups.move_client_zones({instance.pk: (instance._rollup_zone, instance.zone)})
+    instance._rollup_zone = instance.zone
+
+
+@receiver(clients_rezoned)
+def move_rezoned_rollups(sender, changes, **kwargs):
+    rollups.move_client_zones(changes)
@@ -0,0 +1,224 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from logistics.geo import invalidate_zone_index
+from logistics.models import Client, Livraison, Zone
+from logistics.tests import LogisticsTestMixin
+
+from .production import production_charts
+from .performance import agent_performance, assign_tiers, percentile_ranks
+from .models import AgentDailyRollup, ClientDailyRollup, DailyStatusRollup, HourlyZoneRollup, ZoneDailyRollup
+from .rollups import dashboard_stats, rebuild_rollups
+
+ROLLUP_MODELS = (DailyStatusRollup, AgentDailyRollup, ClientDailyRollup, ZoneDailyRollup, HourlyZoneRollup)
+
+
+def at(day, hour=10):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+
+
+def rollup_rows():
+    rows = {}
+    for model in ROLLUP_MODELS:
+        fields = [field.attname for field in model._meta.concrete_fields if not field.primary_key]
+        rows[model.__name__] = sorted(model.objects.filter(deliveries_count__gt=0).values_list(*fields))
+    return rows
+
+
+class RollupMaintenanceTests(LogisticsTestMixin, TestCase):
+    """Signal-maintained rollups must always match a rebuild from scratch."""
+
+    def setUp(self):
+        self.agent = self.create_agent()
+        self.client_a = self.create_client(0, zone='Zone-A', latitude=None, longitude=None)
+        self.client_b = self.create_client(1, zone='Zone-B', latitude=None, longitude=None)
+        self.today = timezone.localdate()
+
+    def assertMatchesRebuild(self):
+        incremental = rollup_rows()
+        rebuild_rollups(self.today - timedelta(days=10), self.today)
+        self.assertEqual(incremental, rollup_rows())
+
+    def test_create_change_validate_delete(self):
+        first = self.create_livraison(self.agent, self.client_a, date_heure=at(self.today))
+        second = self.create_livraison(
+            self.agent, self.client_b, date_heure=at(self.today - timedelta(days=1)), quantite_livree=25
+        )
+        self.assertMatchesRebuild()
+
+        first.statut = Livraison.Status.LIVRE
+        first.is_validated = True
+        first.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(
+            ZoneDailyRollup.objects.get(zone='Zone-A', statut=Livraison.Status.LIVRE).validated_count, 1
+        )
+
+        second.client = self.client_a
+        second.date_heure = at(self.today)
+        second.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(
+            ClientDailyRollup.objects.get(client=self.client_a, day=self.today, statut=second.statut).quantity, 25
+        )
+
+        Livraison.objects.get(pk=second.pk).delete()
+        self.assertMatchesRebuild()
+
+    def test_client_zone_change_moves_zone_rollups(self):
+        self.create_livraison(self.agent, self.client_a, date_heure=at(self.today))
+        self.create_livraison(self.agent, self.client_a, date_heure=at(self.today, 15), statut=Livraison.Status.LIVRE)
+        client = Client.objects.only('id').get(pk=self.client_a.pk)
+        client.zone = 'Zone-C'
+        client.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(ZoneDailyRollup.objects.filter(zone='Zone-C', deliveries_count=1).count(), 2)
+
+    def test_redrawn_zone_moves_zone_rollups(self):
+        invalidate_zone_index()
+        zone = Zone.objects.create(id='Zone-D', name='D', center_latitude='6.130000', center_longitude='1.220000', radius=1000)
+        client = self.create_client(2, latitude='6.135000', longitude='1.220000')
+        self.create_livraison(self.agent, client, date_heure=at(self.today))
+        self.assertEqual(HourlyZoneRollup.objects.get(zone='Zone-D').deliveries_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            zone.radius = 200
+            zone.save()
+        self.assertMatchesRebuild()
+        self.assertFalse(HourlyZoneRollup.objects.filter(zone='Zone-D', deliveries_count__gt=0).exists())
+
+    def test_unrelated_update_skips_rollups(self):
+        livraison = self.create_livraison(self.agent, self.client_a, date_heure=at(self.today))
+        livraison.gps_latitude = Decimal('6.130000')
+        with self.assertNumQueries(1):
+            livraison.save(update_fields=['gps_latitude'])
+
+    def test_rebuild_command(self):
+        self.create_livraison(self.agent, self.client_a, date_heure=at(self.today))
+        expected = rollup_rows()
+        DailyStatusRollup.objects.all().delete()
+        call_command('rebuild_rollups', start=str(self.today), end=str(self.today), stdout=open('/dev/null', 'w'))
+        self.assertEqual(expected, rollup_rows())
+
+
+class DashboardStatsTests(LogisticsTestMixin, TestCase):
+    def setUp(self):
+        self.agent = self.create_agent()
+        self.client_a = self.create_client()
+
+    def deliver(self, day, quantity):
+        self.create_livraison(
+            self.agent, self.client_a, date_heure=at(day), quantite_livree=quantity,
+            montant_total=quantity * 100, statut=Livraison.Status.LIVRE
+        )
+
+    def test_month_over_month_growth(self):
+        self.deliver(date(2024, 4, 3), 10)
+        self.deliver(date(2024, 4, 20), 10)  # Past the same span of the previous month
+        self.deliver(date(2024, 5, 2), 15)
+        stats = dashboard_stats(today=date(2024, 5, 10))
+        self.assertEqual(stats['total_deliveries'], 3)
+        self.assertEqual(stats['total_quantity'], 35)
+        self.assertEqual(stats['delivery_growth'], 0.0)
+        self.assertEqual(stats['quantity_growth'], 50.0)
+        self.assertEqual(stats['amount_growth'], 50.0)
+
+    def test_stats_endpoint(self):
+        self.deliver(timezone.localdate(), 10)
+        api = APIClient()
+        api.force_authenticate(self.create_admin())
+        response = api.get(reverse('dashboard-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['total_deliveries'], 1)
+        self.assertEqual(response.data['data']['total_amount'], Decimal('1000'))
+
+
+class AgentPerformanceTests(LogisticsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_a = self.create_client()
+        self.agents = [self.create_agent(index) for index in range(5)]
+        today = timezone.localdate()
+        for index, agent in enumerate(self.agents[:4]):
+            for _ in range(index + 1):
+                self.create_livraison(
+                    agent, self.client_a, date_heure=at(today), statut=Livraison.Status.LIVRE,
+                    montant_total=1000
+                )
+
+    def test_tiers_from_percentile_rank(self):
+        ranks = percentile_ranks([10, 20, 20, 40])
+        self.assertEqual(list(ranks), [0.0, 1 / 3, 1 / 3, 1.0])
+        self.assertEqual(list(assign_tiers([5, 0], [1, 0])), ['Top Performer', 'Faible'])
+
+    def test_ranking_is_one_query_and_cached(self):
+        with self.assertNumQueries(1):
+            ranking = agent_performance(30)
+        with self.assertNumQueries(0):
+            agent_performance(30)
+
+        self.assertEqual([row['agent_id'] for row in ranking[:4]], [str(a.id) for a in reversed(self.agents[:4])])
+        self.assertEqual(ranking[0]['deliveries_count'], 4)
+        self.assertEqual(ranking[0]['total_amount'], Decimal('4000'))
+        self.assertEqual(
+            [row['status'] for row in ranking],
+            ['Top Performer', 'Excellent', 'Bon', 'Moyen', 'Faible']
+        )
+
+    def test_endpoint_validates_period(self):
+        api = APIClient()
+        api.force_authenticate(self.create_admin())
+        url = reverse('dashboard-performance-agents')
+        self.assertEqual(api.get(url, {'period': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = api.get(url, {'period': 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']), 5)
+
+
+@override_settings(BUSINESS_TIME_ZONE='Africa/Lagos')
+class ProductionChartsTests(LogisticsTestMixin, TestCase):
+    """Hour buckets follow the business time zone (UTC+1 here), not UTC."""
+
+    def setUp(self):
+        cache.clear()
+        self.agent = self.create_agent()
+        self.north = self.create_client(0, zone='Nord', latitude=None, longitude=None)
+        self.south = self.create_client(1, zone='Sud', latitude=None, longitude=None)
+        self.today = timezone.localdate()
+
+    def deliver(self, client, day, utc_hour, quantity=10):
+        moment = datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc) + timedelta(hours=utc_hour)
+        self.create_livraison(
+            self.agent, client, date_heure=moment, quantite_livree=quantity, statut=Livraison.Status.LIVRE
+        )
+
+    def test_peak_hours_and_top_zones(self):
+        yesterday = self.today - timedelta(days=1)
+        self.deliver(self.north, yesterday, 7)
+        self.deliver(self.north, yesterday, 7, quantity=30)
+        self.deliver(self.south, yesterday, 13, quantity=20)
+        self.deliver(self.south, self.today - timedelta(days=100), 7)  # Outside a 30-day period
+
+        with self.assertNumQueries(4):
+            charts = production_charts(30)
+        self.assertEqual(charts['peak_hours'], [{'hour': '08:00', 'sales': 2}, {'hour': '14:00', 'sales': 1}])
+        self.assertEqual(charts['top_zones'], [{'zone': 'Nord', 'value': 40}, {'zone': 'Sud', 'value': 20}])
+        self.assertEqual(production_charts(365)['top_zones'][1], {'zone': 'Sud', 'value': 30})
+
+        incremental = rollup_rows()
+        rebuild_rollups(self.today - timedelta(days=120), self.today)
+        self.assertEqual(incremental, rollup_rows())
+
+    def test_endpoint(self):
+        api = APIClient()
+        api.force_authenticate(self.create_admin())
+        response = api.get(reverse('dashboard-production'), {'period': 90})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['peak_hours'], [])
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import AgentPerformanceView, DashboardStatsView, ProductionChartsView
+
+urlpatterns = [
+    path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('dashboard/performance-agents/', AgentPerformanceView.as_view(), name='dashboard-performance-agents'),
+    path('dashboard/production/', ProductionChartsView.as_view(), name='dashboard-production'),
+]
@@ -0,0 +1,60 @@
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.permissions import IsAdminUser
+from logistics.caching import TaggedCacheMixin
+
+from .performance import agent_performance
+from .production import production_charts
+from .rollups import dashboard_stats
+
+MAX_PERIOD_DAYS = 3660
+
+
+def parse_period(request, default=30):
+    """?period=N (days) as an int, or None when invalid."""
+    period = request.query_params.get('period', str(default))
+    if not period.isdigit() or not 1 <= int(period) <= MAX_PERIOD_DAYS:
+        return None
+    return int(period)
+
+
+def invalid_period():
+    return Response({
+        'status': 'error',
+        'message': f'period must be a number of days between 1 and {MAX_PERIOD_DAYS}'
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DashboardStatsView(TaggedCacheMixin, APIView):
+    """Delivered totals and month-over-month growth for the production report."""
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    cache_tags = ('Livraison',)
+
+    def get(self, request):
+        return Response({'status': 'success', 'data': dashboard_stats()})
+
+
+class AgentPerformanceView(TaggedCacheMixin, APIView):
+    """Per-agent delivered totals and tier over the last ?period= days (default 30)."""
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    cache_tags = ('Livraison', 'AgentCommercial')
+
+    def get(self, request):
+        period = parse_period(request)
+        if period is None:
+            return invalid_period()
+        return Response({'status': 'success', 'data': agent_performance(period)})
+
+
+class ProductionChartsView(TaggedCacheMixin, APIView):
+    """Peak hours, top zones and daily sales over the last ?period= days (default 30)."""
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    cache_tags = ('Livraison', 'Zone')
+
+    def get(self, request):
+        period = parse_period(request)
+        if period is None:
+            return invalid_period()
+        return Response({'status': 'success', 'data': production_charts(period)})
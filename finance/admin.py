@@ -0,0 +1,31 @@
+from django.contrib import admin
+from .models import ClientBalance, ReceivableEntry, RevenueBucket, RevenueTarget
+
+@admin.register(RevenueTarget)
+class RevenueTargetAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'granularity', 'period_start', 'amount')
+    list_filter = ('channel', 'granularity')
+
+@admin.register(RevenueBucket)
+class RevenueBucketAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'granularity', 'period_start', 'deliveries_count', 'revenue')
+    list_filter = ('channel', 'granularity')
+
+@admin.register(ClientBalance)
+class ClientBalanceAdmin(admin.ModelAdmin):
+    list_display = ('client', 'balance', 'oldest_due_date', 'updated_at')
+    readonly_fields = ('balance', 'oldest_due_date')
+    raw_id_fields = ('client',)
+
+@admin.register(ReceivableEntry)
+class ReceivableEntryAdmin(admin.ModelAdmin):
+    # Entries are posted through finance.ledger so balances stay consistent
+    list_display = ('client', 'kind', 'amount', 'outstanding', 'due_date', 'balance_after', 'created_at')
+    list_filter = ('kind', 'created_at')
+    raw_id_fields = ('client', 'livraison', 'created_by')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,103 @@
+"""
+Client receivables ledger.
+
+Every movement is a ReceivableEntry; ClientBalance keeps the running
+balance so reading a client's debt never sums its history. Charges carry
+an ``outstanding`` part that credits (payments, negative adjustments)
+settle oldest due date first, which keeps ``oldest_due_date`` exact.
+Postings for one client are serialized on its ClientBalance row.
+
+Delivered Livraisons are charged automatically (see signals): a delivery
+becoming "livré" posts a charge due FINANCE_PAYMENT_TERMS_DAYS later, and
+later amount/client/status changes post the matching adjustments.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from analytics.rollups import business_timezone
+
+from .models import ClientBalance, ReceivableEntry
+
+
+def post_entry(client_id, kind, amount, livraison_id=None, due_date=None, reference='', user=None):
+    """Append an entry to a client's ledger and update its balance. Returns the entry."""
+    amount = Decimal(amount)
+    with transaction.atomic():
+        balance, _ = ClientBalance.objects.select_for_update().get_or_create(client_id=client_id)
+        if amount > 0:
+            # A client in credit (prepaid) only owes what exceeds the credit
+            outstanding = max(Decimal(0), min(amount, balance.balance + amount))
+        else:
+            outstanding = Decimal(0)
+            settle(client_id, -amount, livraison_id)
+
+        balance.balance += amount
+        entry = ReceivableEntry.objects.create(
+            client_id=client_id, livraison_id=livraison_id, kind=kind, amount=amount,
+            outstanding=outstanding, due_date=due_date, balance_after=balance.balance,
+            reference=reference, created_by=user,
+        )
+        balance.oldest_due_date = ReceivableEntry.objects.filter(
+            client_id=client_id, outstanding__gt=0
+        ).aggregate(oldest=Min('due_date'))['oldest']
+        balance.save()
+    return entry
+
+
+def settle(client_id, credit, livraison_id=None):
+    """Reduce outstanding charges by ``credit``: the delivery's own charges first, then oldest due first."""
+    charges = list(
+        ReceivableEntry.objects.select_for_update().filter(client_id=client_id, outstanding__gt=0).order_by('due_date', 'id')
+    )
+    if livraison_id is not None:
+        charges.sort(key=lambda charge: charge.livraison_id != livraison_id)
+    settled = []
+    for charge in charges:
+        if credit <= 0:
+            break
+        part = min(charge.outstanding, credit)
+        charge.outstanding -= part
+        credit -= part
+        settled.append(charge)
+    ReceivableEntry.objects.bulk_update(settled, ['outstanding'])
+
+
+def payment_due_date(date_heure):
+    terms = getattr(settings, 'FINANCE_PAYMENT_TERMS_DAYS', 30)
+    return timezone.localtime(date_heure, business_timezone()).date() + timedelta(days=terms)
+
+
+def charged_amount(state):
+    """(client_id, amount) a delivery snapshot is charged for."""
+    from logistics.models import Livraison
+    if state is None:
+        return None, Decimal(0)
+    statut, date_heure, client_id, amount = state
+    if statut != Livraison.Status.LIVRE:
+        return client_id, Decimal(0)
+    return client_id, Decimal(amount or 0)
+
+
+def sync_livraison_charge(livraison, old_state, new_state):
+    """Post whatever brings the delivery's charges from the old state to the new one."""
+    old_client, old_amount = charged_amount(old_state)
+    new_client, new_amount = charged_amount(new_state)
+    due_date = payment_due_date(livraison.date_heure) if livraison.date_heure else None
+    reference = f"Livraison {livraison.pk}"
+    # A deleted delivery can no longer be referenced
+    livraison_id = livraison.pk if new_state is not None else None
+
+    with transaction.atomic():
+        if old_client != new_client:
+            if old_amount:
+                post_entry(old_client, ReceivableEntry.Kind.ADJUSTMENT, -old_amount, livraison_id, reference=reference)
+            old_amount = Decimal(0)
+        delta = new_amount - old_amount
+        if delta:
+            kind = ReceivableEntry.Kind.CHARGE if not old_amount and delta > 0 else ReceivableEntry.Kind.ADJUSTMENT
+            post_entry(new_client, kind, delta, livraison_id, due_date=due_date if delta > 0 else None, reference=reference)
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from finance.revenue import rebuild_revenue
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily and monthly revenue buckets of every month touching a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day (YYYY-MM-DD), defaults to 30 days ago')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD), defaults to today')
+
+    def handle(self, *args, **options):
+        end = parse_date(options['end']) if options['end'] else timezone.localdate()
+        start = parse_date(options['start']) if options['start'] else end - timedelta(days=30)
+        if start is None or end is None or start > end:
+            raise CommandError('Invalid date range')
+
+        buckets = rebuild_revenue(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Revenue rebuilt from {start:%Y-%m} to {end:%Y-%m}: {buckets} buckets'))
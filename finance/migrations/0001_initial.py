@@ -0,0 +1,78 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('logistics', '0005_heatmapcell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientBalance',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='logistics.client')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('oldest_due_date', models.DateField(blank=True, help_text='Due date of the oldest unpaid charge', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['balance'], name='clientbalance_balance_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('global', 'Global'), ('tricycles', 'Tricycles'), ('wholesale', 'Wholesale')], max_length=20)),
+                ('granularity', models.CharField(choices=[('daily', 'Daily'), ('monthly', 'Monthly')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('deliveries_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'period_start', 'channel'), name='revenuebucket_unique_period')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('global', 'Global'), ('tricycles', 'Tricycles'), ('wholesale', 'Wholesale')], default='global', max_length=20)),
+                ('granularity', models.CharField(choices=[('daily', 'Daily'), ('monthly', 'Monthly')], default='monthly', max_length=10)),
+                ('period_start', models.DateField(help_text='The day, or the first day of the month')),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Montant en CFA', max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-period_start', 'channel'],
+                'constraints': [models.UniqueConstraint(fields=('channel', 'granularity', 'period_start'), name='revenuetarget_unique_period')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReceivableEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('charge', 'Charge'), ('payment', 'Paiement'), ('adjustment', 'Ajustement')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Positive for charges, negative for payments and credits', max_digits=14)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, help_text='Part of a charge not yet settled', max_digits=14)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('balance_after', models.DecimalField(decimal_places=2, help_text='Client balance after this entry', max_digits=14)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receivable_entries', to='logistics.client')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('livraison', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receivable_entries', to='logistics.livraison')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['client', 'created_at'], name='receivable_client_time_idx'), models.Index(fields=['client', 'due_date'], name='receivable_client_due_idx')],
+            },
+        ),
+    ]
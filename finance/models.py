@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.db import models
+
+from logistics.models import Client, Livraison
+
+
+class Channel(models.TextChoices):
+    GLOBAL = 'global', 'Global'
+    TRICYCLES = 'tricycles', 'Tricycles'
+    WHOLESALE = 'wholesale', 'Wholesale'
+
+
+class Granularity(models.TextChoices):
+    DAILY = 'daily', 'Daily'
+    MONTHLY = 'monthly', 'Monthly'
+
+
+class RevenueTarget(models.Model):
+    """Revenue objective of a channel for one day or one month"""
+    channel = models.CharField(max_length=20, choices=Channel.choices, default=Channel.GLOBAL)
+    granularity = models.CharField(max_length=10, choices=Granularity.choices, default=Granularity.MONTHLY)
+    period_start = models.DateField(help_text="The day, or the first day of the month")
+    amount = models.DecimalField(max_digits=14, decimal_places=2, help_text="Montant en CFA")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-period_start', 'channel']
+        constraints = [
+            models.UniqueConstraint(fields=['channel', 'granularity', 'period_start'], name='revenuetarget_unique_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} {self.granularity} {self.period_start}: {self.amount}"
+
+
+class RevenueBucket(models.Model):
+    """Delivered revenue of a channel for one day or one month, maintained incrementally"""
+    channel = models.CharField(max_length=20, choices=Channel.choices)
+    granularity = models.CharField(max_length=10, choices=Granularity.choices)
+    period_start = models.DateField()
+    deliveries_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'period_start', 'channel'], name='revenuebucket_unique_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} {self.granularity} {self.period_start}: {self.revenue}"
+
+
+class ClientBalance(models.Model):
+    """Running receivable balance of a client (positive: the client owes money)"""
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, primary_key=True, related_name='balance')
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    oldest_due_date = models.DateField(null=True, blank=True, help_text="Due date of the oldest unpaid charge")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['balance'], name='clientbalance_balance_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.client_id}: {self.balance}"
+
+
+class ReceivableEntry(models.Model):
+    """One movement of a client's receivables ledger"""
+    class Kind(models.TextChoices):
+        CHARGE = 'charge', 'Charge'
+        PAYMENT = 'payment', 'Paiement'
+        ADJUSTMENT = 'adjustment', 'Ajustement'
+
+    id = models.BigAutoField(primary_key=True)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='receivable_entries')
+    livraison = models.ForeignKey(Livraison, on_delete=models.SET_NULL, null=True, blank=True, related_name='receivable_entries')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, help_text="Positive for charges, negative for payments and credits")
+    outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Part of a charge not yet settled")
+    due_date = models.DateField(null=True, blank=True)
+    balance_after = models.DecimalField(max_digits=14, decimal_places=2, help_text="Client balance after this entry")
+    reference = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['client', 'created_at'], name='receivable_client_time_idx'),
+            models.Index(fields=['client', 'due_date'], name='receivable_client_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.amount} ({self.client_id})"
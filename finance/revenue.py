@@ -0,0 +1,197 @@
+"""
+Revenue buckets and the financial dashboard.
+
+Delivered Livraison amounts are added to one daily and one monthly
+RevenueBucket of their channel (tricycles or wholesale, from the client's
+type; see FINANCE_WHOLESALE_CLIENT_TYPES). The global channel is the sum of
+both. Saving or deleting a delivery applies the difference between its old
+and new contribution; `rebuild_revenue` recomputes whole months from
+grouped queries.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from analytics.rollups import business_timezone, day_bounds
+from logistics.caching import invalidate_tags
+from logistics.counters import upsert_increment
+from logistics.models import Client, Livraison
+
+from .models import Channel, ClientBalance, Granularity, RevenueBucket, RevenueTarget
+
+Contribution = namedtuple('Contribution', 'day channel amount')
+
+SNAPSHOT_FIELDS = ('statut', 'date_heure', 'client_id', 'montant_total')
+
+HISTORY_LENGTH = {Granularity.DAILY: 30, Granularity.MONTHLY: 12}
+
+
+def channel_for(client_type):
+    wholesale = getattr(settings, 'FINANCE_WHOLESALE_CLIENT_TYPES', ('revendeur', 'entreprise'))
+    return Channel.WHOLESALE if client_type in wholesale else Channel.TRICYCLES
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def period_start(day, granularity):
+    return month_start(day) if granularity == Granularity.MONTHLY else day
+
+
+def snapshot(state):
+    """The fields revenue and receivables depend on, from a delivery state of logistics.signals (or None)."""
+    if state is None:
+        return None
+    return tuple(state[field] for field in SNAPSHOT_FIELDS)
+
+
+def snapshot_contribution(state, livraison):
+    if state is None:
+        return None
+    statut, date_heure, client_id, amount = state
+    if statut != Livraison.Status.LIVRE or date_heure is None or client_id is None:
+        return None
+    if client_id == livraison.client_id and Livraison.client.is_cached(livraison):
+        client_type = livraison.client.type_client
+    else:
+        client_type = Client.objects.filter(pk=client_id).values_list('type_client', flat=True).first()
+    day = timezone.localtime(date_heure, business_timezone()).date()
+    return Contribution(day, channel_for(client_type), Decimal(amount or 0))
+
+
+def apply_contribution(value, sign):
+    """Add (sign=1) or remove (sign=-1) a contribution from its daily and monthly buckets."""
+    if value is None:
+        return
+    for granularity in Granularity.values:
+        key = {'granularity': granularity, 'period_start': period_start(value.day, granularity), 'channel': value.channel}
+        upsert_increment(RevenueBucket, key, {'deliveries_count': sign, 'revenue': sign * value.amount})
+
+
+def apply_change(old, new):
+    """Move a delivery from its old contribution to its new one, in the caller's transaction."""
+    if old == new:
+        return
+    apply_contribution(old, -1)
+    apply_contribution(new, 1)
+
+
+def rebuild_revenue(start, end):
+    """Recompute the buckets of every month touching [start, end]. Returns the number of buckets written."""
+    start, end = month_start(start), add_months(end, 1) - timedelta(days=1)
+    since, until = day_bounds(start, end)
+    rows = Livraison.objects.filter(
+        statut=Livraison.Status.LIVRE, date_heure__gte=since, date_heure__lt=until
+    ).annotate(
+        day=TruncDate('date_heure', tzinfo=business_timezone())
+    ).order_by().values('day', 'client__type_client').annotate(count=Count('pk'), total=Sum('montant_total'))
+
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for row in rows:
+        channel = channel_for(row['client__type_client'])
+        for granularity in Granularity.values:
+            bucket = totals[(granularity, period_start(row['day'], granularity), channel)]
+            bucket[0] += row['count']
+            bucket[1] += row['total'] or 0
+
+    with transaction.atomic():
+        RevenueBucket.objects.filter(period_start__gte=start, period_start__lte=end).delete()
+        RevenueBucket.objects.bulk_create([
+            RevenueBucket(granularity=granularity, period_start=day, channel=channel, deliveries_count=count, revenue=revenue)
+            for (granularity, day, channel), (count, revenue) in totals.items()
+        ], batch_size=1000)
+    transaction.on_commit(lambda: invalidate_tags('Livraison'))
+    return len(totals)
+
+
+def targets_for(granularity, periods):
+    """{(channel, period_start): target}; daily periods fall back to a prorated monthly target."""
+    months = sorted({month_start(day) for day in periods})
+    rows = RevenueTarget.objects.filter(
+        granularity__in=[granularity, Granularity.MONTHLY],
+        period_start__gte=min(months), period_start__lte=max(periods),
+    ).values_list('granularity', 'channel', 'period_start', 'amount')
+    exact, monthly = {}, {}
+    for row_granularity, channel, start, amount in rows:
+        (exact if row_granularity == granularity else monthly)[(channel, start)] = amount
+
+    targets = {}
+    for day in periods:
+        for channel in Channel.values:
+            target = exact.get((channel, day))
+            if target is None and (channel, month_start(day)) in monthly:
+                days_in_month = (add_months(day, 1) - month_start(day)).days
+                target = (monthly[(channel, month_start(day))] / days_in_month).quantize(Decimal('0.01'))
+            targets[(channel, day)] = target or Decimal(0)
+        # Without a global objective, the global target is the sum of the channels'
+        if not targets[(Channel.GLOBAL, day)]:
+            targets[(Channel.GLOBAL, day)] = targets[(Channel.TRICYCLES, day)] + targets[(Channel.WHOLESALE, day)]
+    return targets
+
+
+def variation(current, previous):
+    if not previous:
+        return 0.0
+    return round(float((current - previous) * 100 / previous), 1)
+
+
+def financial_dashboard(granularity, today=None):
+    """
+    Revenue vs target for the current period, client debts and revenue history.
+
+    Reads HISTORY_LENGTH buckets per channel, their targets, and the
+    balances of indebted clients; nothing is summed from deliveries.
+    """
+    today = today or timezone.localdate(timezone=business_timezone())
+    length = HISTORY_LENGTH[granularity]
+    current = period_start(today, granularity)
+    if granularity == Granularity.MONTHLY:
+        periods = [add_months(current, -offset) for offset in range(length, -1, -1)]
+    else:
+        periods = [current - timedelta(days=offset) for offset in range(length, -1, -1)]
+
+    revenue = defaultdict(Decimal)
+    for channel, start, amount in RevenueBucket.objects.filter(
+        granularity=granularity, period_start__gte=periods[0], period_start__lte=current
+    ).values_list('channel', 'period_start', 'revenue'):
+        revenue[(channel, start)] += amount
+        revenue[(Channel.GLOBAL, start)] += amount
+    targets = targets_for(granularity, periods)
+
+    history = []
+    for previous, start in zip(periods, periods[1:]):
+        value = revenue[(Channel.GLOBAL, start)]
+        history.append({
+            'period': start.strftime('%b %Y') if granularity == Granularity.MONTHLY else start.isoformat(),
+            'revenue': value,
+            'target': targets[(Channel.GLOBAL, start)],
+            'variation': variation(value, revenue[(Channel.GLOBAL, previous)]),
+        })
+
+    debts = [
+        {'client_name': name, 'amount_due': amount, 'due_date': due_date}
+        for name, amount, due_date in ClientBalance.objects.filter(balance__gt=0).order_by(
+            F('oldest_due_date').asc(nulls_last=True), '-balance'
+        ).values_list('client__nom_point_vente', 'balance', 'oldest_due_date')
+    ]
+
+    return {
+        'revenue_vs_target': {
+            channel: {'current': revenue[(channel, current)], 'target': targets[(channel, current)]}
+            for channel in Channel.values
+        },
+        'debts': debts,
+        'revenue_history': history,
+    }
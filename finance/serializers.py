@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+from rest_framework import serializers
+
+from .models import ReceivableEntry, RevenueTarget
+
+
+class RevenueTargetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RevenueTarget
+        fields = ['id', 'channel', 'granularity', 'period_start', 'amount', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        granularity = attrs.get('granularity', getattr(self.instance, 'granularity', RevenueTarget._meta.get_field('granularity').default))
+        period_start = attrs.get('period_start', getattr(self.instance, 'period_start', None))
+        if granularity == 'monthly' and period_start and period_start.day != 1:
+            raise serializers.ValidationError({'period_start': 'Monthly targets start on the first day of the month.'})
+        return attrs
+
+
+class ReceivableEntrySerializer(serializers.ModelSerializer):
+    client_name = serializers.CharField(source='client.nom_point_vente', read_only=True)
+
+    class Meta:
+        model = ReceivableEntry
+        fields = [
+            'id', 'client', 'client_name', 'livraison', 'kind', 'amount', 'outstanding',
+            'due_date', 'balance_after', 'reference', 'created_by', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class PaymentSerializer(serializers.Serializer):
+    client = serializers.UUIDField()
+    amount = serializers.DecimalField(max_digits=14, decimal_places=2, min_value=Decimal('0.01'))
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True)
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from logistics.caching import invalidate_tags
+from logistics.models import Client, Livraison
+
+from . import ledger, revenue
+from .models import ReceivableEntry, RevenueTarget
+
+
+@receiver(post_save, sender=Livraison)
+def update_finance(sender, instance, created, **kwargs):
+    """Keep revenue buckets and the client's receivables in step with the delivery (states from logistics.signals)."""
+    old_state = revenue.snapshot(instance._previous_state)
+    new_state = revenue.snapshot(instance._saved_state)
+    if old_state != new_state:
+        # Livraison.save() runs the receivers in its transaction
+        revenue.apply_change(
+            revenue.snapshot_contribution(old_state, instance),
+            revenue.snapshot_contribution(new_state, instance),
+        )
+        ledger.sync_livraison_charge(instance, old_state, new_state)
+
+
+@receiver(post_delete, sender=Livraison)
+def remove_from_finance(sender, instance, **kwargs):
+    state = revenue.snapshot(instance._previous_state)
+    revenue.apply_change(revenue.snapshot_contribution(state, instance), None)
+
+    def reverse_charge():
+        # Skipped when the client itself was deleted along with its ledger
+        if state is not None and Client.objects.filter(pk=state[2]).exists():
+            ledger.sync_livraison_charge(instance, state, None)
+    transaction.on_commit(reverse_charge)
+
+
+@receiver([post_save, post_delete], sender=RevenueTarget)
+@receiver([post_save, post_delete], sender=ReceivableEntry)
+def evict_cached_responses(sender, instance, **kwargs):
+    tag = sender.__name__
+    transaction.on_commit(lambda: invalidate_tags(tag))
@@ -0,0 +1,119 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from logistics.models import Client, Livraison
+from logistics.tests import LogisticsTestMixin
+
+from .ledger import post_entry
+from .models import Channel, ClientBalance, Granularity, ReceivableEntry, RevenueBucket, RevenueTarget
+from .revenue import financial_dashboard, rebuild_revenue
+
+
+def at(day, hour=10):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+
+
+class ReceivablesLedgerTests(LogisticsTestMixin, TestCase):
+    """Delivered deliveries are charged; payments settle the oldest charges first."""
+
+    def setUp(self):
+        self.agent = self.create_agent()
+        self.shop = self.create_client()
+
+    def deliver(self, day, amount):
+        return self.create_livraison(
+            self.agent, self.shop, date_heure=at(day), montant_total=amount, statut=Livraison.Status.LIVRE
+        )
+
+    def test_charges_adjustments_and_payments(self):
+        old = self.deliver(date(2024, 4, 1), 1000)
+        recent = self.deliver(date(2024, 4, 20), 3000)
+        self.create_livraison(self.agent, self.shop, montant_total=700)  # Not delivered: not charged
+
+        balance = ClientBalance.objects.get(client=self.shop)
+        self.assertEqual(balance.balance, Decimal('4000'))
+        self.assertEqual(balance.oldest_due_date, date(2024, 5, 1))
+
+        post_entry(self.shop.pk, ReceivableEntry.Kind.PAYMENT, Decimal('-1500'))
+        balance.refresh_from_db()
+        self.assertEqual(balance.balance, Decimal('2500'))
+        self.assertEqual(balance.oldest_due_date, date(2024, 5, 20))
+        self.assertEqual(ReceivableEntry.objects.get(livraison=old, kind='charge').outstanding, 0)
+
+        recent.montant_total = Decimal('2000')
+        recent.save()
+        old.statut = Livraison.Status.ECHEC
+        old.save()
+        balance.refresh_from_db()
+        self.assertEqual(balance.balance, Decimal('500'))
+        self.assertEqual(
+            balance.balance,
+            sum(ReceivableEntry.objects.filter(client=self.shop).values_list('amount', flat=True))
+        )
+
+    def test_payment_endpoint(self):
+        self.deliver(timezone.localdate(), 1000)
+        api = APIClient()
+        api.force_authenticate(self.create_admin())
+        url = reverse('receivableentry-payment')
+        response = api.post(url, {'client': str(self.shop.pk), 'amount': '1000.00', 'reference': 'REC-1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['balance_after'], '0.00')
+        self.assertIsNone(ClientBalance.objects.get(client=self.shop).oldest_due_date)
+
+
+class FinancialDashboardTests(LogisticsTestMixin, TestCase):
+    def setUp(self):
+        self.agent = self.create_agent()
+        self.reseller = self.create_client(0, type_client=Client.TypeClient.REVENDEUR)
+        self.household = self.create_client(1, type_client=Client.TypeClient.PARTICULIER)
+
+    def deliver(self, client, day, amount):
+        self.create_livraison(
+            self.agent, client, date_heure=at(day), montant_total=amount, statut=Livraison.Status.LIVRE
+        )
+
+    def test_buckets_match_rebuild(self):
+        self.deliver(self.reseller, date(2024, 4, 30), 1000)
+        self.deliver(self.household, date(2024, 5, 2), 500)
+        rows = lambda: sorted(RevenueBucket.objects.values_list('granularity', 'period_start', 'channel', 'deliveries_count', 'revenue'))
+        incremental = rows()
+        rebuild_revenue(date(2024, 4, 1), date(2024, 5, 31))
+        self.assertEqual(incremental, rows())
+        self.assertIn(('monthly', date(2024, 5, 1), 'tricycles', 1, Decimal('500.00')), incremental)
+
+    def test_monthly_dashboard(self):
+        self.deliver(self.reseller, date(2024, 4, 10), 1000)
+        self.deliver(self.reseller, date(2024, 5, 2), 1000)
+        self.deliver(self.household, date(2024, 5, 3), 500)
+        RevenueTarget.objects.create(channel=Channel.WHOLESALE, period_start=date(2024, 5, 1), amount=2000)
+        RevenueTarget.objects.create(channel=Channel.TRICYCLES, period_start=date(2024, 5, 1), amount=1000)
+
+        with self.assertNumQueries(3):
+            data = financial_dashboard(Granularity.MONTHLY, today=date(2024, 5, 15))
+        self.assertEqual(data['revenue_vs_target']['global'], {'current': Decimal('1500'), 'target': Decimal('3000')})
+        self.assertEqual(data['revenue_vs_target']['wholesale']['current'], Decimal('1000'))
+        self.assertEqual(data['revenue_history'][-1], {
+            'period': 'May 2024', 'revenue': Decimal('1500'), 'target': Decimal('3000'), 'variation': 50.0
+        })
+        self.assertEqual(len(data['revenue_history']), 12)
+        self.assertEqual([debt['client_name'] for debt in data['debts']], ['Point 0', 'Point 1'])
+
+    def test_daily_targets_prorate_monthly(self):
+        RevenueTarget.objects.create(channel=Channel.GLOBAL, period_start=date(2024, 4, 1), amount=3000)
+        data = financial_dashboard(Granularity.DAILY, today=date(2024, 4, 15))
+        self.assertEqual(data['revenue_vs_target']['global']['target'], Decimal('100.00'))
+        self.assertEqual(data['debts'], [])
+
+    def test_endpoint_validates_period(self):
+        api = APIClient()
+        api.force_authenticate(self.create_admin())
+        url = reverse('dashboard-financial')
+        self.assertEqual(api.get(url, {'period': 'weekly'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(api.get(url, {'period': 'daily'}).status_code, status.HTTP_200_OK)
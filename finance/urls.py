@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from .views import FinancialDashboardView, ReceivableEntryViewSet, RevenueTargetViewSet
+
+router = DefaultRouter()
+router.register(r'finance/targets', RevenueTargetViewSet)
+router.register(r'finance/receivables', ReceivableEntryViewSet)
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('dashboard/financial/', FinancialDashboardView.as_view(), name='dashboard-financial'),
+]
@@ -0,0 +1,62 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.permissions import IsAdminUser
+from logistics.caching import TaggedCacheMixin
+from logistics.models import Client
+from logistics.pagination import KeysetPagination
+
+from .ledger import post_entry
+from .models import Granularity, ReceivableEntry, RevenueTarget
+from .revenue import financial_dashboard
+from .serializers import PaymentSerializer, ReceivableEntrySerializer, RevenueTargetSerializer
+
+
+class FinancialDashboardView(TaggedCacheMixin, APIView):
+    """Revenue vs target, client debts and revenue history; ?period=daily|monthly (default monthly)."""
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    cache_tags = ('Livraison', 'Client', 'RevenueTarget', 'ReceivableEntry')
+
+    def get(self, request):
+        granularity = request.query_params.get('period', Granularity.MONTHLY)
+        if granularity not in Granularity.values:
+            return Response({
+                'status': 'error',
+                'message': f"period must be one of: {', '.join(Granularity.values)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'success', 'data': financial_dashboard(granularity)})
+
+
+class RevenueTargetViewSet(viewsets.ModelViewSet):
+    queryset = RevenueTarget.objects.all()
+    serializer_class = RevenueTargetSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    filterset_fields = ['channel', 'granularity']
+
+
+class ReceivableEntryViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = ReceivableEntry.objects.select_related('client').order_by('-created_at', '-id')
+    serializer_class = ReceivableEntrySerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+    filterset_fields = ['client', 'kind']
+
+    @action(detail=False, methods=['post'], serializer_class=PaymentSerializer)
+    def payment(self, request):
+        """Record a client payment; it settles the oldest unpaid charges first."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        client = get_object_or_404(Client, pk=serializer.validated_data['client'])
+        entry = post_entry(
+            client.pk, ReceivableEntry.Kind.PAYMENT, -serializer.validated_data['amount'],
+            reference=serializer.validated_data.get('reference', ''), user=request.user
+        )
+        return Response({
+            'status': 'success',
+            'message': 'Payment recorded',
+            'data': ReceivableEntrySerializer(entry).data
+        }, status=status.HTTP_201_CREATED)
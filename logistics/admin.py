@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AgentCommercial, Client, Commande, Livraison, LogActivite, Zone
+from .models import AgentCommercial, AgentLocationLog, Client, Commande, HeatmapCell, Livraison, LogActivite, Zone
 
 @admin.register(AgentCommercial)
 class AgentCommercialAdmin(admin.ModelAdmin):
@@ -7,6 +7,12 @@ class AgentCommercialAdmin(admin.ModelAdmin):
     list_filter = ('statut', 'date_embauche', 'zone_assigned')
     search_fields = ('nom', 'prenom', 'telephone')
 
+@admin.register(AgentLocationLog)
+class AgentLocationLogAdmin(admin.ModelAdmin):
+    list_display = ('agent', 'latitude', 'longitude', 'accuracy', 'recorded_at')
+    list_filter = ('recorded_at',)
+    raw_id_fields = ('agent',)
+
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
     list_display = ('nom_point_vente', 'responsable', 'telephone', 'type_client', 'statut', 'zone')
@@ -38,3 +44,9 @@ class ZoneAdmin(admin.ModelAdmin):
     list_filter = ('zone_type', 'is_active')
     search_fields = ('id', 'name')
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(HeatmapCell)
+class HeatmapCellAdmin(admin.ModelAdmin):
+    list_display = ('level', 'day', 'lat_index', 'lng_index', 'deliveries_count', 'quantity', 'amount')
+    list_filter = ('level', 'day')
@@ -0,0 +1,179 @@
+"""
+Audit trail of API actions in LogActivite.
+
+AuditLogMiddleware records every request whose method is in AUDIT_METHODS
+(the writes, by default) without writing to the database on the request
+path: entries are queued in a per-process AuditBuffer and written with one
+bulk_create once AUDIT_BUFFER_SIZE entries are queued or the oldest has
+waited AUDIT_FLUSH_INTERVAL seconds (checked as entries come in, and on
+process exit). Each entry keeps the time of its request. There is no timer:
+a worker that receives no more writes holds its entries until it exits,
+and loses them if it is killed.
+
+The log is organised in calendar months: `archive_logs` writes every month
+older than AUDIT_RETENTION_MONTHS to a gzipped JSONL file of
+AUDIT_ARCHIVE_DIR, then deletes it from the table in chunks, so the live
+table only holds the recent months LogActiviteViewSet pages through.
+"""
+import atexit
+import gzip
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import LogActivite
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """Unsaved LogActivite entries, written in batches."""
+
+    def __init__(self):
+        self.entries = []
+        self.lock = threading.Lock()
+        self.oldest = None
+
+    def add(self, entry):
+        with self.lock:
+            if not self.entries:
+                self.oldest = time.monotonic()
+            self.entries.append(entry)
+            due = (
+                len(self.entries) >= getattr(settings, 'AUDIT_BUFFER_SIZE', 100)
+                or time.monotonic() - self.oldest >= getattr(settings, 'AUDIT_FLUSH_INTERVAL', 5)
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the queued entries. Returns how many were written."""
+        with self.lock:
+            entries, self.entries = self.entries, []
+        if not entries:
+            return 0
+        # The request already succeeded: a database error is logged, never raised
+        try:
+            # Users deleted since their request: on_delete=SET_NULL, as for saved rows
+            user_ids = {entry.user_id for entry in entries if entry.user_id is not None}
+            existing = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+            for entry in entries:
+                if entry.user_id not in existing:
+                    entry.user_id = None
+            LogActivite.objects.bulk_create(entries)
+        except DatabaseError:
+            logger.exception('Could not write %d audit log entries', len(entries))
+            return 0
+        return len(entries)
+
+
+audit_buffer = AuditBuffer()
+
+
+@atexit.register
+def flush_at_exit():
+    """Write the entries left, unless the database is already gone (e.g. a destroyed test database)."""
+    if not audit_buffer.entries:
+        return
+    try:
+        with connection.cursor() as cursor:
+            usable = LogActivite._meta.db_table in connection.introspection.table_names(cursor)
+    except DatabaseError:
+        usable = False
+    if usable:
+        audit_buffer.flush()
+    else:
+        logger.warning('Database unavailable at exit: %d audit log entries dropped', len(audit_buffer.entries))
+
+
+class AuditLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timestamp = timezone.now()
+        response = self.get_response(request)
+        if request.method in getattr(settings, 'AUDIT_METHODS', ('POST', 'PUT', 'PATCH', 'DELETE')):
+            audit_buffer.add(self.entry(request, response, timestamp))
+        return response
+
+    def entry(self, request, response, timestamp):
+        # DRF sets the user it authenticated on the request; reading pk loads nothing
+        user = getattr(request, 'user', None)
+        match = request.resolver_match
+        return LogActivite(
+            user_id=user.pk if user is not None and user.is_authenticated else None,
+            action=f"{request.method} {match.view_name if match else request.path}"[:255],
+            details={'path': request.path, 'status': response.status_code},
+            ip_address=request.META.get('REMOTE_ADDR') or None,
+            timestamp=timestamp,
+        )
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start):
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def archive_month(start, directory, chunk_size=5000):
+    """
+    Move the entries of the month starting at ``start`` to
+    logactivite-YYYY-MM.jsonl.gz in ``directory``, one chunk at a time.
+    Returns the number of entries archived.
+    """
+    end = next_month(start)
+    month = LogActivite.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if not month.exists():
+        return 0
+    path = Path(directory) / f"logactivite-{start:%Y-%m}.jsonl.gz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    archived = 0
+    # Appending adds a gzip member: a file archived in several runs still reads as one stream
+    with gzip.open(path, 'at', encoding='utf-8') as archive:
+        while True:
+            rows = list(month.order_by('timestamp', 'id').values(
+                'id', 'user_id', 'action', 'details', 'ip_address', 'timestamp'
+            )[:chunk_size])
+            if not rows:
+                break
+            archive.writelines(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+            archive.flush()
+            # Only rows already written out are deleted
+            with transaction.atomic():
+                LogActivite.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            archived += len(rows)
+    return archived
+
+
+def archive_logs(keep_months=None, directory=None, chunk_size=5000, now=None):
+    """Archive every month older than the ``keep_months`` most recent ones. Returns {'YYYY-MM': entries}."""
+    keep_months = getattr(settings, 'AUDIT_RETENTION_MONTHS', 3) if keep_months is None else keep_months
+    directory = directory or getattr(settings, 'AUDIT_ARCHIVE_DIR', settings.BASE_DIR / 'archives' / 'logs')
+    cutoff = month_start(timezone.localtime(now))
+    for _ in range(keep_months - 1):
+        cutoff = month_start(cutoff - timedelta(days=1))
+
+    oldest = LogActivite.objects.filter(timestamp__lt=cutoff).order_by('timestamp').values_list('timestamp', flat=True).first()
+    archived = {}
+    if oldest is None:
+        return archived
+    start = month_start(timezone.localtime(oldest))
+    while start < cutoff:
+        count = archive_month(start, directory, chunk_size)
+        if count:
+            archived[f'{start:%Y-%m}'] = count
+        start = next_month(start)
+    return archived
@@ -0,0 +1,225 @@
+"""
+Tag-based cache for read-heavy GET endpoints and computed aggregates.
+
+Each tag (a model name such as ``'Livraison'``) has a version number in the
+cache. A cached value records the versions of the tags it depends on and is
+treated as a miss as soon as one of them moved; saving or deleting a model
+instance bumps its tag (see signals), so only entries depending on that
+model are evicted. Versions live in the configured cache backend: with a
+shared backend (Redis, Memcached) all gunicorn workers see the same
+versions, with the local-memory backend each process keeps its own.
+
+Hits and misses are counted per view (or per aggregate name) in the same
+backend; `cache_stats` reads them back.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+TAG_PREFIX = 'tagcache:tag:'
+ENTRY_PREFIX = 'tagcache:entry:'
+STATS_PREFIX = 'tagcache:stats:'
+
+# Response headers kept with a cached response
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+# Names whose counters `cache_stats` reports, registered when views/aggregates are defined
+_counted_names = set()
+
+
+def counter(name):
+    """Register a counter name at import time so every worker reports it."""
+    _counted_names.add(name)
+    return name
+
+
+def default_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def tag_versions(tags):
+    """Current version of each tag; a tag seen for the first time gets a fresh one."""
+    keys = {f'{TAG_PREFIX}{tag}': tag for tag in tags}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        # A time-based start never matches a version recorded before the tag was evicted
+        cache.add(key, time.time_ns(), None)
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate_tags(*tags):
+    for tag in tags:
+        try:
+            cache.incr(f'{TAG_PREFIX}{tag}')
+        except ValueError:
+            cache.set(f'{TAG_PREFIX}{tag}', time.time_ns(), None)
+
+
+def invalidate_on_commit(*tags):
+    """invalidate_tags once the current transaction commits, right away outside of one."""
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def bulk_touch(model, qs_or_objs, fields, batch_size=None):
+    """
+    Write ``fields`` of many rows the way save() would for conditional GETs
+    and the response cache.
+
+    update() and bulk_update() bypass auto_now and send no post_save, so
+    this stamps updated_at itself and evicts the model's cached responses
+    once committed. ``qs_or_objs`` is either a queryset, updated with
+    ``fields`` as a {name: value} mapping, or a list of instances whose
+    ``fields`` names are written with bulk_update. Returns the number of
+    rows written.
+    """
+    now = timezone.now()
+    if isinstance(qs_or_objs, QuerySet):
+        written = qs_or_objs.update(**fields, updated_at=now)
+    else:
+        for obj in qs_or_objs:
+            obj.updated_at = now
+        written = model.objects.bulk_update(qs_or_objs, [*fields, 'updated_at'], batch_size=batch_size)
+    if written:
+        invalidate_on_commit(model.__name__)
+    return written
+
+
+def count(name, outcome):
+    key = f'{STATS_PREFIX}{name}:{outcome}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def cache_stats():
+    """{name: {'hits', 'misses', 'hit_rate'}} for every name counted so far."""
+    keys = [f'{STATS_PREFIX}{name}:{outcome}' for name in _counted_names for outcome in ('hit', 'miss')]
+    values = cache.get_many(keys)
+    stats = {}
+    for name in sorted(_counted_names):
+        hits = values.get(f'{STATS_PREFIX}{name}:hit', 0)
+        misses = values.get(f'{STATS_PREFIX}{name}:miss', 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+def get_entry(key, versions):
+    """The cached payload for key, or None when absent or recorded under other tag versions."""
+    entry = cache.get(f'{ENTRY_PREFIX}{key}')
+    if entry is None or entry['versions'] != versions:
+        return None
+    return entry['payload']
+
+
+def set_entry(key, payload, versions, timeout=None):
+    cache.set(
+        f'{ENTRY_PREFIX}{key}', {'versions': versions, 'payload': payload},
+        default_timeout() if timeout is None else timeout
+    )
+
+
+def cached(name, key, tags, compute, timeout=None):
+    """Return compute() cached under (name, key) until one of the tags changes."""
+    full_key = f'{name}:{key}'
+    # Versions are read before computing so a change made meanwhile invalidates the result
+    versions = tag_versions(tags)
+    payload = get_entry(full_key, versions)
+    if payload is not None:
+        count(name, 'hit')
+        return payload
+    count(name, 'miss')
+    payload = compute()
+    set_entry(full_key, payload, versions, timeout)
+    return payload
+
+
+class TaggedCacheMixin:
+    """
+    Cache rendered GET responses of a view, tagged with the models it reads.
+
+    The key is made of the view and action, the path, the sorted query
+    parameters, the negotiated format and the user's role, so views using
+    it must not return per-user data. ``cache_actions`` restricts caching to
+    some viewset actions (all GET actions when None). Responses carry an
+    ``X-Cache: HIT|MISS`` header.
+    """
+    cache_tags = ()
+    cache_actions = None
+    cache_timeout = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cache_tags:
+            counter(cls.cache_name())
+
+    @classmethod
+    def cache_name(cls):
+        return f'{cls.__module__}.{cls.__name__}'
+
+    def cache_key(self, request):
+        params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+        role = getattr(request.user, 'user_type', None) or 'anonymous'
+        action = getattr(self, 'action', None)
+        raw = f'{action}|{request.path}|{params}|{request.accepted_renderer.format}|{role}'
+        return f'{self.cache_name()}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+    def is_cacheable(self, request):
+        if request.method != 'GET' or not self.cache_tags:
+            return False
+        return self.cache_actions is None or getattr(self, 'action', None) in self.cache_actions
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._tagcache_key = None
+        if not self.is_cacheable(request):
+            return
+        key = self.cache_key(request)
+        versions = tag_versions(self.cache_tags)
+        payload = get_entry(key, versions)
+        if payload is not None:
+            count(self.cache_name(), 'hit')
+            content, status_code, content_type, headers = payload
+            # Conditional GETs are answered from the cached validators
+            response = get_conditional_response(
+                request, etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+            ) or HttpResponse(content, status=status_code, content_type=content_type)
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            # dispatch() looks the handler up after initial(): short-circuit it
+            setattr(self, request.method.lower(), lambda *args, **kwargs: response)
+            return
+        count(self.cache_name(), 'miss')
+        self._tagcache_key = key
+        self._tagcache_versions = versions
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_tagcache_key', None)
+        if key is not None and response.status_code == 200 and hasattr(response, 'render'):
+            response.render()
+            set_entry(
+                key, (
+                    response.content, response.status_code, response['Content-Type'],
+                    {header: response[header] for header in CACHED_HEADERS if response.has_header(header)},
+                ),
+                self._tagcache_versions, self.cache_timeout
+            )
+            response['X-Cache'] = 'MISS'
+        return response
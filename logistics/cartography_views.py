@@ -0,0 +1,149 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import heatmap
+from .caching import TaggedCacheMixin
+from .models import AgentCommercial, Commande
+from .routing import plan_tour, route_length
+
+
+class HeatmapDataView(TaggedCacheMixin, APIView):
+    """
+    Delivery density for the map, read from the pre-aggregated HeatmapCell table.
+
+    Query params: start/end (YYYY-MM-DD, default last 30 days), an optional
+    viewport south/west/north/east, and an optional level (index into
+    HEATMAP_CELL_SIZES); without a level the finest one that keeps the
+    viewport under HEATMAP_MAX_CELLS cells is used.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    cache_tags = ('Livraison',)
+
+    def get(self, request):
+        params = request.query_params
+        end = parse_date(params.get('end', '')) or timezone.localdate()
+        start = parse_date(params.get('start', '')) or end - timedelta(days=30)
+
+        bounds = None
+        if any(params.get(key) for key in ('south', 'west', 'north', 'east')):
+            try:
+                bounds = tuple(float(params[key]) for key in ('south', 'west', 'north', 'east'))
+            except (KeyError, ValueError):
+                return Response({
+                    'status': 'error',
+                    'message': 'south, west, north and east must all be numbers'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        levels = len(heatmap.cell_sizes())
+        level = params.get('level')
+        if level is not None:
+            if not level.isdigit() or int(level) >= levels:
+                return Response({
+                    'status': 'error',
+                    'message': f'level must be between 0 and {levels - 1}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            level = int(level)
+        else:
+            level = heatmap.pick_level(*bounds) if bounds else 0
+
+        return Response({
+            'status': 'success',
+            'data': {
+                'start': start,
+                'end': end,
+                'level': level,
+                'cell_size': heatmap.cell_sizes()[level] / heatmap.MICRODEGREES,
+                'points': heatmap.query_heatmap(start, end, level, bounds),
+            }
+        })
+
+
+class OptimizedRoutesView(TaggedCacheMixin, APIView):
+    """
+    Plan each active agent's tour over its open orders.
+
+    Orders assigned to an agent with a tricycle (en attente / en cours) are
+    visited from the depot (DEPOT_LATITUDE/DEPOT_LONGITUDE, or the agent's
+    current position), in trips bounded by the tricycle capacity
+    (TRICYCLE_CAPACITY, overridable with ?capacity=). Filter with ?agent_id=.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    cache_tags = ('Commande', 'AgentCommercial', 'Client', 'Tricycle')
+
+    def get(self, request):
+        capacity = request.query_params.get('capacity') or getattr(settings, 'TRICYCLE_CAPACITY', 500)
+        try:
+            capacity = float(capacity)
+        except ValueError:
+            return Response({'status': 'error', 'message': 'capacity must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        orders = Commande.objects.filter(
+            statut__in=[Commande.Status.EN_ATTENTE, Commande.Status.EN_COURS],
+            agent_assigne__tricycle_assigne__isnull=False,
+        ).exclude(agent_assigne__statut=AgentCommercial.Status.INACTIF)
+        agent_id = request.query_params.get('agent_id')
+        if agent_id:
+            orders = orders.filter(agent_assigne_id=agent_id)
+
+        by_agent = defaultdict(list)
+        for order in orders.values(
+            'id', 'qt_commandee', 'agent_assigne_id', 'client__nom_point_vente',
+            'client__latitude', 'client__longitude'
+        ):
+            by_agent[order['agent_assigne_id']].append(order)
+
+        agents = AgentCommercial.objects.filter(pk__in=by_agent).select_related('tricycle_assigne')
+        data = [self._plan_agent(agent, by_agent[agent.pk], capacity) for agent in agents]
+        return Response({'status': 'success', 'data': data})
+
+    def _plan_agent(self, agent, orders, capacity):
+        located = [o for o in orders if o['client__latitude'] is not None and o['client__longitude'] is not None]
+        unrouted = [str(o['id']) for o in orders if o not in located]
+
+        depot = (getattr(settings, 'DEPOT_LATITUDE', None), getattr(settings, 'DEPOT_LONGITUDE', None))
+        if None in depot:
+            depot = (agent.current_latitude, agent.current_longitude)
+        if None in depot and located:
+            depot = (located[0]['client__latitude'], located[0]['client__longitude'])
+
+        trips_data, total = [], 0.0
+        if located:
+            lats = [float(depot[0])] + [float(o['client__latitude']) for o in located]
+            lngs = [float(depot[1])] + [float(o['client__longitude']) for o in located]
+            demands = [0] + [o['qt_commandee'] for o in located]
+            trips, matrix = plan_tour(lats, lngs, demands, capacity)
+            for trip in trips:
+                distance = route_length([0] + trip + [0], matrix)
+                total += distance
+                trips_data.append({
+                    'load': sum(demands[node] for node in trip),
+                    'distance_m': round(distance, 1),
+                    'stops': [
+                        {
+                            'commande_id': str(located[node - 1]['id']),
+                            'client_name': located[node - 1]['client__nom_point_vente'],
+                            'lat': lats[node],
+                            'lng': lngs[node],
+                            'quantity': demands[node],
+                        }
+                        for node in trip
+                    ],
+                })
+
+        return {
+            'agent_id': str(agent.id),
+            'agent_name': f"{agent.prenom} {agent.nom}",
+            'tricycle': agent.tricycle_assigne.code if agent.tricycle_assigne else None,
+            'capacity': capacity,
+            'depot': {'lat': float(depot[0]), 'lng': float(depot[1])} if None not in depot else None,
+            'trips': trips_data,
+            'total_distance_m': round(total, 1),
+            'unrouted_commandes': unrouted,
+        }
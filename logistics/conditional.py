@@ -0,0 +1,80 @@
+"""
+Conditional GET (ETag / Last-Modified) for list and detail endpoints.
+
+A list's validators come from one aggregate over the filtered queryset,
+MAX(updated_at) and COUNT(*): any insert, update or delete in the result
+set changes the ETag. A delete does not move MAX(updated_at), so a list
+is only answered 304 on If-None-Match; its Last-Modified is informative.
+A detail's validators come from the object's updated_at and both
+If-None-Match and If-Modified-Since apply. They are checked before
+anything is serialized, and a match returns 304 Not Modified with an
+empty body.
+
+The ETag also covers the request path and query string (page, cursor,
+fields...) and the user. With ``?expand=`` the response embeds related
+objects whose changes do not touch updated_at, so the tag versions of
+``conditional_related_tags`` (see logistics.caching) are mixed in too.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .caching import tag_versions
+
+
+class ConditionalGetMixin:
+    conditional_field = 'updated_at'
+    conditional_related_tags = ()
+
+    def conditional_validators(self, request, last_modified, count=None):
+        """(etag, last_modified timestamp) for a response built from these values."""
+        parts = [
+            last_modified.isoformat() if last_modified else '', count,
+            request.get_full_path(), getattr(request.user, 'pk', None),
+        ]
+        if request.query_params.get('expand') and self.conditional_related_tags:
+            parts.append(sorted(tag_versions(self.conditional_related_tags).items()))
+        etag = quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    def conditional_response(self, request, validators, build_response, match_last_modified=True):
+        """
+        Return 304 when the client's copy is current, else the built response;
+        both carry the validators. Without ``match_last_modified`` only the
+        ETag can match.
+        """
+        etag, last_modified = validators
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified if match_last_modified else None
+        )
+        if response is None:
+            response = build_response()
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Let clients keep their copy but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        fingerprint = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            last_modified=Max(self.conditional_field), count=Count('pk')
+        )
+        validators = self.conditional_validators(request, fingerprint['last_modified'], fingerprint['count'])
+        return self.conditional_response(
+            request, validators, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+            # MAX(updated_at) stays the same when a row is deleted: only the ETag counts rows
+            match_last_modified=False,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        validators = self.conditional_validators(request, getattr(instance, self.conditional_field))
+        return self.conditional_response(
+            request, validators, lambda: Response(self.get_serializer(instance).data)
+        )
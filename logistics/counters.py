@@ -0,0 +1,24 @@
+"""
+Counter rows maintained incrementally (heatmap cells, delivery rollups,
+revenue buckets): each row is identified by a key and holds sums that
+deliveries add to and remove from.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+def upsert_increment(model, key, deltas, create=True):
+    """
+    Add ``deltas`` ({field: amount}) to the row of ``model`` matching ``key``
+    with one UPDATE, creating the row with ``deltas`` as its values when it
+    does not exist yet (unless ``create`` is false).
+    """
+    increments = {field: F(field) + amount for field, amount in deltas.items()}
+    if model.objects.filter(**key).update(**increments) or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**deltas, **key)
+    except IntegrityError:
+        # Created concurrently by another delivery
+        model.objects.filter(**key).update(**increments)
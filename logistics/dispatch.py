@@ -0,0 +1,174 @@
+"""
+Automatic dispatch of pending orders to agents.
+
+Every unassigned order "en attente" whose client has coordinates is offered
+to the active agents with a tricycle and a known position. Agents are
+bucketed into a lat/lng grid so an order only looks at the agents within
+DISPATCH_MAX_DISTANCE_M; the cost of a pair is the great-circle distance,
+plus DISPATCH_OUT_OF_ZONE_PENALTY_M when the agent's zone is not the
+client's. Pairs are then taken cheapest first (greedy assignment): an order
+goes to the agent if it still fits in the agent's tricycle, whose capacity
+(TRICYCLE_CAPACITY) is reduced by the orders the agent already holds.
+
+Assigned orders move to "en cours", as with a manual assignment, in one
+UPDATE per batch of orders, batches being split only where the backend
+limits query parameters.
+"""
+import math
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, Q, Sum, UUIDField, Value, When
+
+from .caching import bulk_touch
+from .geo import METERS_PER_DEGREE, haversine_array
+from .models import AgentCommercial, Commande
+
+
+class PointGrid:
+    """Points bucketed into square cells of ``cell_size`` degrees, for radius queries."""
+
+    def __init__(self, lats, lngs, cell_size):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        for index, (lat, lng) in enumerate(zip(lats, lngs)):
+            self.cells[self._cell(lat), self._cell(lng)].append(index)
+
+    def _cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def near(self, lat, lng, radius):
+        """Indices of the points in the cells within ``radius`` meters of the point (a superset)."""
+        reach_lat = math.ceil(radius / METERS_PER_DEGREE / self.cell_size)
+        meters_per_lng_degree = METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+        reach_lng = math.ceil(radius / meters_per_lng_degree / self.cell_size)
+        i, j = self._cell(lat), self._cell(lng)
+        found = []
+        for di in range(-reach_lat, reach_lat + 1):
+            for dj in range(-reach_lng, reach_lng + 1):
+                found.extend(self.cells.get((i + di, j + dj), ()))
+        return found
+
+
+def available_agents():
+    """Active agents with a tricycle and a position, with the load of the orders they already hold."""
+    return list(
+        AgentCommercial.objects.exclude(statut=AgentCommercial.Status.INACTIF).filter(
+            tricycle_assigne__is_active=True,
+            current_latitude__isnull=False, current_longitude__isnull=False,
+        ).annotate(
+            load=Sum('commandes_assignees__qt_commandee', filter=Q(
+                commandes_assignees__statut__in=[Commande.Status.EN_ATTENTE, Commande.Status.EN_COURS]
+            ))
+        ).values('id', 'current_latitude', 'current_longitude', 'zone_assigned', 'load')
+    )
+
+
+def candidate_pairs(orders, agents, max_distance, penalty, cell_size):
+    """(order index, agent index, cost, distance) arrays of every order/agent pair within max_distance."""
+    agent_lats = np.array([float(agent['current_latitude']) for agent in agents])
+    agent_lngs = np.array([float(agent['current_longitude']) for agent in agents])
+    agent_zones = np.array([agent['zone_assigned'] or '' for agent in agents], dtype=object)
+    grid = PointGrid(agent_lats, agent_lngs, cell_size)
+
+    order_ids, agent_ids, costs, distances = [], [], [], []
+    for index, order in enumerate(orders):
+        lat, lng = float(order['client__latitude']), float(order['client__longitude'])
+        candidates = np.asarray(grid.near(lat, lng, max_distance), dtype=np.int64)
+        if not len(candidates):
+            continue
+        distance = haversine_array(lat, lng, agent_lats[candidates], agent_lngs[candidates])
+        within = distance <= max_distance
+        candidates, distance = candidates[within], distance[within]
+        cost = distance.copy()
+        if order['client__zone']:
+            cost[agent_zones[candidates] != order['client__zone']] += penalty
+        order_ids.append(np.full(len(candidates), index))
+        agent_ids.append(candidates)
+        costs.append(cost)
+        distances.append(distance)
+    if not order_ids:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([]), np.array([])
+    return np.concatenate(order_ids), np.concatenate(agent_ids), np.concatenate(costs), np.concatenate(distances)
+
+
+def dispatch_pending_orders(dry_run=False, capacity=None):
+    """
+    Assign the pending orders; with dry_run, only compute the assignment.
+
+    Returns {'assigned': [{'commande_id', 'agent_id', 'distance_m'}],
+    'unassigned': [{'commande_id', 'reason'}]}, reason being 'no_location',
+    'no_agent_in_range' or 'no_capacity'.
+    """
+    capacity = float(capacity or getattr(settings, 'TRICYCLE_CAPACITY', 500))
+    max_distance = getattr(settings, 'DISPATCH_MAX_DISTANCE_M', 10000)
+    penalty = getattr(settings, 'DISPATCH_OUT_OF_ZONE_PENALTY_M', 2000)
+    cell_size = getattr(settings, 'DISPATCH_CELL_SIZE', 0.05)
+
+    with transaction.atomic():
+        # Orders being dispatched by a concurrent run are left to it
+        pending = list(
+            Commande.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                statut=Commande.Status.EN_ATTENTE, agent_assigne__isnull=True
+            ).order_by('date_commande', 'id').values(
+                'id', 'qt_commandee', 'client__latitude', 'client__longitude', 'client__zone'
+            )
+        )
+        unassigned = [
+            {'commande_id': str(order['id']), 'reason': 'no_location'}
+            for order in pending if order['client__latitude'] is None or order['client__longitude'] is None
+        ]
+        orders = [order for order in pending if order['client__latitude'] is not None and order['client__longitude'] is not None]
+        agents = available_agents() if orders else []
+
+        owner = [None] * len(orders)
+        distance_to = [None] * len(orders)
+        reachable = np.zeros(len(orders), dtype=bool)
+        if agents:
+            order_idx, agent_idx, costs, distances = candidate_pairs(orders, agents, max_distance, penalty, cell_size)
+            reachable[order_idx] = True
+            remaining = [capacity - float(agent['load'] or 0) for agent in agents]
+            for pair in np.argsort(costs, kind='stable'):
+                order, agent = int(order_idx[pair]), int(agent_idx[pair])
+                if owner[order] is not None or orders[order]['qt_commandee'] > remaining[agent]:
+                    continue
+                owner[order] = agent
+                distance_to[order] = float(distances[pair])
+                remaining[agent] -= orders[order]['qt_commandee']
+
+        assigned, owners = [], []
+        for index, order in enumerate(orders):
+            if owner[index] is None:
+                reason = 'no_capacity' if reachable[index] else 'no_agent_in_range'
+                unassigned.append({'commande_id': str(order['id']), 'reason': reason})
+                continue
+            agent_id = agents[owner[index]]['id']
+            assigned.append({
+                'commande_id': str(order['id']), 'agent_id': str(agent_id),
+                'distance_m': round(distance_to[index], 1),
+            })
+            owners.append((order['id'], agent_id))
+
+        if owners and not dry_run:
+            # An order binds its pk in WHERE and in CASE, and at worst its own agent: the
+            # fourth share leaves room for the statut and updated_at values
+            batch_size = connections[router.db_for_write(Commande)].ops.bulk_batch_size(
+                ['pk', 'pk', 'agent_assigne', 'statut'], owners
+            ) or len(owners)
+            for start in range(0, len(owners), batch_size):
+                # One UPDATE per batch, with one CASE branch per agent
+                batch = owners[start:start + batch_size]
+                by_agent = defaultdict(list)
+                for order_id, agent_id in batch:
+                    by_agent[agent_id].append(order_id)
+                bulk_touch(Commande, Commande.objects.filter(pk__in=[order_id for order_id, _ in batch]), {
+                    'agent_assigne': Case(
+                        *[When(pk__in=ids, then=Value(agent_id)) for agent_id, ids in by_agent.items()],
+                        output_field=UUIDField(),
+                    ),
+                    'statut': Commande.Status.EN_COURS,
+                })
+    return {'assigned': assigned, 'unassigned': unassigned}
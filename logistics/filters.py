@@ -0,0 +1,43 @@
+"""
+Query-string filters.
+
+LogActiviteFilter searches the audit log. Every filter has a composite
+index ending with (timestamp, id), so a filtered page in keyset mode
+(``?cursor=``) stays a range scan whatever the size of the log.
+"""
+from django import forms
+from django.db import connections
+from django_filters import rest_framework as filters
+
+from .models import LogActivite
+
+
+class JSONFilter(filters.Filter):
+    field_class = forms.JSONField
+
+
+class LogActiviteFilter(filters.FilterSet):
+    user = filters.UUIDFilter(field_name='user_id')
+    action_prefix = filters.CharFilter(field_name='action', lookup_expr='startswith')
+    since = filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='gte')
+    until = filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='lt')
+    # Generated columns are not mapped by django-filter: declared explicitly
+    path = filters.CharFilter()
+    status_code = filters.CharFilter()
+    details = JSONFilter(
+        method='filter_details',
+        help_text='JSON object the entry details must contain, e.g. {"status": 404}',
+    )
+
+    class Meta:
+        model = LogActivite
+        fields = ['user', 'action', 'action_prefix', 'ip_address', 'path', 'status_code', 'since', 'until', 'details']
+
+    def filter_details(self, queryset, name, value):
+        if not isinstance(value, dict):
+            return queryset.none()
+        if connections[queryset.db].vendor == 'postgresql':
+            # @> on the jsonb_path_ops GIN index
+            return queryset.filter(details__contains=value)
+        # Other databases have no containment lookup: match the top-level keys
+        return queryset.filter(**{f'details__{key}': item for key, item in value.items()})
@@ -0,0 +1,296 @@
+"""
+Geometry helpers: service zones and distances.
+
+Zones are compiled once per process into a ZoneIndex: circles and polygons
+are parsed into plain floats, their bounding boxes are bucketed into a
+regular lat/lng grid, and a point lookup only tests the handful of zones
+whose boxes share the point's cell.
+
+Distances are great-circle (haversine); bulk work uses the NumPy variant
+over whole chunks of rows instead of model instances.
+"""
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.dispatch import Signal
+
+from .caching import bulk_touch
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+
+class CompiledZone:
+    """A zone reduced to floats, with its bounding box."""
+    __slots__ = ('id', 'zone_type', 'lat', 'lng', 'radius', 'polygon', 'bbox', 'area')
+
+    def __init__(self, zone):
+        self.id = zone.id
+        self.zone_type = zone.zone_type
+        self.lat = float(zone.center_latitude)
+        self.lng = float(zone.center_longitude)
+        self.radius = float(zone.radius or 0)
+        self.polygon = None
+        if zone.zone_type == 'polygon' and zone.polygon_points and len(zone.polygon_points) >= 3:
+            self.polygon = [(float(lat), float(lng)) for lat, lng in zone.polygon_points]
+            lats = [lat for lat, _ in self.polygon]
+            lngs = [lng for _, lng in self.polygon]
+            self.bbox = (min(lats), min(lngs), max(lats), max(lngs))
+            self.area = (self.bbox[2] - self.bbox[0]) * (self.bbox[3] - self.bbox[1])
+        else:
+            dlat = self.radius / METERS_PER_DEGREE
+            dlng = self.radius / (METERS_PER_DEGREE * max(math.cos(math.radians(self.lat)), 1e-6))
+            self.bbox = (self.lat - dlat, self.lng - dlng, self.lat + dlat, self.lng + dlng)
+            self.area = math.pi * dlat * dlng
+
+    def contains(self, lat, lng):
+        min_lat, min_lng, max_lat, max_lng = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            return False
+        if self.polygon is not None:
+            return point_in_polygon(lat, lng, self.polygon)
+        return haversine(self.lat, self.lng, lat, lng) <= self.radius
+
+
+class ZoneIndex:
+    """Grid-bucketed point-in-zone lookups over a set of compiled zones."""
+
+    def __init__(self, zones, cell_size=None):
+        self.cell_size = cell_size or getattr(settings, 'ZONE_INDEX_CELL_SIZE', 0.01)
+        self.zones = []
+        for zone in zones:
+            try:
+                self.zones.append(CompiledZone(zone))
+            except (TypeError, ValueError) as e:
+                # A malformed zone must not break every client and agent save
+                logger.error('Zone %s left out of the zone index: %s', zone.id, e)
+        # Most specific (smallest) zone first when zones overlap
+        self.zones.sort(key=lambda zone: zone.area)
+        self.grid = defaultdict(list)
+        for zone in self.zones:
+            min_lat, min_lng, max_lat, max_lng = zone.bbox
+            for i in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                for j in range(self._cell(min_lng), self._cell(max_lng) + 1):
+                    self.grid[(i, j)].append(zone)
+
+    def _cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def zones_at(self, lat, lng):
+        """All zones containing the point, smallest first."""
+        lat, lng = float(lat), float(lng)
+        candidates = self.grid.get((self._cell(lat), self._cell(lng)), ())
+        return [zone.id for zone in candidates if zone.contains(lat, lng)]
+
+    def locate(self, lat, lng):
+        """Id of the most specific zone containing the point, or None."""
+        if lat is None or lng is None:
+            return None
+        lat, lng = float(lat), float(lng)
+        for zone in self.grid.get((self._cell(lat), self._cell(lng)), ()):
+            if zone.contains(lat, lng):
+                return zone.id
+        return None
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def haversine_array(lat1, lng1, lat2, lng2):
+    """Vectorized haversine over NumPy arrays (degrees in, meters out)."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def proximity_threshold():
+    return getattr(settings, 'PROXIMITY_THRESHOLD_METERS', 2)
+
+
+def is_within_proximity(lat1, lng1, lat2, lng2, threshold=None):
+    """True when both points are known and closer than the threshold."""
+    if None in (lat1, lng1, lat2, lng2):
+        return False
+    threshold = proximity_threshold() if threshold is None else threshold
+    return haversine(float(lat1), float(lng1), float(lat2), float(lng2)) <= threshold
+
+
+def point_in_polygon(lat, lng, polygon):
+    """Even-odd ray casting over [(lat, lng), ...]."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = (lng_j - lng_i) * (lat - lat_i) / (lat_j - lat_i) + lng_i
+            if lng < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+# Process-wide index. Saving a zone bumps a version in the shared cache so
+# other workers rebuild on their next check (at most every
+# ZONE_INDEX_CHECK_INTERVAL seconds).
+ZONE_INDEX_VERSION_KEY = 'logistics:zone-index-version'
+_index_lock = threading.Lock()
+_index = None
+_index_version = None
+_index_checked_at = 0.0
+
+
+def get_zone_index():
+    global _index, _index_version, _index_checked_at
+    now = time.monotonic()
+    interval = getattr(settings, 'ZONE_INDEX_CHECK_INTERVAL', 5)
+    if _index is not None and now - _index_checked_at < interval:
+        return _index
+
+    version = cache.get(ZONE_INDEX_VERSION_KEY)
+    with _index_lock:
+        if _index is None or version != _index_version:
+            from .models import Zone
+            _index = ZoneIndex(Zone.objects.filter(is_active=True))
+            _index_version = version
+        _index_checked_at = now
+        return _index
+
+
+def invalidate_zone_index():
+    global _index
+    with _index_lock:
+        _index = None
+    try:
+        cache.incr(ZONE_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(ZONE_INDEX_VERSION_KEY, 1, None)
+
+
+# Sent by reassign_zones, whose bulk_update sends no post_save, with
+# ``changes``: {client_id: (old_zone, new_zone)}
+clients_rezoned = Signal()
+
+
+def pk_chunks(queryset, chunk_size):
+    """Lists of instances of ``queryset``, in primary-key order, ``chunk_size`` at a time."""
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def reassign_zones(chunk_size=2000):
+    """
+    Recompute Client.zone and AgentCommercial.zone_assigned after a zone change,
+    ``chunk_size`` rows in memory and one bulk_update at a time.
+    """
+    from .models import AgentCommercial, Client
+    index = get_zone_index()
+
+    clients_changed = 0
+    for chunk in pk_chunks(
+        Client.objects.exclude(latitude=None).exclude(longitude=None).only('id', 'zone', 'latitude', 'longitude'),
+        chunk_size
+    ):
+        clients, changes = [], {}
+        for client in chunk:
+            zone = index.locate(client.latitude, client.longitude)
+            if zone != client.zone:
+                changes[client.pk] = (client.zone, zone)
+                client.zone = zone
+                clients.append(client)
+        with transaction.atomic():
+            bulk_touch(Client, clients, ['zone'], batch_size=500)
+            if changes:
+                clients_rezoned.send(sender=Client, changes=changes)
+        clients_changed += len(clients)
+
+    agents_changed = 0
+    for chunk in pk_chunks(
+        AgentCommercial.objects.exclude(current_latitude=None).exclude(current_longitude=None).only(
+            'id', 'zone_assigned', 'current_latitude', 'current_longitude'
+        ),
+        chunk_size
+    ):
+        agents = []
+        for agent in chunk:
+            zone = index.locate(agent.current_latitude, agent.current_longitude)
+            if zone is not None and zone != agent.zone_assigned:
+                agent.zone_assigned = zone
+                agents.append(agent)
+        bulk_touch(AgentCommercial, agents, ['zone_assigned'], batch_size=500)
+        agents_changed += len(agents)
+    return clients_changed, agents_changed
+
+
+def rescore_proximity(queryset=None, chunk_size=50000, threshold=None):
+    """
+    Recompute Livraison.proximity_validated for a whole queryset.
+
+    Rows are read as plain tuples in primary-key order, chunk by chunk,
+    scored with haversine_array and written back with one UPDATE per
+    direction (rows flipping to True, rows flipping to False), split only
+    where the backend limits query parameters. Deliveries
+    without GPS or client coordinates are scored False.
+    Returns (scanned, changed).
+    """
+    from .models import Livraison
+    if queryset is None:
+        queryset = Livraison.objects.all()
+    threshold = proximity_threshold() if threshold is None else threshold
+    queryset = queryset.order_by('pk').values_list(
+        'pk', 'gps_latitude', 'gps_longitude', 'client__latitude', 'client__longitude', 'proximity_validated'
+    )
+
+    scanned = changed = 0
+    last_pk = None
+    while True:
+        chunk_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk_qs[:chunk_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        pks = np.array([row[0] for row in rows], dtype=object)
+        coords = np.array(
+            [[np.nan if value is None else float(value) for value in row[1:5]] for row in rows],
+            dtype=np.float64
+        )
+        current = np.array([row[5] for row in rows], dtype=bool)
+
+        distances = haversine_array(coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3])
+        scored = np.nan_to_num(distances, nan=np.inf) <= threshold
+        flipped_on = pks[scored & ~current].tolist()
+        flipped_off = pks[~scored & current].tolist()
+        for ids, value in ((flipped_on, True), (flipped_off, False)):
+            if not ids:
+                continue
+            batch_size = connections[queryset.db].ops.bulk_batch_size(['pk'], ids) or len(ids)
+            for start in range(0, len(ids), batch_size):
+                bulk_touch(
+                    Livraison, Livraison.objects.filter(pk__in=ids[start:start + batch_size]),
+                    {'proximity_validated': value}
+                )
+
+        scanned += len(rows)
+        changed += len(flipped_on) + len(flipped_off)
+    return scanned, changed
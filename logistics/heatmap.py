@@ -0,0 +1,167 @@
+"""
+Incrementally maintained delivery heatmap.
+
+Delivered Livraison rows are bucketed per day into square lat/lng cells at
+each size in HEATMAP_CELL_SIZES (coarse to fine). Cell indices are computed
+on integer microdegrees so Python and stored decimals always agree on the
+bucket. Saving or deleting a delivery applies the difference between its
+old and new contribution; `rebuild_heatmap` recomputes a date range from
+scratch (e.g. after bulk imports that bypass signals).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .caching import invalidate_tags
+from .counters import upsert_increment
+
+MICRODEGREES = 1000000
+
+
+def cell_sizes():
+    """Cell sizes in microdegrees, coarse to fine."""
+    sizes = getattr(settings, 'HEATMAP_CELL_SIZES', (0.1, 0.01, 0.001))
+    return [int(Decimal(str(size)) * MICRODEGREES) for size in sizes]
+
+
+def to_micro(value):
+    return int((Decimal(str(value)) * MICRODEGREES).to_integral_value())
+
+
+def cell_index(value, level):
+    return to_micro(value) // cell_sizes()[level]
+
+
+def cell_center(index, level):
+    size = cell_sizes()[level]
+    return (index * size + size / 2) / MICRODEGREES
+
+
+def contribution(statut, date_heure, lat, lng, quantity, amount):
+    """(day, lat, lng, quantity, amount) a delivery adds to the heatmap, or None."""
+    from .models import Livraison
+    if statut != Livraison.Status.LIVRE or lat is None or lng is None or date_heure is None:
+        return None
+    return timezone.localdate(date_heure), lat, lng, quantity or 0, Decimal(amount or 0)
+
+
+SNAPSHOT_FIELDS = ('statut', 'date_heure', 'gps_latitude', 'gps_longitude', 'client_id', 'quantite_livree', 'montant_total')
+
+
+def snapshot(state):
+    """The fields the heatmap depends on, from a delivery state of logistics.signals (or None)."""
+    if state is None:
+        return None
+    return tuple(state[field] for field in SNAPSHOT_FIELDS)
+
+
+def snapshot_contribution(state, livraison):
+    """Contribution recorded in a snapshot taken before the delivery changed."""
+    if state is None:
+        return None
+    statut, date_heure, lat, lng, client_id, quantity, amount = state
+    if (lat is None or lng is None) and client_id:
+        if client_id == livraison.client_id:
+            lat, lng = livraison.client.latitude, livraison.client.longitude
+        else:
+            from .models import Client
+            lat, lng = Client.objects.filter(pk=client_id).values_list('latitude', 'longitude').first() or (None, None)
+    return contribution(statut, date_heure, lat, lng, quantity, amount)
+
+
+def apply_contribution(value, sign):
+    """Add (sign=1) or remove (sign=-1) a contribution from every level."""
+    if value is None:
+        return
+    from .models import HeatmapCell
+    day, lat, lng, quantity, amount = value
+    for level in range(len(cell_sizes())):
+        key = {
+            'level': level,
+            'day': day,
+            'lat_index': cell_index(lat, level),
+            'lng_index': cell_index(lng, level),
+        }
+        upsert_increment(HeatmapCell, key, {
+            'deliveries_count': sign, 'quantity': sign * quantity, 'amount': sign * amount,
+        })
+
+
+def rebuild_heatmap(start, end, chunk_size=20000):
+    """Recompute every cell for days in [start, end]. Returns the number of cells written."""
+    from .models import HeatmapCell, Livraison
+    totals = defaultdict(lambda: [0, 0, Decimal(0)])
+    rows = Livraison.objects.filter(
+        statut=Livraison.Status.LIVRE,
+        date_heure__date__gte=start,
+        date_heure__date__lte=end,
+    ).values_list(
+        'date_heure', 'gps_latitude', 'gps_longitude', 'client__latitude', 'client__longitude',
+        'quantite_livree', 'montant_total'
+    )
+    levels = range(len(cell_sizes()))
+    for date_heure, gps_lat, gps_lng, client_lat, client_lng, quantity, amount in rows.iterator(chunk_size=chunk_size):
+        lat, lng = (gps_lat, gps_lng) if gps_lat is not None and gps_lng is not None else (client_lat, client_lng)
+        value = contribution(Livraison.Status.LIVRE, date_heure, lat, lng, quantity, amount)
+        if value is None:
+            continue
+        day, lat, lng, quantity, amount = value
+        for level in levels:
+            cell = totals[(level, day, cell_index(lat, level), cell_index(lng, level))]
+            cell[0] += 1
+            cell[1] += quantity
+            cell[2] += amount
+
+    with transaction.atomic():
+        HeatmapCell.objects.filter(day__gte=start, day__lte=end).delete()
+        HeatmapCell.objects.bulk_create([
+            HeatmapCell(
+                level=level, day=day, lat_index=lat_index, lng_index=lng_index,
+                deliveries_count=count, quantity=quantity, amount=amount
+            )
+            for (level, day, lat_index, lng_index), (count, quantity, amount) in totals.items()
+        ], batch_size=1000)
+    transaction.on_commit(lambda: invalidate_tags('Livraison'))
+    return len(totals)
+
+
+def pick_level(south, west, north, east):
+    """Finest level whose cells covering the viewport stay under HEATMAP_MAX_CELLS."""
+    max_cells = getattr(settings, 'HEATMAP_MAX_CELLS', 10000)
+    best = 0
+    for level, size in enumerate(cell_sizes()):
+        rows = (to_micro(north) - to_micro(south)) // size + 1
+        cols = (to_micro(east) - to_micro(west)) // size + 1
+        if rows * cols > max_cells:
+            break
+        best = level
+    return best
+
+
+def query_heatmap(start, end, level, bounds=None):
+    """Sum the cells of one level over a date range, optionally inside (south, west, north, east)."""
+    from .models import HeatmapCell
+    cells = HeatmapCell.objects.filter(level=level, day__gte=start, day__lte=end)
+    if bounds is not None:
+        south, west, north, east = bounds
+        cells = cells.filter(
+            lat_index__gte=cell_index(south, level), lat_index__lte=cell_index(north, level),
+            lng_index__gte=cell_index(west, level), lng_index__lte=cell_index(east, level),
+        )
+    cells = cells.values('lat_index', 'lng_index').annotate(
+        count=Sum('deliveries_count'), total_quantity=Sum('quantity'), total_amount=Sum('amount')
+    ).filter(count__gt=0)
+    return [
+        {
+            'lat': round(cell_center(cell['lat_index'], level), 6),
+            'lng': round(cell_center(cell['lng_index'], level), 6),
+            'count': cell['count'],
+            'quantity': cell['total_quantity'],
+            'amount': cell['total_amount'],
+        }
+        for cell in cells
+    ]
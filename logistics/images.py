@@ -0,0 +1,141 @@
+"""
+Processing of delivery proof photos and signatures.
+
+Uploads are stored as received and only queued (an ImageJob per new file)
+on the request thread. The process_images worker then, with Pillow:
+
+- applies the EXIF orientation and re-encodes the image within
+  IMAGE_MAX_DIMENSION pixels, without its EXIF data (GPS position, device),
+  replacing the upload;
+- writes a preview (IMAGE_PREVIEW_SIZE) and a thumbnail
+  (IMAGE_THUMBNAIL_SIZE) next to it, recorded in the delivery's
+  ``<field>_variants``.
+
+Photos are encoded as JPEG, images with transparency (signatures) as PNG.
+A job whose file was replaced in the meantime is dropped, the newer upload
+having its own job. Failures are retried like outgoing emails (see
+accounts.outbox.record_failure), after IMAGE_JOB_RETRY_DELAY seconds
+doubled on each attempt and up to IMAGE_JOB_MAX_ATTEMPTS.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from accounts.outbox import record_failure
+
+from .caching import bulk_touch
+from .models import ImageJob, Livraison
+
+# Image field -> field holding its variants
+IMAGE_FIELDS = {
+    'photo_preuve': 'photo_preuve_variants',
+    'signature_url': 'signature_variants',
+}
+
+
+def queue_image_jobs(livraison):
+    """Queue the image fields of the delivery that hold an unprocessed upload."""
+    for field, variants_field in IMAGE_FIELDS.items():
+        name = getattr(livraison, field).name
+        if name and getattr(livraison, variants_field).get('source') != name:
+            ImageJob.objects.get_or_create(livraison=livraison, field=field, source=name)
+
+
+def variant_sizes():
+    return {
+        'source': getattr(settings, 'IMAGE_MAX_DIMENSION', 2048),
+        'preview': getattr(settings, 'IMAGE_PREVIEW_SIZE', 1024),
+        'thumbnail': getattr(settings, 'IMAGE_THUMBNAIL_SIZE', 320),
+    }
+
+
+def encode(image, size, fmt):
+    """``image`` fitted within size x size pixels, encoded without metadata."""
+    resized = image.copy()
+    resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        resized.save(buffer, 'JPEG', quality=getattr(settings, 'IMAGE_JPEG_QUALITY', 82), optimize=True, progressive=True)
+    else:
+        resized.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def render_variants(storage, source):
+    """Write the re-encoded image and its variants. Returns {'source', 'preview', 'thumbnail'} file names."""
+    with storage.open(source) as f:
+        image = Image.open(f)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    transparent = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if transparent:
+        image, fmt, extension = image.convert('RGBA'), 'PNG', 'png'
+    else:
+        image, fmt, extension = image.convert('RGB'), 'JPEG', 'jpg'
+
+    stem = os.path.splitext(source)[0]
+    names = {}
+    for variant, size in variant_sizes().items():
+        suffix = '' if variant == 'source' else f'_{variant}'
+        names[variant] = storage.save(f'{stem}{suffix}.{extension}', ContentFile(encode(image, size, fmt)))
+    return names
+
+
+def delete_files(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def process_job(job, now):
+    field = Livraison._meta.get_field(job.field)
+    storage = field.storage
+    names = render_variants(storage, job.source)
+    # Only applies if the field still holds the processed upload
+    updated = bulk_touch(Livraison, Livraison.objects.filter(pk=job.livraison_id, **{job.field: job.source}), {
+        job.field: names['source'],
+        IMAGE_FIELDS[job.field]: names,
+    })
+    # Replaced upload, or the whole render if a newer upload superseded it
+    obsolete = [job.source] if updated else list(names.values())
+    transaction.on_commit(lambda: delete_files(storage, obsolete))
+    job.attempts += 1
+    job.status = ImageJob.Status.DONE
+    job.processed_at = now
+
+
+def process_image_jobs(batch_size=None):
+    """Process one batch of due image jobs. Returns (processed, failed)."""
+    batch_size = batch_size or getattr(settings, 'IMAGE_JOB_BATCH_SIZE', 20)
+    retry = (getattr(settings, 'IMAGE_JOB_MAX_ATTEMPTS', 3), getattr(settings, 'IMAGE_JOB_RETRY_DELAY', 60))
+    now = timezone.now()
+    processed = failed = 0
+    with transaction.atomic():
+        # Concurrent workers skip the jobs another one is processing
+        batch = list(
+            ImageJob.objects.select_for_update(skip_locked=True).filter(
+                status=ImageJob.Status.PENDING, next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        for job in batch:
+            try:
+                process_job(job, now)
+            except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, ValueError) as e:
+                # Not an image Pillow can decode: retrying will not help
+                record_failure(job, e, now, *retry, permanent=True)
+                failed += 1
+            except OSError as e:
+                record_failure(job, e, now, *retry)
+                failed += 1
+            else:
+                processed += 1
+
+        ImageJob.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'processed_at'])
+    return processed, failed
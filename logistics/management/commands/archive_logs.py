@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from logistics.audit import archive_logs
+
+
+class Command(BaseCommand):
+    help = 'Moves the LogActivite months older than the retention period to gzipped JSONL archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, help='Recent months kept in the table, defaults to AUDIT_RETENTION_MONTHS')
+        parser.add_argument('--dir', help='Archive directory, defaults to AUDIT_ARCHIVE_DIR')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Entries archived and deleted per transaction')
+
+    def handle(self, *args, **options):
+        if options['keep_months'] is not None and options['keep_months'] < 1:
+            raise CommandError('--keep-months must be at least 1')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        archived = archive_logs(options['keep_months'], options['dir'], options['chunk_size'])
+        for month, count in archived.items():
+            self.stdout.write(f'{month}: {count} entries archived')
+        self.stdout.write(self.style.SUCCESS(f'Archive done: {sum(archived.values())} entries in {len(archived)} months'))
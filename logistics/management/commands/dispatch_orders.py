@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from logistics.dispatch import dispatch_pending_orders
+
+
+class Command(BaseCommand):
+    help = 'Assigns pending orders to the nearest available agents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Compute the assignment without saving it')
+        parser.add_argument('--capacity', type=float, help='Tricycle capacity, defaults to TRICYCLE_CAPACITY')
+
+    def handle(self, *args, **options):
+        if options['capacity'] is not None and options['capacity'] <= 0:
+            raise CommandError('--capacity must be positive')
+
+        result = dispatch_pending_orders(dry_run=options['dry_run'], capacity=options['capacity'])
+        reasons = {}
+        for order in result['unassigned']:
+            reasons[order['reason']] = reasons.get(order['reason'], 0) + 1
+        left = ', '.join(f'{count} {reason}' for reason, count in sorted(reasons.items())) or 'none'
+        verb = 'would be assigned' if options['dry_run'] else 'assigned'
+        self.stdout.write(self.style.SUCCESS(f"{len(result['assigned'])} orders {verb}; left pending: {left}"))
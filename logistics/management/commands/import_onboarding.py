@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from logistics.onboarding import ONBOARDINGS, import_records, parse_records
+
+
+class Command(BaseCommand):
+    help = 'Creates agents or clients, with their user accounts, from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(ONBOARDINGS))
+        parser.add_argument('path', help='CSV file with a header row, or JSON list of objects')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension')
+        parser.add_argument('--password', help='Password of the created accounts, defaults to the usual onboarding one')
+        parser.add_argument('--unverified', action='store_true', help='Leave accounts unverified and queue verification emails')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        try:
+            records = parse_records(path.read_bytes(), fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        result = import_records(
+            options['kind'], records, password=options['password'],
+            verified=not options['unverified'], chunk_size=options['chunk_size']
+        )
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} {options['kind']} created, {len(result['errors'])} rows rejected"
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from logistics.images import process_image_jobs
+
+
+class Command(BaseCommand):
+    help = 'Re-encodes uploaded delivery photos and signatures and renders their variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Images processed per transaction, defaults to IMAGE_JOB_BATCH_SIZE')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for uploads instead of exiting once the queue is drained')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds to wait when the queue is empty (with --loop)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        total_processed = total_failed = 0
+        while True:
+            processed, failed = process_image_jobs(options['batch_size'])
+            total_processed += processed
+            total_failed += failed
+            if processed or failed:
+                self.stdout.write(f'Processed {processed} images, {failed} failed')
+            if processed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Image queue drained: {total_processed} processed, {total_failed} failed'))
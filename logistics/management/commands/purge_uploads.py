@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from logistics.uploads import purge_upload_sessions
+
+
+class Command(BaseCommand):
+    help = 'Deletes the resumable upload sessions idle for UPLOAD_SESSION_TTL seconds and their partial files'
+
+    def handle(self, *args, **options):
+        count = purge_upload_sessions()
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} upload sessions'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from logistics.geo import rescore_proximity
+from logistics.models import Livraison
+
+
+class Command(BaseCommand):
+    help = 'Re-scores Livraison.proximity_validated for the whole delivery history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows scored per chunk')
+        parser.add_argument('--threshold', type=float, default=None, help='Distance in meters (defaults to PROXIMITY_THRESHOLD_METERS)')
+        parser.add_argument('--since', default=None, help='Only deliveries on or after this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        queryset = Livraison.objects.all()
+        if options['since']:
+            queryset = queryset.filter(date_heure__date__gte=options['since'])
+
+        scanned, changed = rescore_proximity(
+            queryset, chunk_size=options['chunk_size'], threshold=options['threshold']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{scanned} deliveries scored, {changed} updated'))
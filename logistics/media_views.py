@@ -0,0 +1,174 @@
+"""
+Serving of delivery proof images.
+
+Photos and signatures are only reachable through ProofMediaView, which
+checks that the user may see the delivery (an admin, its agent or its
+client) and then:
+
+- answers If-None-Match / If-Modified-Since with 304 Not Modified, from an
+  ETag built on the file's name, size and modification time;
+- hands the file to the front server with X-Accel-Redirect (nginx) or
+  X-Sendfile (Apache) when MEDIA_SERVE_MODE says so, or streams it with
+  FileResponse, honouring a single ``Range`` (and ``If-Range``) with 206.
+
+Stored names never change content (every upload and rendered variant gets
+a name not used before, see UniqueUploadPath), so responses carry
+``Cache-Control: private, immutable`` for MEDIA_CACHE_MAX_AGE: a proof
+viewed again is served from the browser cache without reaching the server.
+
+Only JPEG, PNG and WebP are served with their own type. Anything else
+(an SVG or HTML file would run scripts on the API origin) is sent as an
+``application/octet-stream`` attachment.
+"""
+import hashlib
+import mimetypes
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from .images import IMAGE_FIELDS
+from .models import Livraison
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+INLINE_CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/webp'}
+
+
+def proof_names(row):
+    """Stored names of a delivery's images and their variants."""
+    names = set()
+    for field, variants_field in IMAGE_FIELDS.items():
+        if row[field]:
+            names.add(row[field])
+            names.update(name for key, name in (row[variants_field] or {}).items() if key != 'source')
+    return names
+
+
+def byte_range(header, size):
+    """
+    (start, end) of a single ``bytes=`` range, end included, or None to send
+    the whole file (malformed or multiple ranges). Raises ValueError if the
+    range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if not int(last):
+            raise ValueError('Empty suffix range')
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('Range starts past the end of the file')
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def read_range(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        f.close()
+
+
+class ProofMediaView(APIView):
+    """GET livraisons/<id>/media/<name>: a photo, signature or variant of the delivery."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Image requests (Accept: image/*) match no API renderer; the file is served as is
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, pk, name):
+        row = Livraison.objects.filter(pk=pk).values(
+            'agent__user_id', 'client__user_id', *IMAGE_FIELDS, *IMAGE_FIELDS.values()
+        ).first()
+        user = request.user
+        if row is None or (user.user_type != 'admin' and user.pk not in (row['agent__user_id'], row['client__user_id'])):
+            raise Http404
+        if name not in proof_names(row):
+            raise Http404
+
+        storage = Livraison._meta.get_field('photo_preuve').storage
+        try:
+            size = storage.size(name)
+            modified = int(storage.get_modified_time(name).timestamp())
+        except OSError:
+            raise Http404
+        etag = quote_etag(hashlib.md5(f'{name}:{size}:{modified}'.encode()).hexdigest())
+
+        response = get_conditional_response(request, etag=etag, last_modified=modified)
+        if response is None:
+            response = self.file_response(request, storage, name, size, etag, modified)
+        if response.status_code in (200, 206, 304):
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(modified))
+            patch_cache_control(
+                response, private=True, immutable=True,
+                max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 365 * 24 * 3600),
+            )
+        return response
+
+    def file_response(self, request, storage, name, size, etag, modified):
+        response = self.serve(request, storage, name, size, etag, modified)
+        if response['Content-Type'] not in INLINE_CONTENT_TYPES:
+            response['Content-Type'] = 'application/octet-stream'
+            response['Content-Disposition'] = content_disposition_header(True, posixpath.basename(name))
+        # Browsers must not sniff an image into HTML
+        response['X-Content-Type-Options'] = 'nosniff'
+        return response
+
+    def serve(self, request, storage, name, size, etag, modified):
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        mode = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+        if mode == 'x-accel-redirect':
+            # nginx serves the internal location itself, ranges included
+            response = HttpResponse(content_type=content_type)
+            prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+            return response
+        if mode == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = storage.path(name)
+            return response
+
+        header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        # A range of an older version of the file would be corrupt: send it whole
+        if header and (not if_range or if_range in (etag, http_date(modified))):
+            try:
+                requested = byte_range(header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+            if requested is not None:
+                start, end = requested
+                response = StreamingHttpResponse(
+                    read_range(storage.open(name, 'rb'), start, end - start + 1),
+                    status=206, content_type=content_type,
+                )
+                response['Content-Length'] = end - start + 1
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+                response['Accept-Ranges'] = 'bytes'
+                return response
+
+        response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        return response
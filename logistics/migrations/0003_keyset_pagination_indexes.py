@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0002_alter_agentcommercial_date_embauche'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['date_commande', 'id'], name='commande_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livraison',
+            index=models.Index(fields=['date_heure', 'id'], name='livraison_date_heure_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logactivite',
+            index=models.Index(fields=['timestamp', 'id'], name='logactivite_timestamp_id_idx'),
+        ),
+    ]
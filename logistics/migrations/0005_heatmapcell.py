@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0004_agentlocationlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatmapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField(help_text='Index into HEATMAP_CELL_SIZES')),
+                ('lat_index', models.IntegerField()),
+                ('lng_index', models.IntegerField()),
+                ('day', models.DateField()),
+                ('deliveries_count', models.IntegerField(default=0)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('level', 'day', 'lat_index', 'lng_index'), name='heatmapcell_unique_cell')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0005_heatmapcell'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['updated_at'], name='commande_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livraison',
+            index=models.Index(fields=['updated_at'], name='livraison_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+def create_details_gin_index(apps, schema_editor):
+    # details__contains (@>) is only indexable, and only supported, on PostgreSQL
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS logactivite_details_gin_idx '
+            'ON logistics_logactivite USING gin (details jsonb_path_ops)'
+        )
+
+
+def drop_details_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS logactivite_details_gin_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0007_logactivite_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logactivite',
+            name='path',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.fields.json.KeyTextTransform('path', 'details'), output_field=models.TextField()),
+        ),
+        migrations.AddField(
+            model_name='logactivite',
+            name='status_code',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.fields.json.KeyTextTransform('status', 'details'), output_field=models.TextField()),
+        ),
+        migrations.AddIndex(
+            model_name='logactivite',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='logactivite_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logactivite',
+            index=models.Index(fields=['action', 'timestamp', 'id'], name='logactivite_action_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logactivite',
+            index=models.Index(fields=['ip_address', 'timestamp', 'id'], name='logactivite_ip_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logactivite',
+            index=models.Index(fields=['path', 'timestamp', 'id'], name='logactivite_path_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logactivite',
+            index=models.Index(fields=['status_code', 'timestamp', 'id'], name='logactivite_status_ts_idx'),
+        ),
+        migrations.RunPython(create_details_gin_index, drop_details_gin_index),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0008_logactivite_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livraison',
+            name='photo_preuve_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='livraison',
+            name='signature_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(help_text='Image field of the delivery', max_length=30)),
+                ('source', models.CharField(help_text='Uploaded file to process', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('livraison', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='logistics.livraison')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='logistics_i_status_9635aa_idx')],
+                'constraints': [models.UniqueConstraint(fields=('livraison', 'field', 'source'), name='imagejob_unique_source')],
+            },
+        ),
+    ]
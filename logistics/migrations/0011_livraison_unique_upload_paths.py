@@ -0,0 +1,22 @@
+import logistics.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0010_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='livraison',
+            name='photo_preuve',
+            field=models.ImageField(blank=True, null=True, upload_to=logistics.models.UniqueUploadPath('preuves_livraison/%Y/%m/')),
+        ),
+        migrations.AlterField(
+            model_name='livraison',
+            name='signature_url',
+            field=models.ImageField(blank=True, null=True, upload_to=logistics.models.UniqueUploadPath('signatures/%Y/%m/')),
+        ),
+    ]
@@ -1,7 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.fields.json import KT
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+import os
 import uuid
+from .caching import bulk_touch, invalidate_on_commit
+from .geo import get_zone_index
 
 class Tricycle(models.Model):
     """Tricycle vehicles assigned to agents"""
@@ -47,6 +53,53 @@ class AgentCommercial(models.Model):
         tricycle_str = self.tricycle_assigne.code if self.tricycle_assigne else 'Aucun'
         return f"{self.nom} {self.prenom} ({tricycle_str})"
 
+class AgentLocationLog(models.Model):
+    """Append-only GPS history, written in batches by the agent app"""
+    id = models.BigAutoField(primary_key=True)
+    agent = models.ForeignKey(AgentCommercial, on_delete=models.CASCADE, related_name='location_logs')
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    accuracy = models.FloatField(null=True, blank=True, help_text="Reported accuracy in meters")
+    recorded_at = models.DateTimeField(help_text="Fix timestamp on the device")
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['agent', 'recorded_at'], name='agentlocation_agent_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.agent_id} @ {self.recorded_at}"
+
+    @classmethod
+    def record_batch(cls, agent, fixes):
+        """
+        Store a batch of fixes with one INSERT and move the agent once.
+
+        The current position is only overwritten by a fix newer than the
+        stored one, in a single conditional UPDATE, so late or out-of-order
+        batches never move the agent backwards.
+        """
+        if not fixes:
+            return [], False
+        logs = cls.objects.bulk_create([cls(agent=agent, **fix) for fix in fixes])
+        latest = max(fixes, key=lambda fix: fix['recorded_at'])
+        position = {
+            'current_latitude': latest['latitude'],
+            'current_longitude': latest['longitude'],
+            'last_location_update': latest['recorded_at'],
+        }
+        # update() skips the pre_save signal, so derive the zone here
+        zone = get_zone_index().locate(latest['latitude'], latest['longitude'])
+        if zone is not None:
+            position['zone_assigned'] = zone
+        updated = bulk_touch(AgentCommercial, AgentCommercial.objects.filter(pk=agent.pk).filter(
+            models.Q(last_location_update__isnull=True) |
+            models.Q(last_location_update__lt=latest['recorded_at'])
+        ), position)
+        return logs, bool(updated)
+
 class Client(models.Model):
     class TypeClient(models.TextChoices):
         REVENDEUR = 'revendeur', 'Revendeur'
@@ -101,9 +154,66 @@ class Commande(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination on (date_commande, id)
+            models.Index(fields=['date_commande', 'id'], name='commande_date_id_idx'),
+            # MAX(updated_at) fingerprint for conditional GETs
+            models.Index(fields=['updated_at'], name='commande_updated_at_idx'),
+        ]
+
     def __str__(self):
         return f"Cmd {self.id} - {self.client.nom_point_vente}"
 
+    @classmethod
+    def create_batch(cls, orders):
+        """
+        Create validated orders with one query per referenced model and one INSERT.
+
+        ``orders`` hold the client and agent_assigne ids. Returns one entry per
+        order, in order: the created Commande, or a dict of errors when the
+        client or agent it references does not exist.
+        """
+        clients = Client.objects.in_bulk({order['client'] for order in orders})
+        agent_ids = {order['agent_assigne'] for order in orders if order.get('agent_assigne')}
+        agents = AgentCommercial.objects.in_bulk(agent_ids) if agent_ids else {}
+
+        results = []
+        for order in orders:
+            errors = {}
+            client = clients.get(order['client'])
+            if client is None:
+                errors['client'] = ['Client not found.']
+            agent = agents.get(order.get('agent_assigne'))
+            if order.get('agent_assigne') and agent is None:
+                errors['agent_assigne'] = ['Agent not found.']
+            results.append(errors or cls(**{**order, 'client': client, 'agent_assigne': agent}))
+
+        commandes = [result for result in results if isinstance(result, cls)]
+        if commandes:
+            with transaction.atomic():
+                cls.objects.bulk_create(commandes)
+                invalidate_on_commit(cls.__name__)
+        return results
+
+@deconstructible
+class UniqueUploadPath:
+    """
+    upload_to giving every file a name never used before, so a name can be
+    cached as immutable even after the image pipeline deleted the file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, instance, filename):
+        stem, extension = os.path.splitext(os.path.basename(filename))
+        return f"{timezone.now().strftime(self.directory)}{stem}_{uuid.uuid4().hex[:12]}{extension.lower()}"
+
+    def __eq__(self, other):
+        return isinstance(other, UniqueUploadPath) and other.directory == self.directory
+
+
 class Livraison(models.Model):
     class Status(models.TextChoices):
         EN_PREPARATION = 'en_preparation', 'En Préparation'
@@ -131,32 +241,144 @@ class Livraison(models.Model):
     proximity_validated = models.BooleanField(default=False, help_text="2-meter proximity check passed")
     
     # Proof & validation
-    photo_preuve = models.ImageField(upload_to='preuves_livraison/%Y/%m/', null=True, blank=True)
-    signature_url = models.ImageField(upload_to='signatures/%Y/%m/', null=True, blank=True)
+    photo_preuve = models.ImageField(upload_to=UniqueUploadPath('preuves_livraison/%Y/%m/'), null=True, blank=True)
+    signature_url = models.ImageField(upload_to=UniqueUploadPath('signatures/%Y/%m/'), null=True, blank=True)
+    # Resized copies made by the image pipeline (logistics.images):
+    # {'source': processed image, 'thumbnail': ..., 'preview': ...}
+    photo_preuve_variants = models.JSONField(default=dict, blank=True)
+    signature_variants = models.JSONField(default=dict, blank=True)
     is_validated = models.BooleanField(default=False, help_text="Admin validation")
     validated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='livraisons_validees')
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination on (date_heure, id)
+            models.Index(fields=['date_heure', 'id'], name='livraison_date_heure_id_idx'),
+            # MAX(updated_at) fingerprint for conditional GETs
+            models.Index(fields=['updated_at'], name='livraison_updated_at_idx'),
+        ]
+
     def __str__(self):
         return f"Liv {self.id} - {self.agent.nom} -> {self.client.nom_point_vente}"
 
+    def save(self, *args, **kwargs):
+        # The heatmap, rollups and ledger are updated by pre_save/post_save
+        # receivers: they commit or roll back with the row itself
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+class ImageJob(models.Model):
+    """Uploaded delivery image waiting to be processed by the process_images worker."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    livraison = models.ForeignKey(Livraison, on_delete=models.CASCADE, related_name='image_jobs')
+    field = models.CharField(max_length=30, help_text='Image field of the delivery')
+    source = models.CharField(max_length=255, help_text='Uploaded file to process')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['livraison', 'field', 'source'], name='imagejob_unique_source'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.field} {self.source} ({self.status})"
+
+
+class UploadSession(models.Model):
+    """Resumable upload of a delivery image, received chunk by chunk (see logistics.uploads)."""
+
+    class Status(models.TextChoices):
+        OPEN = 'open', 'Open'
+        COMPLETE = 'complete', 'Complete'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    livraison = models.ForeignKey(Livraison, on_delete=models.CASCADE, related_name='upload_sessions')
+    field = models.CharField(max_length=30, help_text='Image field of the delivery')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text='Total size in bytes')
+    sha256 = models.CharField(max_length=64, blank=True, help_text='Hex digest of the whole file, checked on finalize')
+    received = models.PositiveBigIntegerField(default=0, help_text='Bytes stored so far: the offset of the next chunk')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Purge of abandoned sessions
+            models.Index(fields=['updated_at'], name='uploadsession_updated_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.field} {self.filename} ({self.received}/{self.size})"
+
+
 class LogActivite(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     action = models.CharField(max_length=255)
     details = models.JSONField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set by AuditLogMiddleware to the time of the request, not of the buffered write
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    # details keys searched most often, extracted (as text) into indexed columns
+    path = models.GeneratedField(expression=KT('details__path'), output_field=models.TextField(), db_persist=True)
+    status_code = models.GeneratedField(expression=KT('details__status'), output_field=models.TextField(), db_persist=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination on (timestamp, id)
+            models.Index(fields=['timestamp', 'id'], name='logactivite_timestamp_id_idx'),
+            # Filters of LogActiviteFilter, each followed by the keyset ordering
+            models.Index(fields=['user', 'timestamp', 'id'], name='logactivite_user_ts_idx'),
+            models.Index(fields=['action', 'timestamp', 'id'], name='logactivite_action_ts_idx'),
+            models.Index(fields=['ip_address', 'timestamp', 'id'], name='logactivite_ip_ts_idx'),
+            models.Index(fields=['path', 'timestamp', 'id'], name='logactivite_path_ts_idx'),
+            models.Index(fields=['status_code', 'timestamp', 'id'], name='logactivite_status_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.action} - {self.timestamp}"
 
 
+class HeatmapCell(models.Model):
+    """Daily delivery totals per grid cell, maintained incrementally for the heatmap"""
+    level = models.PositiveSmallIntegerField(help_text="Index into HEATMAP_CELL_SIZES")
+    lat_index = models.IntegerField()
+    lng_index = models.IntegerField()
+    day = models.DateField()
+    deliveries_count = models.IntegerField(default=0)
+    quantity = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'day', 'lat_index', 'lng_index'], name='heatmapcell_unique_cell'),
+        ]
+
+    def __str__(self):
+        return f"L{self.level} ({self.lat_index}, {self.lng_index}) {self.day}"
+
+
 class Zone(models.Model):
     """Service zones for delivery areas on map"""
     class ZoneType(models.TextChoices):
@@ -177,3 +399,15 @@ class Zone(models.Model):
 
     def __str__(self):
         return f"{self.id} - {self.name}"
+
+    def clean(self):
+        # The zone index parses every active polygon: reject what it cannot read
+        if self.zone_type == self.ZoneType.POLYGON:
+            points = self.polygon_points
+            valid = isinstance(points, list) and len(points) >= 3 and all(
+                isinstance(point, list) and len(point) == 2
+                and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in point)
+                for point in points
+            )
+            if not valid:
+                raise ValidationError({'polygon_points': 'A polygon needs at least 3 [lat, lng] pairs of numbers.'})
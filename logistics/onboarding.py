@@ -0,0 +1,239 @@
+"""
+Bulk onboarding of agents and clients.
+
+`import_records` creates, for each valid record, the User, its UserProfile
+and the AgentCommercial or Client, with one bulk_create per model and
+chunk instead of create_user() and the post_save receivers row by row. The
+default password is hashed once and shared by the imported accounts.
+What the bypassed signals would have done is done here in bulk: profile
+codes, zones derived from coordinates, cache eviction, and, for accounts
+left unverified, the EmailVerification rows and their queued emails.
+
+Records are validated with the API serializers; invalid records, emails
+already taken and chunks hitting a constraint are reported per row and do
+not stop the import.
+"""
+import abc
+import csv
+import io
+import json
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from accounts.models import EmailVerification, OutboundEmail, UserProfile
+from accounts.outbox import verification_email
+from accounts.signals import generate_agent_id, generate_client_code
+
+from .caching import invalidate_on_commit
+from .geo import get_zone_index
+from .models import AgentCommercial, Client
+from .serializers import AgentCommercialSerializer, ClientSerializer
+
+DEFAULT_PASSWORD = 'password123'
+
+
+class Onboarding(abc.ABC):
+    """How one kind of record maps to a User, a UserProfile and a logistics profile."""
+    user_type = None
+    model = None
+    serializer_class = None
+    email_domain = None
+
+    @abc.abstractmethod
+    def names(self, data):
+        """(first_name, last_name) of the account."""
+
+    @abc.abstractmethod
+    def email_stem(self, data):
+        """Text the email of a record without one is generated from."""
+
+    @abc.abstractmethod
+    def profile(self, user, data):
+        """The unsaved UserProfile of ``user``."""
+
+    @abc.abstractmethod
+    def instance(self, user, data, index):
+        """The unsaved AgentCommercial or Client, zoned with ``index``."""
+
+
+class AgentOnboarding(Onboarding):
+    user_type = 'agent'
+    model = AgentCommercial
+    serializer_class = AgentCommercialSerializer
+    email_domain = 'agent.essivivi.com'
+
+    def names(self, data):
+        return data['prenom'], data['nom']
+
+    def email_stem(self, data):
+        return f"{data['nom']}.{data['prenom']}"
+
+    def profile(self, user, data):
+        return UserProfile(user=user, agent_id=generate_agent_id(), hire_date=data.get('date_embauche'))
+
+    def instance(self, user, data, index):
+        agent = AgentCommercial(user=user, **data)
+        if agent.current_latitude is not None and agent.current_longitude is not None:
+            agent.zone_assigned = index.locate(agent.current_latitude, agent.current_longitude) or agent.zone_assigned
+        return agent
+
+
+class ClientOnboarding(Onboarding):
+    user_type = 'client'
+    model = Client
+    serializer_class = ClientSerializer
+    email_domain = 'client.essivivi.com'
+
+    def names(self, data):
+        return data['responsable'], data['nom_point_vente']
+
+    def email_stem(self, data):
+        return data['nom_point_vente']
+
+    def profile(self, user, data):
+        return UserProfile(
+            user=user, client_code=generate_client_code(), address=data.get('adresse', ''),
+            business_name=data['nom_point_vente'], contact_person=data['responsable'],
+        )
+
+    def instance(self, user, data, index):
+        client = Client(user=user, **data)
+        if client.latitude is not None and client.longitude is not None:
+            client.zone = index.locate(client.latitude, client.longitude)
+        return client
+
+
+ONBOARDINGS = {'agents': AgentOnboarding(), 'clients': ClientOnboarding()}
+
+
+def parse_records(content, fmt):
+    """
+    Records from CSV (header row) or JSON (list of objects) text or UTF-8
+    bytes; empty CSV cells are dropped. Unreadable input raises ValueError.
+    """
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError as e:
+            raise ValueError(f'Not UTF-8 text: {e}') from e
+    if fmt == 'json':
+        records = json.loads(content)
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ValueError('Expected a JSON list of objects')
+        return records
+    if fmt == 'csv':
+        try:
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, '')}
+                for row in csv.DictReader(io.StringIO(content))
+            ]
+        except csv.Error as e:
+            raise ValueError(f'Malformed CSV: {e}') from e
+    raise ValueError(f'Unsupported format: {fmt}')
+
+
+def generated_email(stem, domain):
+    sanitized = ''.join(c for c in stem.lower() if c.isascii() and (c.isalnum() or c == '.')).strip('.') or 'user'
+    return f"{sanitized}.{uuid.uuid4().hex[:8]}@{domain}"
+
+
+def import_records(kind, records, password=None, verified=True, chunk_size=500):
+    """
+    Create the accounts and profiles described by ``records``.
+
+    Returns {'created': count, 'errors': [{'row': position, 'errors': {...}}]},
+    positions starting at 1 in the order of ``records``.
+    """
+    onboarding = ONBOARDINGS[kind]
+    User = get_user_model()
+    hashed_password = make_password(password or DEFAULT_PASSWORD)
+    errors = []
+
+    prepared = []
+    seen_emails = set()
+    for position, record in enumerate(records, start=1):
+        serializer = onboarding.serializer_class(data=record)
+        if not serializer.is_valid():
+            errors.append({'row': position, 'errors': {
+                field: [str(message) for message in messages] for field, messages in serializer.errors.items()
+            }})
+            continue
+        data = dict(serializer.validated_data)
+        email = data.pop('email', None)
+        # Emails are compared and stored lowercased: John@x.com is john@x.com
+        email = User.objects.normalize_email(email).lower() if email else generated_email(
+            onboarding.email_stem(data), onboarding.email_domain
+        )
+        if email in seen_emails:
+            errors.append({'row': position, 'errors': {'email': ['Duplicate email in this import.']}})
+            continue
+        seen_emails.add(email)
+        prepared.append((position, email, data))
+
+    index = get_zone_index()
+    created = 0
+    for start in range(0, len(prepared), chunk_size):
+        chunk = prepared[start:start + chunk_size]
+        # Existing accounts may have been stored with mixed case
+        taken = set(
+            User.objects.annotate(email_lower=Lower('email')).filter(
+                email_lower__in=[email for _, email, _ in chunk]
+            ).order_by().values_list('email_lower', flat=True)
+        )
+        rows = []
+        for position, email, data in chunk:
+            if email in taken:
+                errors.append({'row': position, 'errors': {'email': ['User with this email already exists.']}})
+            else:
+                rows.append((position, email, data))
+
+        try:
+            with transaction.atomic():
+                create_rows(onboarding, rows, hashed_password, verified, index)
+            created += len(rows)
+        except IntegrityError:
+            # Fall back to one savepoint per row to find the offending ones
+            for row in rows:
+                try:
+                    with transaction.atomic():
+                        create_rows(onboarding, [row], hashed_password, verified, index)
+                    created += 1
+                except IntegrityError as e:
+                    errors.append({'row': row[0], 'errors': {'non_field_errors': [str(e)]}})
+
+    if created:
+        invalidate_on_commit(onboarding.model.__name__)
+    errors.sort(key=lambda error: error['row'])
+    return {'created': created, 'errors': errors}
+
+
+def create_rows(onboarding, rows, hashed_password, verified, index):
+    User = get_user_model()
+    users, profiles, instances, verifications = [], [], [], []
+    expires_at = timezone.now() + timedelta(hours=24)
+    for position, email, data in rows:
+        first_name, last_name = onboarding.names(data)
+        user = User(
+            email=email, password=hashed_password, user_type=onboarding.user_type,
+            first_name=first_name[:150], last_name=last_name[:150], is_active=True, is_verified=verified,
+        )
+        users.append(user)
+        profiles.append(onboarding.profile(user, data))
+        instances.append(onboarding.instance(user, data, index))
+        if not verified:
+            verifications.append(EmailVerification(user=user, email=email, expires_at=expires_at))
+
+    User.objects.bulk_create(users)
+    UserProfile.objects.bulk_create(profiles)
+    onboarding.model.objects.bulk_create(instances)
+    if verifications:
+        EmailVerification.objects.bulk_create(verifications)
+        OutboundEmail.objects.bulk_create([
+            verification_email(user, verification) for user, verification in zip(users, verifications)
+        ])
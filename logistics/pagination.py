@@ -0,0 +1,186 @@
+import base64
+import hashlib
+import json
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """
+    Paginator whose COUNT(*) is cached per query for a short time.
+
+    On PostgreSQL an unfiltered count over a large table is replaced by the
+    planner's estimate from pg_class, which costs nothing.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is None:
+            return super().count
+
+        estimate = self._estimated_count(queryset)
+        if estimate is not None:
+            return estimate
+
+        sql, params = query.sql_with_params()
+        key = 'pagination-count:' + hashlib.md5(f"{sql}{params}".encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60))
+        return count
+
+    def _estimated_count(self, queryset):
+        threshold = getattr(settings, 'PAGINATION_APPROXIMATE_COUNT_THRESHOLD', None)
+        connection = connections[queryset.db]
+        if threshold is None or connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= threshold:
+            return row[0]
+        return None
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination with a keyset (cursor) mode for high-volume tables.
+
+    Without a ``cursor`` query parameter this behaves like the default
+    page-number pagination, with a cached/estimated count. Passing ``cursor``
+    (empty for the first page) switches to keyset pagination over the view's
+    ``keyset_ordering``, e.g. ``('-date_heure', '-id')``: each page is a
+    range scan on the matching composite index, so deep pages cost the same
+    as the first one. Keyset responses have no ``count``.
+    """
+    django_paginator_class = CachedCountPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, 'keyset_ordering', None)
+        self.use_keyset = bool(self.ordering) and self.cursor_query_param in request.query_params
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = [self._invert(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, position))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.use_keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # Values are compared in SQL: each must parse as its ordering field
+        try:
+            position = [
+                self._position_value(model._meta.get_field(field.lstrip('-')), value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def _position_value(field, value):
+        if not isinstance(value, str):
+            raise TypeError('Cursor values are strings')
+        value = field.to_python(value)
+        if value is None:
+            raise ValueError('Empty cursor value')
+        return value
+
+    def encode_cursor(self, instance, reverse):
+        position = [self._cursor_value(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        url = remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _cursor_value(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _seek_filter(ordering, position):
+        """(a, b) < (x, y) expanded as a < x OR (a = x AND b < y), per direction."""
+        clauses = []
+        for index, field in enumerate(ordering):
+            equal = {previous.lstrip('-'): position[i] for i, previous in enumerate(ordering[:index])}
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            clauses.append(Q(**equal, **{f"{field.lstrip('-')}__{lookup}": position[index]}))
+        return reduce(operator.or_, clauses)
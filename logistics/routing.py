@@ -0,0 +1,123 @@
+"""
+Capacity-aware tour planning for a tricycle.
+
+A tour starts and ends at the depot and is split into trips whenever the
+next order would exceed the tricycle's capacity (the agent goes back to
+reload). Trips are built with a capacity-aware nearest-neighbour pass and
+then improved with 2-opt and or-opt moves; all distances come from one
+NumPy haversine matrix, and each local-search step evaluates every
+candidate move of a given kind in a single vectorized expression.
+
+Node 0 of the distance matrix is always the depot.
+"""
+import numpy as np
+
+from .geo import haversine_array
+
+EPSILON = 1e-6
+
+
+def distance_matrix(lats, lngs):
+    """Pairwise great-circle distances in meters."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    return haversine_array(lats[:, None], lngs[:, None], lats[None, :], lngs[None, :])
+
+
+def route_length(route, matrix):
+    route = np.asarray(route)
+    return float(matrix[route[:-1], route[1:]].sum())
+
+
+def nearest_neighbour_trips(matrix, demands, capacity):
+    """
+    Greedy construction: from the current position, go to the nearest
+    unvisited stop that still fits in the remaining load; return to the
+    depot when nothing fits. A stop larger than the capacity gets a trip
+    of its own.
+    """
+    demands = np.asarray(demands, dtype=np.float64)
+    unvisited = np.ones(len(demands), dtype=bool)
+    unvisited[0] = False
+    trips = []
+    while unvisited.any():
+        trip, position, load = [], 0, 0.0
+        while True:
+            fits = unvisited & (load + demands <= capacity)
+            if not fits.any():
+                if not trip:
+                    # Oversized order: serve it alone
+                    fits = unvisited
+                else:
+                    break
+            distances = np.where(fits, matrix[position], np.inf)
+            nearest = int(np.argmin(distances))
+            trip.append(nearest)
+            unvisited[nearest] = False
+            load += demands[nearest]
+            position = nearest
+            if load >= capacity:
+                break
+        trips.append(trip)
+    return trips
+
+
+def two_opt(route, matrix):
+    """Reverse segments while that shortens the closed route (depot at both ends)."""
+    route = np.asarray(route)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(route) - 2):
+            j = np.arange(i + 1, len(route) - 1)
+            a, b = route[i - 1], route[i]
+            c, d = route[j], route[j + 1]
+            delta = matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -EPSILON:
+                route[i:j[best] + 1] = route[i:j[best] + 1][::-1]
+                improved = True
+    return route
+
+
+def or_opt(route, matrix, max_segment=3):
+    """Move segments of 1..max_segment stops to a cheaper position in the route."""
+    route = list(route)
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            for i in range(1, len(route) - length):
+                segment = route[i:i + length]
+                prev, nxt = route[i - 1], route[i + length]
+                removal_gain = matrix[prev, segment[0]] + matrix[segment[-1], nxt] - matrix[prev, nxt]
+                rest = np.asarray(route[:i] + route[i + length:])
+                a, b = rest[:-1], rest[1:]
+                insertion_cost = matrix[a, segment[0]] + matrix[segment[-1], b] - matrix[a, b]
+                best = int(np.argmin(insertion_cost))
+                if insertion_cost[best] < removal_gain - EPSILON:
+                    rest = list(rest)
+                    route = rest[:best + 1] + segment + rest[best + 1:]
+                    improved = True
+                    break
+            if improved:
+                break
+    return np.asarray(route)
+
+
+def plan_tour(lats, lngs, demands, capacity):
+    """
+    Plan a capacity-constrained tour.
+
+    ``lats``/``lngs``/``demands`` are indexed by node, node 0 being the depot
+    (demand 0). Returns a list of trips, each a list of node indices without
+    the depot, plus the matching distance matrix.
+    """
+    matrix = distance_matrix(lats, lngs)
+    trips = []
+    for trip in nearest_neighbour_trips(matrix, demands, capacity):
+        route = np.asarray([0] + trip + [0])
+        if len(trip) > 2:
+            route = or_opt(two_opt(route, matrix), matrix)
+        trips.append([int(node) for node in route[1:-1]])
+    return trips, matrix
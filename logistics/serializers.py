@@ -1,53 +1,196 @@
 from rest_framework import serializers
-from .models import AgentCommercial, Client, Commande, Livraison, LogActivite, Tricycle
+from django.conf import settings
+from django.urls import reverse
+from .images import IMAGE_FIELDS
+from .models import AgentCommercial, AgentLocationLog, Client, Commande, Livraison, LogActivite, Tricycle, UploadSession
 from accounts.serializers import CustomUserDetailsSerializer
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class TricycleSerializer(serializers.ModelSerializer):
+
+def parse_field_tree(value):
+    """Turn 'a,b.c,b.d' into {'a': {}, 'b': {'c': {}, 'd': {}}}."""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and opt-in expansion of nested relations.
+
+    Nested serializers are declared in ``Meta.expandable_fields`` as
+    ``{name: (serializer_class, kwargs)}`` and are only rendered when expanded;
+    relations are otherwise returned as flat ids. ``fields`` and ``expand`` come
+    from the constructor or, for the top-level serializer, from the query string
+    (``?fields=id,statut&expand=commande_details.client_details``). Dotted names
+    are passed down to the nested serializer. Write-only fields are never dropped.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self._fields_tree = parse_field_tree(fields) if isinstance(fields, str) else fields
+        self._expand_tree = parse_field_tree(expand) if isinstance(expand, str) else expand
+        super().__init__(*args, **kwargs)
+
+    def _get_trees(self):
+        fields_tree, expand_tree = self._fields_tree, self._expand_tree
+        request = self.context.get('request')
+        query_params = getattr(request, 'query_params', {})
+        if fields_tree is None:
+            fields_tree = parse_field_tree(query_params.get('fields'))
+        if expand_tree is None:
+            expand_tree = parse_field_tree(query_params.get('expand'))
+        return fields_tree, expand_tree
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields_tree, expand_tree = self._get_trees()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+
+        for name, (serializer_class, options) in expandable.items():
+            if name in expand_tree or name in fields_tree:
+                if issubclass(serializer_class, DynamicFieldsMixin):
+                    options = {
+                        'fields': fields_tree.get(name, {}),
+                        'expand': expand_tree.get(name, {}),
+                        **options
+                    }
+                fields[name] = serializer_class(read_only=True, **options)
+
+        if fields_tree:
+            for name in list(fields):
+                if name not in fields_tree and not fields[name].write_only:
+                    del fields[name]
+        return fields
+
+    @property
+    def expansion_key(self):
+        """Rendered fields that read related rows, used to cache the eager loading plan."""
+        key = []
+        for name, field in self.fields.items():
+            if isinstance(field, serializers.BaseSerializer):
+                key.append((name, getattr(field, 'expansion_key', None)))
+            elif '.' in (field.source or ''):
+                key.append((name, None))
+        return tuple(key)
+
+
+class TricycleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tricycle
         fields = ['id', 'code', 'description', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class AgentCommercialSerializer(serializers.ModelSerializer):
-    user_details = CustomUserDetailsSerializer(source='user', read_only=True)
+class AgentCommercialSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     email = serializers.EmailField(write_only=True, required=False)
-    tricycle_details = TricycleSerializer(source='tricycle_assigne', read_only=True)
 
     class Meta:
         model = AgentCommercial
         fields = '__all__'
         read_only_fields = ['user', 'tricycle_assigne', 'created_at', 'updated_at']
+        expandable_fields = {
+            'user_details': (CustomUserDetailsSerializer, {'source': 'user'}),
+            'tricycle_details': (TricycleSerializer, {'source': 'tricycle_assigne'}),
+        }
 
-class ClientSerializer(serializers.ModelSerializer):
-    user_details = CustomUserDetailsSerializer(source='user', read_only=True)
+class ClientSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     email = serializers.EmailField(write_only=True, required=False)
     
     class Meta:
         model = Client
         fields = '__all__'
         read_only_fields = ['user', 'created_at', 'updated_at']
+        expandable_fields = {
+            'user_details': (CustomUserDetailsSerializer, {'source': 'user'}),
+        }
 
-class CommandeSerializer(serializers.ModelSerializer):
-    client_details = ClientSerializer(source='client', read_only=True)
-    agent_details = AgentCommercialSerializer(source='agent_assigne', read_only=True)
+class CommandeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Commande
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
+        expandable_fields = {
+            'client_details': (ClientSerializer, {'source': 'client'}),
+            'agent_details': (AgentCommercialSerializer, {'source': 'agent_assigne'}),
+        }
 
-class LivraisonSerializer(serializers.ModelSerializer):
-    commande_details = CommandeSerializer(source='commande', read_only=True)
-    agent_details = AgentCommercialSerializer(source='agent', read_only=True)
-    client_details = ClientSerializer(source='client', read_only=True)
+class LivraisonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # URLs of the resized copies, null until the image pipeline has processed the upload
+    photo_preuve_variants = serializers.SerializerMethodField()
+    signature_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Livraison
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
+        expandable_fields = {
+            'commande_details': (CommandeSerializer, {'source': 'commande'}),
+            'agent_details': (AgentCommercialSerializer, {'source': 'agent'}),
+            'client_details': (ClientSerializer, {'source': 'client'}),
+        }
+
+    def media_url(self, obj, name):
+        """URL of a stored image through the authorizing ProofMediaView."""
+        url = reverse('livraison-media', kwargs={'pk': obj.pk, 'name': name})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def variant_urls(self, obj, image, variants):
+        if not image or variants.get('source') != image.name:
+            return None
+        return {name: self.media_url(obj, variants[name]) for name in ('preview', 'thumbnail')}
+
+    def get_photo_preuve_variants(self, obj):
+        return self.variant_urls(obj, obj.photo_preuve, obj.photo_preuve_variants)
+
+    def get_signature_variants(self, obj):
+        return self.variant_urls(obj, obj.signature_url, obj.signature_variants)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for field in IMAGE_FIELDS:
+            if data.get(field):
+                data[field] = self.media_url(instance, getattr(instance, field).name)
+        return data
+
+class LocationFixSerializer(serializers.ModelSerializer):
+    # Devices report more decimals than we store; accept floats and let the model round
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+
+    class Meta:
+        model = AgentLocationLog
+        fields = ['latitude', 'longitude', 'accuracy', 'recorded_at']
+
+class LocationBatchSerializer(serializers.Serializer):
+    """Buffered GPS fixes uploaded by the agent app"""
+    fixes = serializers.ListField(
+        child=LocationFixSerializer(),
+        allow_empty=False,
+        max_length=getattr(settings, 'GPS_BATCH_MAX_FIXES', 1000)
+    )
+
+class CommandeBatchItemSerializer(serializers.ModelSerializer):
+    """One order of a batch; related ids are resolved for the whole batch at once"""
+    client = serializers.UUIDField()
+    agent_assigne = serializers.UUIDField(required=False, allow_null=True)
+
+    class Meta:
+        model = Commande
+        fields = ['client', 'qt_commandee', 'montant', 'volume_m3', 'date_commande', 'statut', 'agent_assigne']
+
+class CommandeBatchSerializer(serializers.Serializer):
+    """Orders submitted together; each one is validated and reported separately"""
+    orders = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'COMMANDE_BATCH_MAX_SIZE', 500)
+    )
 
 class DashboardStatsSerializer(serializers.Serializer):
     total_livraisons = serializers.IntegerField()
@@ -57,10 +200,21 @@ class DashboardStatsSerializer(serializers.Serializer):
     total_clients = serializers.IntegerField()
     chiffre_affaires = serializers.DecimalField(max_digits=12, decimal_places=2)
 
-class LogActiviteSerializer(serializers.ModelSerializer):
+class LogActiviteSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_email = serializers.EmailField(source='user.email', read_only=True)
 
     class Meta:
         model = LogActivite
         fields = '__all__'
         read_only_fields = ['id', 'timestamp', 'user', 'user_email']
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Resumable upload of a delivery image; ``received`` is the offset of the next chunk"""
+    field = serializers.ChoiceField(choices=list(IMAGE_FIELDS))
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'livraison', 'field', 'filename', 'size', 'sha256', 'received', 'status', 'created_at']
+        read_only_fields = ['id', 'livraison', 'received', 'status', 'created_at']
@@ -0,0 +1,148 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import heatmap
+from .caching import invalidate_tags
+from .geo import get_zone_index, invalidate_zone_index, is_within_proximity, reassign_zones
+from .images import queue_image_jobs
+from .models import AgentCommercial, Client, Commande, Livraison, Tricycle, Zone
+
+
+@receiver(pre_save, sender=Client)
+def derive_client_zone(sender, instance, **kwargs):
+    """
+    Derive Client.zone from the client's coordinates.
+    Clients without coordinates keep a manually entered zone.
+    """
+    if instance.latitude is not None and instance.longitude is not None:
+        instance.zone = get_zone_index().locate(instance.latitude, instance.longitude)
+
+
+@receiver(pre_save, sender=AgentCommercial)
+def derive_agent_zone(sender, instance, **kwargs):
+    """
+    Derive AgentCommercial.zone_assigned from the agent's current position.
+    An agent outside every zone keeps the last zone it was seen in.
+    """
+    if instance.current_latitude is not None and instance.current_longitude is not None:
+        zone = get_zone_index().locate(instance.current_latitude, instance.current_longitude)
+        if zone is not None:
+            instance.zone_assigned = zone
+
+
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+def zone_changed(sender, instance, **kwargs):
+    """
+    Drop the compiled zone index and re-derive client/agent zones
+    once the change is committed: bumped earlier, the version could be
+    cached by another worker with an index of the pre-commit zones.
+    """
+    transaction.on_commit(zones_committed)
+
+
+def zones_committed():
+    invalidate_zone_index()
+    reassign_zones()
+
+
+@receiver(pre_save, sender=Livraison)
+def validate_delivery_proximity(sender, instance, **kwargs):
+    """
+    Score the GPS fix of a new delivery against the client's coordinates.
+    Existing history is re-scored in bulk by `revalidate_proximity`.
+    """
+    if instance._state.adding and instance.client_id:
+        client = instance.client
+        instance.proximity_validated = is_within_proximity(
+            instance.gps_latitude, instance.gps_longitude, client.latitude, client.longitude
+        )
+
+
+def loaded_values(instance):
+    """Values of the fields loaded on a delivery, by attname."""
+    return {
+        field.attname: instance.__dict__[field.attname]
+        for field in Livraison._meta.concrete_fields if field.attname in instance.__dict__
+    }
+
+
+@receiver(post_init, sender=Livraison)
+def remember_saved_state(sender, instance, **kwargs):
+    instance._saved_state = loaded_values(instance)
+    instance._previous_state = None
+
+
+def stored_state(instance):
+    """
+    The delivery's stored values. Fields deferred when it was loaded are read
+    in one query and set on the instance, so later receivers do not load
+    them one by one.
+    """
+    if instance._state.adding:
+        return None
+    state = instance._saved_state
+    missing = [field.attname for field in Livraison._meta.concrete_fields if field.attname not in state]
+    if not missing:
+        return dict(state)
+    row = Livraison.objects.filter(pk=instance.pk).values(*missing).first()
+    if row is None:
+        return None
+    for attname, value in row.items():
+        if attname not in instance.__dict__:
+            setattr(instance, attname, value)
+    return {**state, **row}
+
+
+@receiver(pre_save, sender=Livraison)
+def load_saved_state(sender, instance, **kwargs):
+    """
+    Expose the delivery's values before and after the save as
+    ``_previous_state`` (None for a new delivery) and ``_saved_state``:
+    the heatmap, rollup and ledger receivers move its contribution from
+    one to the other. Connected after the other pre_save receivers.
+    """
+    previous = stored_state(instance)
+    instance._previous_state = previous
+    instance._saved_state = {**(previous or {}), **loaded_values(instance)}
+
+
+@receiver(pre_delete, sender=Livraison)
+def load_deleted_state(sender, instance, **kwargs):
+    instance._previous_state = stored_state(instance)
+
+
+@receiver(post_save, sender=Livraison)
+def update_heatmap(sender, instance, created, **kwargs):
+    """Apply the difference between the delivery's old and new heatmap contribution."""
+    old = heatmap.snapshot_contribution(heatmap.snapshot(instance._previous_state), instance)
+    new = heatmap.snapshot_contribution(heatmap.snapshot(instance._saved_state), instance)
+    if old != new:
+        heatmap.apply_contribution(old, -1)
+        heatmap.apply_contribution(new, 1)
+
+
+@receiver(post_save, sender=Livraison)
+def queue_image_processing(sender, instance, **kwargs):
+    """Hand new proof photos and signatures to the process_images worker."""
+    queue_image_jobs(instance)
+
+
+@receiver(post_delete, sender=Livraison)
+def remove_from_heatmap(sender, instance, **kwargs):
+    heatmap.apply_contribution(heatmap.snapshot_contribution(heatmap.snapshot(instance._previous_state), instance), -1)
+
+
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=Commande)
+@receiver([post_save, post_delete], sender=Livraison)
+@receiver([post_save, post_delete], sender=AgentCommercial)
+@receiver([post_save, post_delete], sender=Zone)
+@receiver([post_save, post_delete], sender=Tricycle)
+def evict_cached_responses(sender, instance, **kwargs):
+    """
+    Evict cached responses tagged with the model once the change is committed,
+    so a concurrent request cannot cache the pre-commit state again.
+    """
+    tag = sender.__name__
+    transaction.on_commit(lambda: invalidate_tags(tag))
@@ -1,3 +1,1091 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import io
+import json
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+import numpy as np
+from PIL import Image
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.contrib.auth import get_user_model
+from accounts.mixins import build_eager_loading_plan
+from accounts.models import EmailVerification, OutboundEmail
+from django.utils import timezone
+from .audit import archive_logs, audit_buffer
+from .caching import tag_versions
+from .geo import ZONE_INDEX_VERSION_KEY, get_zone_index, invalidate_zone_index, reassign_zones, rescore_proximity
+from .dispatch import dispatch_pending_orders
+from .heatmap import rebuild_heatmap
+from .images import process_image_jobs
+from .onboarding import import_records
+from .routing import nearest_neighbour_trips, plan_tour, route_length
+from .models import AgentCommercial, Client, Commande, HeatmapCell, ImageJob, Livraison, LogActivite, Tricycle, UploadSession, Zone
+from .serializers import LivraisonSerializer
 
-# Create your tests here.
+User = get_user_model()
+
+
+class LogisticsTestMixin:
+    """Shared fixtures for logistics API tests."""
+
+    def create_admin(self):
+        return User.objects.create_user(
+            email='admin@essivi.com', password='SecurePass123', user_type='admin',
+            first_name='Admin', last_name='Test', is_verified=True
+        )
+
+    def create_agent(self, index=0, **extra):
+        user = User.objects.create_user(
+            email=f'agent{index}@essivi.com', password='SecurePass123', user_type='agent',
+            first_name='Agent', last_name=str(index), is_verified=True
+        )
+        tricycle = Tricycle.objects.create(code=f'TR-{index:03d}')
+        return AgentCommercial.objects.create(
+            user=user, nom='Agent', prenom=str(index), telephone='+22890000000',
+            tricycle_assigne=tricycle, statut=AgentCommercial.Status.ACTIF, **extra
+        )
+
+    def create_client(self, index=0, **extra):
+        user = User.objects.create_user(
+            email=f'client{index}@essivi.com', password='SecurePass123', user_type='client',
+            first_name='Client', last_name=str(index), is_verified=True
+        )
+        extra.setdefault('latitude', '6.130000')
+        extra.setdefault('longitude', '1.220000')
+        return Client.objects.create(
+            user=user, nom_point_vente=f'Point {index}', responsable='Responsable',
+            telephone='+22891000000', adresse='Lomé', **extra
+        )
+
+    def create_livraison(self, agent, client, **extra):
+        commande = Commande.objects.create(client=client, qt_commandee=10, agent_assigne=agent)
+        extra.setdefault('quantite_livree', 10)
+        extra.setdefault('montant_total', 5000)
+        return Livraison.objects.create(commande=commande, agent=agent, client=client, **extra)
+
+
+class EagerLoadingTests(LogisticsTestMixin, TestCase):
+    """The nested serializers must not trigger per-row queries."""
+
+    expand = 'commande_details.client_details.user_details,agent_details.user_details,agent_details.tricycle_details'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.create_admin())
+
+    def _count_list_queries(self, url, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_plan_follows_nested_serializers(self):
+        select, prefetch = build_eager_loading_plan(LivraisonSerializer(expand=self.expand))
+        self.assertIn('commande__client__user__profile', select)
+        self.assertIn('agent__user__admin_profile', select)
+        self.assertIn('agent__tricycle_assigne', select)
+        self.assertEqual(prefetch, ())
+
+    def test_plan_skips_relations_not_expanded(self):
+        select, prefetch = build_eager_loading_plan(LivraisonSerializer(expand='agent_details'))
+        self.assertEqual(select, ('agent',))
+        self.assertEqual(build_eager_loading_plan(LivraisonSerializer), ((), ()))
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        url = reverse('livraison-list')
+        for index in range(2):
+            self.create_livraison(self.create_agent(index), self.create_client(index))
+        small = self._count_list_queries(url, expand=self.expand)
+
+        for index in range(2, 12):
+            self.create_livraison(self.create_agent(index), self.create_client(index))
+        large = self._count_list_queries(url, expand=self.expand)
+
+        self.assertEqual(small, large)
+        for name in ('commande-list', 'agentcommercial-list', 'client-list'):
+            self.assertLessEqual(
+                self._count_list_queries(reverse(name), expand='client_details.user_details,user_details'),
+                small
+            )
+
+
+class SparseFieldsetTests(LogisticsTestMixin, TestCase):
+    """?fields= and ?expand= shape the logistics payloads."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.create_admin())
+        self.livraison = self.create_livraison(self.create_agent(), self.create_client())
+        self.url = reverse('livraison-detail', args=[self.livraison.id])
+
+    def test_relations_are_flat_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['agent'], self.livraison.agent_id)
+        self.assertNotIn('agent_details', response.data)
+        self.assertNotIn('commande_details', response.data)
+
+    def test_expand_nested_relation(self):
+        response = self.client.get(self.url, {'expand': 'commande_details.client_details'})
+        commande = response.data['commande_details']
+        self.assertEqual(commande['client_details']['nom_point_vente'], 'Point 0')
+        self.assertNotIn('agent_details', commande)
+        self.assertNotIn('user_details', commande['client_details'])
+
+    def test_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'id,statut,agent_details.nom'})
+        self.assertEqual(set(response.data), {'id', 'statut', 'agent_details'})
+        self.assertEqual(response.data['agent_details'], {'nom': 'Agent'})
+
+
+class KeysetPaginationTests(LogisticsTestMixin, TestCase):
+    """?cursor= walks the table on (date_heure, id) without OFFSET."""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.create_admin())
+        agent, client = self.create_agent(), self.create_client()
+        now = timezone.now()
+        # Five deliveries share a timestamp to exercise the id tie-breaker
+        self.livraisons = [
+            self.create_livraison(agent, client, date_heure=now - timedelta(minutes=index // 5))
+            for index in range(12)
+        ]
+        self.url = reverse('livraison-list')
+
+    def test_cursor_pages_cover_every_row_once(self):
+        seen = []
+        response = self.client.get(self.url, {'cursor': '', 'page_size': 5})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        while True:
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(sorted(seen), sorted(str(l.id) for l in self.livraisons))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_previous_link_returns_same_page(self):
+        first = self.client.get(self.url, {'cursor': '', 'page_size': 5})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in back.data['results']],
+            [item['id'] for item in first.data['results']]
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # Well-formed cursors whose values do not parse as (date_heure, id)
+        for position in (['yesterday', str(self.livraisons[0].id)], ['2026-01-01T00:00:00+00:00', 12], [None, None]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'p': position}).encode()).decode()
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_mode_keeps_count(self):
+        response = self.client.get(self.url, {'page_size': 5, 'page': 2})
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class LocationBatchTests(LogisticsTestMixin, TestCase):
+    """Buffered GPS fixes are stored in one insert and move the agent once."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.agent = self.create_agent()
+        self.client.force_authenticate(self.agent.user)
+        self.url = reverse('agentcommercial-locations-batch')
+
+    # No audit entry may be flushed in the middle of the insert count
+    @override_settings(AUDIT_METHODS=())
+    def test_batch_is_stored_and_latest_fix_wins(self):
+        fixes = [
+            {'latitude': 6.1301234567, 'longitude': 1.2201, 'recorded_at': '2026-01-22T08:00:02Z'},
+            {'latitude': 6.1400, 'longitude': 1.2300, 'recorded_at': '2026-01-22T08:00:10Z', 'accuracy': 4.5},
+            {'latitude': 6.1350, 'longitude': 1.2250, 'recorded_at': '2026-01-22T08:00:05Z'},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'fixes': fixes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['received'], 3)
+        self.assertTrue(response.data['position_updated'])
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+
+        self.agent.refresh_from_db()
+        self.assertEqual(str(self.agent.current_latitude), '6.140000')
+        self.assertEqual(self.agent.location_logs.count(), 3)
+
+    def test_older_batch_does_not_move_agent_back(self):
+        self.client.post(self.url, {'fixes': [
+            {'latitude': 6.14, 'longitude': 1.23, 'recorded_at': '2026-01-22T09:00:00Z'},
+        ]}, format='json')
+        response = self.client.post(self.url, {'fixes': [
+            {'latitude': 6.10, 'longitude': 1.20, 'recorded_at': '2026-01-22T08:00:00Z'},
+        ]}, format='json')
+        self.assertFalse(response.data['position_updated'])
+        self.agent.refresh_from_db()
+        self.assertEqual(str(self.agent.current_latitude), '6.140000')
+
+    def test_moved_agent_is_touched(self):
+        before = self.agent.updated_at
+        versions = tag_versions(['AgentCommercial'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'fixes': [
+                {'latitude': 6.14, 'longitude': 1.23, 'recorded_at': '2026-01-22T09:00:00Z'},
+            ]}, format='json')
+        self.agent.refresh_from_db()
+        self.assertGreater(self.agent.updated_at, before)
+        self.assertNotEqual(tag_versions(['AgentCommercial']), versions)
+
+    def test_invalid_fix_rejects_batch(self):
+        response = self.client.post(self.url, {'fixes': [
+            {'latitude': 123, 'longitude': 1.23, 'recorded_at': '2026-01-22T09:00:00Z'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.agent.location_logs.exists())
+
+
+class ZoneIndexTests(LogisticsTestMixin, TestCase):
+    """Points resolve to circle and polygon zones; saving a zone re-derives client zones."""
+
+    def setUp(self):
+        invalidate_zone_index()
+        self.circle = Zone.objects.create(
+            id='Zone-1', name='Centre', center_latitude='6.130000', center_longitude='1.220000', radius=1000
+        )
+        self.polygon = Zone.objects.create(
+            id='Zone-2', name='Port', zone_type=Zone.ZoneType.POLYGON,
+            center_latitude='6.150000', center_longitude='1.250000', radius=0,
+            polygon_points=[[6.14, 1.24], [6.14, 1.26], [6.16, 1.26], [6.16, 1.24]]
+        )
+
+    def test_locate_circle_and_polygon(self):
+        index = get_zone_index()
+        self.assertEqual(index.locate(6.1305, 1.2205), 'Zone-1')
+        self.assertEqual(index.locate(6.15, 1.25), 'Zone-2')
+        self.assertIsNone(index.locate(6.20, 1.30))
+        # ~1.1 km north of the centre is outside the 1 km circle
+        self.assertIsNone(index.locate(6.14, 1.22))
+
+    def test_client_zone_is_derived_on_save(self):
+        client = self.create_client(latitude='6.150000', longitude='1.250000')
+        self.assertEqual(client.zone, 'Zone-2')
+
+    def test_zone_change_reassigns_clients(self):
+        client = self.create_client(latitude='6.135000', longitude='1.220000')
+        self.assertEqual(client.zone, 'Zone-1')
+        versions = tag_versions(['Client'])
+        index_version = cache.get(ZONE_INDEX_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.circle.radius = 200
+            self.circle.save()
+            # Other workers must not rebuild the index before the change is committed
+            self.assertEqual(cache.get(ZONE_INDEX_VERSION_KEY), index_version)
+        client.refresh_from_db()
+        self.assertIsNone(client.zone)
+        # bulk_update() bypasses post_save: the client tag is bumped explicitly
+        self.assertNotEqual(tag_versions(['Client']), versions)
+
+    def test_reassignment_is_chunked(self):
+        clients = [self.create_client(index, latitude='6.135000', longitude='1.220000') for index in range(3)]
+        Zone.objects.filter(pk='Zone-1').update(radius=200)
+        invalidate_zone_index()
+        self.assertEqual(reassign_zones(chunk_size=2), (3, 0))
+        self.assertFalse(Client.objects.filter(pk__in=[client.pk for client in clients]).exclude(zone=None).exists())
+
+    def test_malformed_zone_is_left_out(self):
+        bad = Zone(
+            id='Zone-3', name='Bad', zone_type=Zone.ZoneType.POLYGON, center_latitude='6.150000',
+            center_longitude='1.250000', radius=0, polygon_points=[[6.14, 1.24, 0], [6.14, None], 'x'],
+        )
+        with self.assertRaises(ValidationError):
+            bad.full_clean()
+        with self.assertLogs('logistics.geo', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            bad.save()
+        # Client saves still resolve the valid zones
+        client = self.create_client(latitude='6.150000', longitude='1.250000')
+        self.assertEqual(client.zone, 'Zone-2')
+
+
+class ProximityValidationTests(LogisticsTestMixin, TestCase):
+    """Deliveries are scored against the client's coordinates."""
+
+    def setUp(self):
+        invalidate_zone_index()
+        self.agent = self.create_agent()
+        self.client_point = self.create_client(latitude='6.130000', longitude='1.220000')
+
+    def test_new_delivery_is_scored(self):
+        near = self.create_livraison(self.agent, self.client_point, gps_latitude='6.130010', gps_longitude='1.220000')
+        far = self.create_livraison(self.agent, self.client_point, gps_latitude='6.131000', gps_longitude='1.220000')
+        missing = self.create_livraison(self.agent, self.client_point)
+        self.assertTrue(near.proximity_validated)
+        self.assertFalse(far.proximity_validated)
+        self.assertFalse(missing.proximity_validated)
+
+    def test_bulk_rescore_matches_single_scoring(self):
+        livraisons = [
+            self.create_livraison(self.agent, self.client_point, gps_latitude=f'{6.13 + i * 0.00001:.6f}', gps_longitude='1.220000')
+            for i in range(6)
+        ]
+        Livraison.objects.update(proximity_validated=False)
+        Livraison.objects.filter(pk=livraisons[-1].pk).update(proximity_validated=True)
+
+        scanned, changed = rescore_proximity(chunk_size=4)
+        self.assertEqual(scanned, 6)
+        validated = set(Livraison.objects.filter(proximity_validated=True).values_list('pk', flat=True))
+        # Fixes are ~1.1 m apart: only the first two are within 2 m
+        self.assertEqual(validated, {livraisons[0].pk, livraisons[1].pk})
+        self.assertEqual(changed, 3)
+
+    def test_bulk_rescore_without_changes(self):
+        self.create_livraison(self.agent, self.client_point, gps_latitude='6.130010', gps_longitude='1.220000')
+        self.create_livraison(self.agent, self.client_point)
+        # PostgreSQL and MySQL have no parameter limit: the batch size is the number of ids
+        with mock.patch.object(connection.ops, 'bulk_batch_size', side_effect=lambda fields, objs: len(objs)):
+            self.assertEqual(rescore_proximity(), (2, 0))
+
+
+class HeatmapTests(LogisticsTestMixin, TestCase):
+    """Heatmap cells follow delivery saves and are read per viewport."""
+
+    def setUp(self):
+        invalidate_zone_index()
+        self.client = APIClient()
+        self.client.force_authenticate(self.create_admin())
+        self.agent = self.create_agent()
+        self.point = self.create_client(latitude='6.130000', longitude='1.220000')
+        self.url = reverse('cartography-heatmap')
+
+    def _cells(self, level):
+        return list(HeatmapCell.objects.filter(level=level, deliveries_count__gt=0).values_list(
+            'deliveries_count', 'quantity', 'amount'
+        ))
+
+    def test_only_delivered_rows_are_counted(self):
+        livraison = self.create_livraison(self.agent, self.point)
+        self.assertEqual(self._cells(2), [])
+
+        livraison.statut = Livraison.Status.LIVRE
+        livraison.save()
+        self.assertEqual(self._cells(2), [(1, 10, 5000)])
+
+        livraison.quantite_livree = 12
+        livraison.save()
+        self.assertEqual(self._cells(2), [(1, 12, 5000)])
+
+        livraison.delete()
+        self.assertEqual(self._cells(2), [])
+
+    def test_moving_delivery_changes_cell(self):
+        livraison = self.create_livraison(self.agent, self.point, statut=Livraison.Status.LIVRE)
+        livraison = Livraison.objects.get(pk=livraison.pk)
+        livraison.gps_latitude, livraison.gps_longitude = '6.200000', '1.300000'
+        livraison.save()
+        cells = HeatmapCell.objects.filter(level=2, deliveries_count__gt=0)
+        self.assertEqual(cells.count(), 1)
+        self.assertEqual(cells.get().lat_index, 6200)
+
+    def test_deferred_fields_are_read_once_per_save(self):
+        livraison = self.create_livraison(self.agent, self.point)
+        livraison = Livraison.objects.only('id', 'statut').get(pk=livraison.pk)
+        livraison.statut = Livraison.Status.LIVRE
+        with CaptureQueriesContext(connection) as queries:
+            livraison.save(update_fields=['statut'])
+        reloads = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "logistics_livraison"' in query['sql']
+        ]
+        # One read of the deferred fields, shared by the heatmap, rollups and ledger
+        self.assertEqual(len(reloads), 1)
+        self.assertEqual(self._cells(2), [(1, 10, 5000)])
+
+    def test_rebuild_matches_incremental(self):
+        for _ in range(3):
+            self.create_livraison(self.agent, self.point, statut=Livraison.Status.LIVRE)
+        incremental = sorted(HeatmapCell.objects.values_list('level', 'lat_index', 'lng_index', 'deliveries_count'))
+        rebuild_heatmap(timezone.localdate(), timezone.localdate())
+        rebuilt = sorted(HeatmapCell.objects.values_list('level', 'lat_index', 'lng_index', 'deliveries_count'))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_viewport_query(self):
+        self.create_livraison(self.agent, self.point, statut=Livraison.Status.LIVRE)
+        inside = self.client.get(self.url, {'south': 6.1, 'west': 1.2, 'north': 6.15, 'east': 1.25})
+        self.assertEqual(inside.status_code, status.HTTP_200_OK)
+        self.assertEqual(inside.data['data']['level'], 2)
+        self.assertEqual(len(inside.data['data']['points']), 1)
+        self.assertEqual(inside.data['data']['points'][0]['count'], 1)
+
+        outside = self.client.get(self.url, {'south': 6.5, 'west': 1.5, 'north': 6.6, 'east': 1.6})
+        self.assertEqual(outside.data['data']['points'], [])
+
+
+class RoutePlanningTests(LogisticsTestMixin, TestCase):
+    """Tours respect capacity, visit every order once and beat the greedy baseline."""
+
+    def test_plan_tour_respects_capacity(self):
+        rng = np.random.default_rng(7)
+        lats = np.concatenate([[6.13], 6.10 + rng.random(60) * 0.08])
+        lngs = np.concatenate([[1.22], 1.18 + rng.random(60) * 0.08])
+        demands = np.concatenate([[0], rng.integers(10, 60, 60)])
+
+        trips, matrix = plan_tour(lats, lngs, demands, capacity=200)
+        visited = [node for trip in trips for node in trip]
+        self.assertEqual(sorted(visited), list(range(1, 61)))
+        for trip in trips:
+            self.assertLessEqual(demands[trip].sum(), 200)
+
+        greedy = nearest_neighbour_trips(matrix, demands, 200)
+        optimized = sum(route_length([0] + trip + [0], matrix) for trip in trips)
+        baseline = sum(route_length([0] + trip + [0], matrix) for trip in greedy)
+        self.assertLessEqual(optimized, baseline + 1e-6)
+
+    def test_routes_endpoint(self):
+        api = APIClient()
+        api.force_authenticate(self.create_admin())
+        agent = self.create_agent(current_latitude='6.130000', current_longitude='1.220000')
+        for index in range(4):
+            client = self.create_client(index, latitude=f'{6.13 + index * 0.01:.6f}', longitude='1.220000')
+            Commande.objects.create(client=client, qt_commandee=30, agent_assigne=agent)
+
+        response = api.get(reverse('cartography-routes'), {'capacity': 60})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        plan = response.data['data'][0]
+        self.assertEqual(plan['agent_id'], str(agent.id))
+        self.assertEqual(len(plan['trips']), 2)
+        self.assertTrue(all(trip['load'] <= 60 for trip in plan['trips']))
+
+
+class ResponseCacheTests(LogisticsTestMixin, TestCase):
+    """Cached GETs are evicted only by changes to the models they are tagged with."""
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.create_admin())
+
+    def get(self, url):
+        response = self.api.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_hit_miss_and_tag_eviction(self):
+        Tricycle.objects.create(code='TR-100')
+        url = reverse('tricycle-list')
+        self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['count'], 1)
+
+        # Other models leave the entry alone
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_client()
+        self.assertEqual(self.get(url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tricycle.objects.create(code='TR-101')
+        response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_key_includes_params_and_only_listed_actions(self):
+        self.create_agent()
+        url = reverse('agentcommercial-active')
+        self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.get(url + '?search=x')['X-Cache'], 'MISS')
+        self.assertEqual(self.get(url)['X-Cache'], 'HIT')
+        self.assertNotIn('X-Cache', self.get(reverse('agentcommercial-list')))
+
+    def test_stats_endpoint(self):
+        url = reverse('tricycle-list')
+        self.get(url)
+        self.get(url)
+        stats = self.get(reverse('cache-stats')).data['data']['logistics.views.TricycleViewSet']
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+
+class ConditionalGetTests(LogisticsTestMixin, TestCase):
+    """Unchanged lists and objects are answered with 304 before serialization."""
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.create_admin())
+        self.livraison = self.create_livraison(self.create_agent(), self.create_client())
+
+    def test_list_fingerprint(self):
+        url = reverse('livraison-list')
+        response = self.api.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            response = self.api.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        # Other query strings and modified rows get a new tag
+        self.assertNotEqual(self.api.get(url, {'fields': 'id'})['ETag'], etag)
+        self.livraison.statut = Livraison.Status.EN_ROUTE
+        self.livraison.save()
+        response = self.api.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_ignores_if_modified_since(self):
+        url = reverse('livraison-list')
+        other = self.create_livraison(self.livraison.agent, self.livraison.client)
+        last_modified = self.api.get(url)['Last-Modified']
+        # A delete leaves MAX(updated_at) as it was
+        other.delete()
+        response = self.api.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(other.pk, [row['id'] for row in response.data['results']])
+
+    def test_detail_validators(self):
+        url = reverse('livraison-detail', args=[self.livraison.pk])
+        response = self.api.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.api.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(
+            self.api.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_cached_responses_keep_validators(self):
+        url = reverse('tricycle-list')
+        etag = self.api.get(url)['ETag']
+        response = self.api.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+
+class BulkOnboardingTests(LogisticsTestMixin, TestCase):
+    """Agents and clients are created in bulk, with per-row errors."""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.create_admin())
+
+    def test_client_import_reports_rows(self):
+        self.create_client(0)
+        records = [
+            {'nom_point_vente': 'Boutique A', 'responsable': 'Ama', 'telephone': '+22890000001', 'adresse': 'Lomé'},
+            {'nom_point_vente': 'Boutique B', 'responsable': 'Kofi', 'telephone': '+22890000002'},  # No address
+            {'nom_point_vente': 'Boutique C', 'responsable': 'Yao', 'telephone': '+22890000003', 'adresse': 'Lomé',
+             'email': 'client0@essivi.com', 'type_client': 'entreprise'},
+            {'nom_point_vente': 'Boutique D', 'responsable': 'Esi', 'telephone': '+22890000004', 'adresse': 'Lomé',
+             'email': 'shop.d@essivi.com', 'type_client': 'entreprise'},
+        ]
+        get_zone_index()
+        # Existing emails, then one insert per model for the whole chunk
+        with self.assertNumQueries(6):
+            result = import_records('clients', records, password='Welcome123')
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([error['row'] for error in result['errors']], [2, 3])
+        self.assertIn('adresse', result['errors'][0]['errors'])
+
+        client = Client.objects.select_related('user__profile').get(nom_point_vente='Boutique D')
+        self.assertEqual(client.type_client, 'entreprise')
+        self.assertEqual((client.user.email, client.user.user_type), ('shop.d@essivi.com', 'client'))
+        self.assertTrue(client.user.check_password('Welcome123'))
+        self.assertTrue(client.user.profile.client_code.startswith('CLIENT-'))
+        self.assertFalse(EmailVerification.objects.filter(user=client.user).exists())
+
+    def test_emails_are_compared_case_insensitively(self):
+        User.objects.create_user(
+            email='Taken@Essivi.com', password='SecurePass123', user_type='client', first_name='A', last_name='B'
+        )
+        records = [
+            {'nom_point_vente': f'Boutique {letter}', 'responsable': 'Ama', 'telephone': '+22890000001',
+             'adresse': 'Lomé', 'email': email}
+            for letter, email in zip('ABC', ['taken@essivi.com', 'New@Essivi.COM', 'new@essivi.com'])
+        ]
+        result = import_records('clients', records)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([error['row'] for error in result['errors']], [1, 3])
+        self.assertEqual(Client.objects.get(nom_point_vente='Boutique B').user.email, 'new@essivi.com')
+
+    def test_agent_csv_upload(self):
+        upload = SimpleUploadedFile('agents.csv', (
+            'nom,prenom,telephone,statut\n'
+            'Mensah,Kossi,+22890000010,actif\n'
+            'Mensah,,+22890000011,actif\n'
+        ).encode())
+        response = self.api.post(reverse('agentcommercial-bulk-import'), {'file': upload, 'verified': 'false'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['created'], 1)
+        self.assertEqual(response.data['data']['errors'][0]['row'], 2)
+
+        agent = AgentCommercial.objects.select_related('user__profile').get(prenom='Kossi')
+        self.assertTrue(agent.user.email.endswith('@agent.essivivi.com'))
+        self.assertFalse(agent.user.is_verified)
+        self.assertTrue(agent.user.profile.agent_id.startswith('AGENT-'))
+        self.assertEqual(OutboundEmail.objects.filter(to=[agent.user.email]).count(), 1)
+
+    def test_unreadable_upload_is_rejected(self):
+        oversized = ('nom,prenom\n"' + 'x' * 200000 + '",Kossi\n').encode()
+        for content in (oversized, b'nom,prenom\n\xff\xfe,Kossi\n'):
+            response = self.api.post(
+                reverse('agentcommercial-bulk-import'), {'file': SimpleUploadedFile('agents.csv', content)}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+            with tempfile.NamedTemporaryFile(suffix='.csv') as upload:
+                upload.write(content)
+                upload.flush()
+                with self.assertRaises(CommandError):
+                    call_command('import_onboarding', 'agents', upload.name)
+        self.assertFalse(AgentCommercial.objects.exists())
+
+
+class CommandeBatchTests(LogisticsTestMixin, TestCase):
+    """Batches of orders are validated together and inserted at once."""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.create_admin())
+        self.agent = self.create_agent()
+        self.shops = [self.create_client(index) for index in range(3)]
+
+    @override_settings(AUDIT_METHODS=())
+    def test_batch_reports_each_order(self):
+        orders = [
+            {'client': str(shop.pk), 'qt_commandee': 10 + index, 'montant': '5000', 'agent_assigne': str(self.agent.pk)}
+            for index, shop in enumerate(self.shops)
+        ] + [
+            {'client': str(uuid.uuid4()), 'qt_commandee': 5},
+            {'client': str(self.shops[0].pk), 'qt_commandee': -1},
+        ]
+        # All clients, all agents, then one INSERT in a savepoint
+        with self.assertNumQueries(5):
+            response = self.api.post(reverse('commande-batch'), orders, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['data']
+        self.assertEqual([result['status'] for result in results], ['created'] * 3 + ['error'] * 2)
+        self.assertIn('client', results[3]['errors'])
+        self.assertIn('qt_commandee', results[4]['errors'])
+
+        commande = Commande.objects.get(pk=results[1]['id'])
+        self.assertEqual((commande.client, commande.qt_commandee), (self.shops[1], 11))
+        self.assertEqual(commande.agent_assigne, self.agent)
+
+    def test_batch_size_is_limited(self):
+        response = self.api.post(
+            reverse('commande-batch'), {'orders': [{'client': str(self.shops[0].pk), 'qt_commandee': 1}] * 501},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Commande.objects.exists())
+
+
+class DispatchTests(LogisticsTestMixin, TestCase):
+    """Pending orders go to the cheapest agent that can still carry them."""
+
+    def setUp(self):
+        self.near = self.create_agent(0, current_latitude='6.130000', current_longitude='1.220000', zone_assigned='Z1')
+        self.far = self.create_agent(1, current_latitude='6.160000', current_longitude='1.220000', zone_assigned='Z2')
+        inactive = self.create_agent(2, current_latitude='6.130000', current_longitude='1.220000')
+        AgentCommercial.objects.filter(pk=inactive.pk).update(statut=AgentCommercial.Status.INACTIF)
+        self.shop = self.create_client(0)
+        self.remote = self.create_client(1, latitude='7.500000', longitude='1.220000')
+
+    def order(self, client, quantity):
+        return Commande.objects.create(client=client, qt_commandee=quantity)
+
+    @override_settings(TRICYCLE_CAPACITY=100)
+    def test_capacity_and_range(self):
+        first, second = self.order(self.shop, 60), self.order(self.shop, 60)
+        out_of_range = self.order(self.remote, 10)
+        self.order(self.shop, 150)  # Larger than any tricycle
+
+        result = dispatch_pending_orders()
+        owners = dict(Commande.objects.values_list('pk', 'agent_assigne'))
+        self.assertEqual(owners[first.pk], self.near.pk)
+        # The nearest agent is full: the next one takes the second order
+        self.assertEqual(owners[second.pk], self.far.pk)
+        self.assertEqual(Commande.objects.get(pk=first.pk).statut, Commande.Status.EN_COURS)
+        self.assertEqual(
+            sorted(order['reason'] for order in result['unassigned']), ['no_agent_in_range', 'no_capacity']
+        )
+        self.assertIsNone(owners[out_of_range.pk])
+
+    def test_assignment_is_batched(self):
+        orders = [self.order(self.shop, 10) for _ in range(3)]
+        with mock.patch.object(connection.ops, 'bulk_batch_size', return_value=2), \
+                CaptureQueriesContext(connection) as ctx:
+            result = dispatch_pending_orders()
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "logistics_commande"')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(len(result['assigned']), 3)
+        self.assertFalse(Commande.objects.filter(pk__in=[order.pk for order in orders], agent_assigne=None).exists())
+
+    def test_zone_and_dry_run(self):
+        Client.objects.filter(pk=self.shop.pk).update(zone='Z2', latitude='6.140000')
+        order = self.order(Client.objects.get(pk=self.shop.pk), 10)
+        # 1.1 km to the Z1 agent plus the out-of-zone penalty costs more than 2.2 km in zone
+        result = dispatch_pending_orders(dry_run=True)
+        self.assertEqual(result['assigned'][0]['agent_id'], str(self.far.pk))
+        self.assertIsNone(Commande.objects.get(pk=order.pk).agent_assigne)
+
+        api = APIClient()
+        api.force_authenticate(self.create_admin())
+        response = api.post(reverse('commande-auto-dispatch'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Commande.objects.get(pk=order.pk).agent_assigne, self.far)
+
+
+@override_settings(AUDIT_BUFFER_SIZE=2, AUDIT_FLUSH_INTERVAL=3600)
+class AuditLogTests(LogisticsTestMixin, TestCase):
+    """Write requests are logged in batches; old months move to archives."""
+
+    def setUp(self):
+        # Drop entries queued by the requests of other tests
+        audit_buffer.entries = []
+        self.admin = self.create_admin()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def test_entries_are_buffered_until_the_batch_is_full(self):
+        started = timezone.now()
+        self.api.post(reverse('commande-auto-dispatch'))
+        self.api.get(reverse('commande-list'))
+        self.assertFalse(LogActivite.objects.exists())
+
+        self.api.post(reverse('commande-auto-dispatch'))
+        entries = list(LogActivite.objects.order_by('timestamp'))
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].user, self.admin)
+        self.assertEqual(entries[0].action, 'POST commande-auto-dispatch')
+        self.assertEqual(entries[0].details['status'], status.HTTP_200_OK)
+        self.assertLess(entries[0].timestamp, entries[1].timestamp)
+        self.assertGreaterEqual(entries[0].timestamp, started)
+
+    def test_flush_errors_are_logged(self):
+        audit_buffer.add(LogActivite(user_id=self.admin.pk, action='POST a'))
+        user_model = mock.Mock()
+        user_model.objects.filter.side_effect = OperationalError('no such table: accounts_user')
+        with mock.patch('logistics.audit.get_user_model', return_value=user_model), \
+                self.assertLogs('logistics.audit', 'ERROR'):
+            self.assertEqual(audit_buffer.flush(), 0)
+        self.assertFalse(LogActivite.objects.exists())
+
+    def test_archive_moves_old_months_to_jsonl(self):
+        def at(month, day):
+            return datetime(2026, month, day, 12, tzinfo=dt_timezone.utc)
+
+        LogActivite.objects.bulk_create([
+            LogActivite(user=self.admin, action='POST a', timestamp=at(7, 3)),
+            LogActivite(action='POST b', timestamp=at(7, 20)),
+            LogActivite(action='POST c', timestamp=at(9, 1)),
+            LogActivite(action='POST d', timestamp=at(10, 2)),
+        ])
+        with tempfile.TemporaryDirectory() as directory:
+            archived = archive_logs(keep_months=2, directory=directory, chunk_size=1, now=at(10, 15))
+            self.assertEqual(archived, {'2026-07': 2})
+            with gzip.open(Path(directory) / 'logactivite-2026-07.jsonl.gz', 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['action'] for row in rows], ['POST a', 'POST b'])
+        self.assertEqual(rows[0]['user_id'], str(self.admin.pk))
+        self.assertEqual(sorted(LogActivite.objects.values_list('action', flat=True)), ['POST c', 'POST d'])
+
+
+class AuditLogSearchTests(LogisticsTestMixin, TestCase):
+    """The audit log is filtered by user, action, IP, time range and details."""
+
+    def setUp(self):
+        self.admin = self.create_admin()
+        self.agent = self.create_agent()
+        LogActivite.objects.bulk_create([
+            LogActivite(user=self.admin, action='POST commande-batch', ip_address='10.0.0.1',
+                        details={'path': '/api/logistics/commandes/batch/', 'status': 207},
+                        timestamp=datetime(2026, 9, 1, tzinfo=dt_timezone.utc)),
+            LogActivite(user=self.agent.user, action='POST agentcommercial-locations-batch', ip_address='10.0.0.2',
+                        details={'path': '/api/logistics/agents/locations/', 'status': 201},
+                        timestamp=datetime(2026, 9, 2, tzinfo=dt_timezone.utc)),
+            LogActivite(user=self.admin, action='DELETE commande-detail', ip_address='10.0.0.1',
+                        details={'path': '/api/logistics/commandes/1/', 'status': 404},
+                        timestamp=datetime(2026, 9, 3, tzinfo=dt_timezone.utc)),
+        ])
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def actions(self, **params):
+        response = self.api.get(reverse('logactivite-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [entry['action'] for entry in response.data['results']]
+
+    def test_admins_only(self):
+        api = APIClient()
+        api.force_authenticate(self.agent.user)
+        self.assertEqual(api.get(reverse('logactivite-list')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_filters(self):
+        self.assertEqual(self.actions(user=self.admin.pk), ['DELETE commande-detail', 'POST commande-batch'])
+        self.assertEqual(self.actions(action='POST commande-batch'), ['POST commande-batch'])
+        self.assertEqual(self.actions(action_prefix='DELETE'), ['DELETE commande-detail'])
+        self.assertEqual(self.actions(ip_address='10.0.0.2'), ['POST agentcommercial-locations-batch'])
+        self.assertEqual(
+            self.actions(since='2026-09-02T00:00:00Z', until='2026-09-03T00:00:00Z'),
+            ['POST agentcommercial-locations-batch'],
+        )
+        self.assertEqual(self.actions(status_code='404', cursor=''), ['DELETE commande-detail'])
+        self.assertEqual(self.actions(path='/api/logistics/commandes/batch/'), ['POST commande-batch'])
+        self.assertEqual(self.actions(details='{"status": 201}'), ['POST agentcommercial-locations-batch'])
+
+    def test_invalid_details_is_rejected(self):
+        response = self.api.get(reverse('logactivite-list'), {'details': '{status'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(IMAGE_MAX_DIMENSION=400, IMAGE_PREVIEW_SIZE=200, IMAGE_THUMBNAIL_SIZE=50)
+class ImagePipelineTests(LogisticsTestMixin, TestCase):
+    """Uploads are queued, then re-encoded without EXIF and given variants by the worker."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.agent = self.create_agent()
+        self.shop = self.create_client()
+
+    def upload(self, name, size, mode='RGB', fmt='JPEG', **save_options):
+        buffer = io.BytesIO()
+        Image.new(mode, size).save(buffer, fmt, **save_options)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def test_upload_is_processed_off_the_request(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotated 90 degrees
+        exif[0x010F] = 'PhoneMaker'
+        livraison = self.create_livraison(
+            self.agent, self.shop, photo_preuve=self.upload('photo.jpg', (800, 600), exif=exif),
+            signature_url=self.upload('signature.png', (300, 100), mode='RGBA', fmt='PNG'),
+        )
+        upload = livraison.photo_preuve.name
+        self.assertEqual(ImageJob.objects.filter(livraison=livraison, status=ImageJob.Status.PENDING).count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_image_jobs(), (2, 0))
+        livraison.refresh_from_db()
+        self.assertFalse(livraison.photo_preuve.storage.exists(upload))
+        with Image.open(livraison.photo_preuve) as image:
+            # Upright, bounded and without EXIF
+            self.assertEqual(image.size, (300, 400))
+            self.assertFalse(image.getexif())
+        with Image.open(livraison.photo_preuve.storage.open(livraison.photo_preuve_variants['thumbnail'])) as image:
+            self.assertEqual(max(image.size), 50)
+        with Image.open(livraison.signature_url) as image:
+            self.assertEqual((image.format, image.mode), ('PNG', 'RGBA'))
+
+        api = APIClient()
+        api.force_authenticate(self.create_admin())
+        data = api.get(reverse('livraison-detail', args=[livraison.pk])).data
+        self.assertTrue(data['photo_preuve_variants']['thumbnail'].endswith(livraison.photo_preuve_variants['thumbnail']))
+        self.assertIn('preview', data['signature_variants'])
+
+        # Saving the delivery again does not queue the processed images
+        livraison.save()
+        self.assertFalse(ImageJob.objects.filter(status=ImageJob.Status.PENDING).exists())
+
+    def test_undecodable_upload_fails_without_retry(self):
+        livraison = self.create_livraison(
+            self.agent, self.shop, photo_preuve=SimpleUploadedFile('photo.jpg', b'not an image'),
+        )
+        self.assertEqual(process_image_jobs(), (0, 1))
+        self.assertEqual(ImageJob.objects.get().status, ImageJob.Status.FAILED)
+        self.assertIsNone(LivraisonSerializer(livraison).data['photo_preuve_variants'])
+
+    @override_settings(IMAGE_JOB_MAX_ATTEMPTS=2, IMAGE_JOB_RETRY_DELAY=30)
+    def test_storage_error_is_retried_then_given_up(self):
+        self.create_livraison(self.agent, self.shop, photo_preuve=self.upload('photo.jpg', (80, 60)))
+        with mock.patch('logistics.images.render_variants', side_effect=OSError('disk full')):
+            self.assertEqual(process_image_jobs(), (0, 1))
+            job = ImageJob.objects.get()
+            self.assertEqual((job.status, job.attempts, job.last_error), (ImageJob.Status.PENDING, 1, 'disk full'))
+            self.assertGreater(job.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+            ImageJob.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(process_image_jobs(), (0, 1))
+            self.assertEqual(ImageJob.objects.get().status, ImageJob.Status.FAILED)
+
+
+class ResumableUploadTests(LogisticsTestMixin, TestCase):
+    """Delivery images are uploaded in checked chunks, resumed at the server's offset."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=self.media.name, UPLOAD_SESSION_DIR=Path(self.media.name) / 'parts',
+        ))
+        self.agent = self.create_agent()
+        self.livraison = self.create_livraison(self.agent, self.create_client())
+        self.api = APIClient()
+        self.api.force_authenticate(self.agent.user)
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64)).save(buffer, 'JPEG')
+        self.content = buffer.getvalue()
+
+    def start(self, **extra):
+        response = self.api.post(reverse('livraison-start-upload', args=[self.livraison.pk]), {
+            'field': 'photo_preuve', 'filename': 'proof.jpg', 'size': len(self.content), **extra,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return reverse('uploadsession-detail', args=[response.data['data']['id']])
+
+    def put(self, url, offset, chunk, checksum=None):
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum is not None:
+            headers['HTTP_UPLOAD_CHECKSUM'] = checksum
+        return self.api.put(url, chunk, content_type='application/octet-stream', **headers)
+
+    def test_chunks_are_checked_resumed_and_attached(self):
+        url = self.start(sha256=hashlib.sha256(self.content).hexdigest())
+        first, rest = self.content[:300], self.content[300:]
+
+        response = self.put(url, 0, first, hashlib.sha256(first).hexdigest())
+        self.assertEqual(response.data['data']['received'], 300)
+        # The same chunk again, as after a lost response
+        response = self.put(url, 0, first)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['data']['offset'], 300)
+        response = self.put(url, 300, rest, hashlib.sha256(b'corrupted').hexdigest())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.api.get(url).data['received'], 300)
+
+        self.put(url, 300, rest)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post(url + 'finalize/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.livraison.refresh_from_db()
+        self.assertEqual(self.livraison.photo_preuve.read(), self.content)
+        self.assertTrue(ImageJob.objects.filter(livraison=self.livraison, field='photo_preuve').exists())
+        self.assertEqual(list((Path(self.media.name) / 'parts').iterdir()), [])
+        self.assertEqual(self.api.post(url + 'finalize/').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_corrupted_file_restarts_and_sessions_are_private(self):
+        url = self.start(sha256='0' * 64)
+        self.put(url, 0, self.content)
+        response = self.api.post(url + 'finalize/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get().received, 0)
+        self.assertFalse(Livraison.objects.get(pk=self.livraison.pk).photo_preuve)
+
+        other = APIClient()
+        other.force_authenticate(self.create_admin())
+        self.assertEqual(other.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_only_images_from_the_delivery_agent_are_accepted(self):
+        start_url = reverse('livraison-start-upload', args=[self.livraison.pk])
+        for filename in ('proof.html', 'proof.svg'):
+            response = self.api.post(start_url, {'field': 'photo_preuve', 'filename': filename, 'size': 10}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # An image extension is not enough: the content is checked on finalize
+        self.content = b'<script>alert(1)</script>'
+        url = self.start()
+        self.put(url, 0, self.content)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post(url + 'finalize/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(Livraison.objects.get(pk=self.livraison.pk).photo_preuve)
+        self.assertEqual(list((Path(self.media.name) / 'parts').iterdir()), [])
+
+        other = APIClient()
+        other.force_authenticate(self.create_agent(1).user)
+        response = other.post(start_url, {'field': 'photo_preuve', 'filename': 'proof.jpg', 'size': 10}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProofMediaTests(LogisticsTestMixin, TestCase):
+    """Proof images are served to the delivery's users with cache, conditional and range support."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.agent = self.create_agent()
+        self.content = bytes(range(256)) * 4
+        self.livraison = self.create_livraison(
+            self.agent, self.create_client(), photo_preuve=SimpleUploadedFile('proof.jpg', self.content),
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.agent.user)
+        self.url = self.api.get(reverse('livraison-detail', args=[self.livraison.pk])).data['photo_preuve']
+
+    def test_cached_conditional_and_ranged_responses(self):
+        response = self.api.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.api.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        response = self.api.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-4:])
+        response = self.api.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        # A stale If-Range gets the whole file
+        response = self.api.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_access_is_checked_before_handing_off(self):
+        other = APIClient()
+        other.force_authenticate(self.create_agent(1).user)
+        self.assertEqual(other.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        unknown = reverse('livraison-media', kwargs={'pk': self.livraison.pk, 'name': 'signatures/other.png'})
+        self.assertEqual(self.api.get(unknown).status_code, status.HTTP_404_NOT_FOUND)
+
+        with override_settings(MEDIA_SERVE_MODE='x-accel-redirect'):
+            response = self.api.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.livraison.photo_preuve.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_names_are_unique_and_other_types_are_attachments(self):
+        # The same upload name never maps to the same stored name
+        second = self.create_livraison(
+            self.agent, self.livraison.client, photo_preuve=SimpleUploadedFile('proof.jpg', self.content),
+            signature_url=SimpleUploadedFile('sign.svg', b'<svg onload="alert(1)"/>'),
+        )
+        self.assertRegex(second.photo_preuve.name, r'^preuves_livraison/\d{4}/\d{2}/proof_[0-9a-f]{12}\.jpg$')
+        self.assertNotEqual(second.photo_preuve.name, self.livraison.photo_preuve.name)
+
+        url = self.api.get(reverse('livraison-detail', args=[second.pk])).data['signature_url']
+        response = self.api.get(url)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment;'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
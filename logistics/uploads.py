@@ -0,0 +1,201 @@
+"""
+Resumable uploads of delivery photos and signatures.
+
+Over a flaky link a multipart POST that fails restarts from zero. Instead
+the app opens an UploadSession with the file's size (and SHA-256), sends
+the file as chunks, each PUT at the offset the server reports, and
+finalizes the session:
+
+- a chunk is streamed to a spooled temporary file while its digest is
+  computed, and only appended to the session's .part file in
+  UPLOAD_SESSION_DIR if it is complete and matches its checksum; the row
+  lock is only held for that append;
+- a chunk sent at another offset than ``received`` is refused with the
+  current offset, so a client that lost a response resumes from there;
+- the file name must have an image extension, and finalize checks the
+  size, the digest and that Pillow can read the file, then attaches it to
+  the delivery in one transaction (which also queues it for the image
+  pipeline) and removes the .part file once committed.
+
+Sessions left open for UPLOAD_SESSION_TTL seconds are dropped by
+`purge_upload_sessions`.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.validators import validate_image_file_extension
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .images import IMAGE_FIELDS
+from .models import Livraison, UploadSession
+
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """A request the upload session cannot accept."""
+    status_code = 400
+
+
+class OffsetMismatch(UploadError):
+    """The chunk does not start where the stored data ends."""
+    status_code = 409
+
+    def __init__(self, offset):
+        super().__init__(f'Expected offset {offset}')
+        self.offset = offset
+
+
+def upload_dir():
+    return Path(getattr(settings, 'UPLOAD_SESSION_DIR', settings.BASE_DIR / 'uploads'))
+
+
+def part_path(session):
+    return upload_dir() / f'{session.pk}.part'
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_image(path):
+    """Whether Pillow recognises the file as an image, as ImageField does for multipart uploads."""
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception:
+        # Pillow raises a variety of errors on invalid or truncated data
+        return False
+    return True
+
+
+def start_session(livraison, field, filename, size, user, sha256=''):
+    if field not in IMAGE_FIELDS:
+        raise UploadError(f'Unknown image field: {field}')
+    if size > getattr(settings, 'UPLOAD_MAX_SIZE', 20 * 1024 * 1024):
+        raise UploadError('File too large')
+    try:
+        validate_image_file_extension(File(None, name=filename))
+    except ValidationError as e:
+        raise UploadError(e.messages[0])
+    session = UploadSession.objects.create(
+        livraison=livraison, field=field, filename=os.path.basename(filename), size=size,
+        sha256=sha256.lower(), created_by_id=user.pk,
+    )
+    upload_dir().mkdir(parents=True, exist_ok=True)
+    part_path(session).touch()
+    return session
+
+
+def receive_chunk(session, offset, stream, length, checksum=''):
+    """
+    Append ``length`` bytes read from ``stream`` at ``offset``.
+    ``checksum`` is the chunk's hex SHA-256, if the client sent one.
+    Returns the updated session.
+    """
+    if length > getattr(settings, 'UPLOAD_CHUNK_MAX_SIZE', 4 * 1024 * 1024):
+        raise UploadError('Chunk too large')
+    if offset + length > session.size:
+        raise UploadError('Chunk goes past the end of the file')
+
+    digest = hashlib.sha256()
+    # Small chunks stay in memory, larger ones go to disk
+    with tempfile.SpooledTemporaryFile(max_size=BLOCK_SIZE * 4) as spool:
+        remaining = length
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                raise UploadError('Incomplete chunk')
+            digest.update(block)
+            spool.write(block)
+            remaining -= len(block)
+        if checksum and digest.hexdigest() != checksum.lower():
+            raise UploadError('Chunk checksum mismatch')
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if session.status != UploadSession.Status.OPEN:
+                raise UploadError('Upload already finalized')
+            if offset != session.received:
+                raise OffsetMismatch(session.received)
+            spool.seek(0)
+            with open(part_path(session), 'r+b') as part:
+                # Drop whatever a failed write may have left past the stored data
+                part.seek(offset)
+                shutil.copyfileobj(spool, part, BLOCK_SIZE)
+                part.truncate()
+            session.received += length
+            session.save(update_fields=['received', 'updated_at'])
+    return session
+
+
+def finalize_session(session):
+    """Attach the uploaded file to the delivery. Returns the delivery."""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != UploadSession.Status.OPEN:
+            raise UploadError('Upload already finalized')
+        if session.received != session.size:
+            raise OffsetMismatch(session.received)
+        path = part_path(session)
+        corrupted = session.sha256 and file_digest(path) != session.sha256
+        rejected = not corrupted and not is_image(path)
+        if corrupted:
+            # The stored data is unusable: the client starts over
+            with open(path, 'r+b') as part:
+                part.truncate(0)
+            session.received = 0
+            session.save(update_fields=['received', 'updated_at'])
+        elif rejected:
+            # Sending the same file again would not help
+            session.delete()
+            transaction.on_commit(lambda: remove_file(path))
+        else:
+            livraison = Livraison.objects.select_for_update().get(pk=session.livraison_id)
+            with open(path, 'rb') as f:
+                getattr(livraison, session.field).save(session.filename, File(f), save=False)
+            livraison.save(update_fields=[session.field, 'updated_at'])
+            session.status = UploadSession.Status.COMPLETE
+            session.save(update_fields=['status', 'updated_at'])
+            transaction.on_commit(lambda: remove_file(path))
+    if corrupted:
+        raise UploadError('File checksum mismatch, upload restarted')
+    if rejected:
+        raise UploadError('Upload a valid image. The file you uploaded was either not an image or a corrupted image.')
+    return livraison
+
+
+def abort_session(session):
+    path = part_path(session)
+    session.delete()
+    remove_file(path)
+
+
+def purge_upload_sessions(now=None):
+    """Delete the sessions idle for UPLOAD_SESSION_TTL seconds and their data. Returns how many."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'UPLOAD_SESSION_TTL', 24 * 3600))
+    sessions = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    for session in sessions:
+        abort_session(session)
+    return len(sessions)
@@ -2,8 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     AgentCommercialViewSet, ClientViewSet, CommandeViewSet,
-    LivraisonViewSet, LogActiviteViewSet, TricycleViewSet
+    LivraisonViewSet, LogActiviteViewSet, TricycleViewSet, UploadSessionViewSet, CacheStatsView
 )
+from .media_views import ProofMediaView
 from .cartography_views import (
     DeliveryMarkersView, AgentPositionsView, ServiceZonesView,
     HeatmapDataView, OptimizedRoutesView, ZoneListView,
@@ -17,6 +18,7 @@ router.register(r'clients', ClientViewSet)
 router.register(r'commandes', CommandeViewSet)
 router.register(r'orders', CommandeViewSet, basename='orders')
 router.register(r'livraisons', LivraisonViewSet)
+router.register(r'uploads', UploadSessionViewSet)
 router.register(r'logs', LogActiviteViewSet)
 
 # Cartography/Map endpoints (different namespace to avoid conflicts)
@@ -32,5 +34,7 @@ cartography_patterns = [
 ]
 
 urlpatterns = [
+    path('livraisons/<uuid:pk>/media/<path:name>', ProofMediaView.as_view(), name='livraison-media'),
     path('', include(router.urls)),
+    path('cache/stats', CacheStatsView.as_view(), name='cache-stats'),
 ] + cartography_patterns
@@ -1,12 +1,26 @@
-from rest_framework import viewsets, permissions, status, filters
+from rest_framework import viewsets, mixins, permissions, status, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
+from django.conf import settings
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
-from .models import AgentCommercial, Client, Commande, Livraison, LogActivite, Tricycle
+from accounts.mixins import EagerLoadingMixin
+from accounts.permissions import IsAdminUser
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.views import APIView
+from .caching import TaggedCacheMixin, cache_stats
+from .conditional import ConditionalGetMixin
+from .filters import LogActiviteFilter
+from .pagination import KeysetPagination
+from .models import AgentCommercial, AgentLocationLog, Client, Commande, Livraison, LogActivite, Tricycle, UploadSession
+from .dispatch import dispatch_pending_orders
+from .onboarding import import_records, parse_records
+from .uploads import OffsetMismatch, UploadError, abort_session, finalize_session, receive_chunk, start_session
 from .serializers import (
     AgentCommercialSerializer, ClientSerializer, CommandeSerializer,
-    LivraisonSerializer, DashboardStatsSerializer, LogActiviteSerializer, TricycleSerializer
+    LivraisonSerializer, DashboardStatsSerializer, LogActiviteSerializer, TricycleSerializer,
+    LocationBatchSerializer, CommandeBatchSerializer, CommandeBatchItemSerializer, UploadSessionSerializer
 )
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -15,8 +29,44 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             return True
         return request.user and request.user.user_type == 'admin'
 
-class AgentCommercialViewSet(viewsets.ModelViewSet):
+class BulkImportMixin:
+    """
+    POST <list>/bulk-import/ creates many accounts at once (see logistics.onboarding).
+    Takes a JSON list of records (or {"records": [...]}) or a CSV/JSON upload
+    in ``file``, plus optional ``password`` and ``verified``.
+    """
+    onboarding_kind = None
+
+    @action(detail=False, methods=['post'], url_path='bulk-import',
+            permission_classes=[permissions.IsAuthenticated, IsAdminUser])
+    def bulk_import(self, request):
+        options = request.data if hasattr(request.data, 'get') else {}
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+                records = parse_records(upload.read(), fmt)
+            else:
+                records = options.get('records') if options else request.data
+                if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+                    raise ValueError('Expected a list of records')
+        except ValueError as e:
+            return Response({'status': 'error', 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        verified = str(options.get('verified', 'true')).lower() not in ('false', '0')
+        result = import_records(self.onboarding_kind, records, password=options.get('password'), verified=verified)
+        return Response({
+            'status': 'success' if result['created'] else 'error',
+            'message': f"{result['created']} created, {len(result['errors'])} rejected",
+            'data': result,
+        }, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST)
+
+class AgentCommercialViewSet(BulkImportMixin, TaggedCacheMixin, ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = AgentCommercial.objects.all()
+    onboarding_kind = 'agents'
+    conditional_related_tags = ('Tricycle',)
+    cache_tags = ('AgentCommercial',)
+    cache_actions = ('active',)
     serializer_class = AgentCommercialSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
@@ -61,8 +111,26 @@ class AgentCommercialViewSet(viewsets.ModelViewSet):
         ]
         return Response(data)
 
-class ClientViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='locations/batch', serializer_class=LocationBatchSerializer)
+    def locations_batch(self, request):
+        """Ingest buffered GPS fixes for the authenticated agent"""
+        try:
+            agent = request.user.agent_profile
+        except AgentCommercial.DoesNotExist:
+            return Response({'error': 'Only agents can upload locations'}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = LocationBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        logs, position_updated = AgentLocationLog.record_batch(agent, serializer.validated_data['fixes'])
+        return Response({
+            'status': 'success',
+            'received': len(logs),
+            'position_updated': position_updated,
+        }, status=status.HTTP_201_CREATED)
+
+class ClientViewSet(BulkImportMixin, ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all()
+    onboarding_kind = 'clients'
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
@@ -97,12 +165,61 @@ class ClientViewSet(viewsets.ModelViewSet):
             
         serializer.save(user=user)
 
-class CommandeViewSet(viewsets.ModelViewSet):
+class CommandeViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Commande.objects.all()
     serializer_class = CommandeSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['date_commande', 'statut']
+    ordering = ['-date_commande', '-id']
+    conditional_related_tags = ('Client', 'AgentCommercial', 'Tricycle')
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-date_commande', '-id')
+
+    @action(detail=False, methods=['post'], serializer_class=CommandeBatchSerializer)
+    def batch(self, request):
+        """Create many orders in one request; each order is reported separately"""
+        data = {'orders': request.data} if isinstance(request.data, list) else request.data
+        serializer = CommandeBatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        orders = serializer.validated_data['orders']
+
+        results = [None] * len(orders)
+        valid, positions = [], []
+        for index, order in enumerate(orders):
+            item = CommandeBatchItemSerializer(data=order)
+            if item.is_valid():
+                valid.append(item.validated_data)
+                positions.append(index)
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': item.errors}
+        for index, outcome in zip(positions, Commande.create_batch(valid)):
+            if isinstance(outcome, Commande):
+                results[index] = {'index': index, 'status': 'created', 'id': str(outcome.pk)}
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': outcome}
+
+        created = sum(result['status'] == 'created' for result in results)
+        if created == len(orders):
+            code = status.HTTP_201_CREATED
+        else:
+            code = status.HTTP_207_MULTI_STATUS if created else status.HTTP_400_BAD_REQUEST
+        return Response({
+            'status': 'success' if created else 'error',
+            'message': f"{created} of {len(orders)} orders created",
+            'data': results,
+        }, status=code)
+
+    @action(detail=False, methods=['post'], url_path='dispatch', permission_classes=[permissions.IsAuthenticated, IsAdminUser])
+    def auto_dispatch(self, request):
+        """Assign every pending order to the best available agent (?dry_run=true to preview)"""
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true')
+        result = dispatch_pending_orders(dry_run=dry_run)
+        return Response({
+            'status': 'success',
+            'message': f"{len(result['assigned'])} orders assigned, {len(result['unassigned'])} left pending",
+            'data': result,
+        })
 
     @action(detail=True, methods=['post'])
     def assign_agent(self, request, pk=None):
@@ -133,20 +250,45 @@ class CommandeViewSet(viewsets.ModelViewSet):
         commande.save()
         return Response(CommandeSerializer(commande).data)
 
-class LivraisonViewSet(viewsets.ModelViewSet):
-    queryset = Livraison.objects.all()
+class LivraisonViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
+    queryset = Livraison.objects.order_by('-date_heure', '-id')
     serializer_class = LivraisonSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-date_heure', '-id')
+    conditional_related_tags = ('Commande', 'Client', 'AgentCommercial', 'Tricycle')
 
     @action(detail=False, methods=['get'])
     def by_agent(self, request):
         agent_id = request.query_params.get('agent_id')
         if agent_id:
-            livraisons = self.queryset.filter(agent__id=agent_id)
+            livraisons = self.get_queryset().filter(agent__id=agent_id)
             serializer = self.get_serializer(livraisons, many=True)
             return Response(serializer.data)
         return Response({'error': 'agent_id required'}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'], url_path='uploads', serializer_class=UploadSessionSerializer)
+    def start_upload(self, request, pk=None):
+        """Open a resumable upload of the delivery's photo or signature (see UploadSessionViewSet)."""
+        livraison = self.get_object()
+        # The proof is the delivering agent's, as ProofMediaView's read access
+        if request.user.user_type != 'admin' and request.user.pk != livraison.agent.user_id:
+            raise PermissionDenied('Only the delivery agent or an admin can upload its proof.')
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = start_session(livraison, user=request.user, **serializer.validated_data)
+        except UploadError as e:
+            return upload_error_response(e)
+        return Response({
+            'status': 'success',
+            'message': 'Upload started',
+            'data': {
+                **self.get_serializer(session).data,
+                'chunk_size': getattr(settings, 'UPLOAD_CHUNK_SIZE', 256 * 1024),
+            }
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['patch'])
     def validate(self, request, pk=None):
         """Validate a delivery and mark as completed."""
@@ -166,15 +308,92 @@ class LivraisonViewSet(viewsets.ModelViewSet):
         })
 
 
-class LogActiviteViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = LogActivite.objects.all()
-    serializer_class = LogActiviteSerializer
+def upload_error_response(error):
+    data = {'status': 'error', 'message': str(error)}
+    if isinstance(error, OffsetMismatch):
+        # The client resumes from the offset the server holds
+        data['data'] = {'offset': error.offset}
+    return Response(data, status=error.status_code)
+
+
+class UploadSessionViewSet(mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads (see logistics.uploads), opened with
+    POST livraisons/<id>/uploads/ and only visible to their creator.
+
+    GET returns the session and the offset to resume from. PUT appends the
+    raw request body at the ``Upload-Offset`` header, optionally checked
+    against the ``Upload-Checksum`` header (hex SHA-256 of the chunk); a
+    wrong offset is answered with 409 and the expected one. POST finalize/
+    attaches the file to the delivery; DELETE abandons the upload.
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        return super().get_queryset().filter(created_by_id=self.request.user.pk)
+
+    def update(self, request, pk=None):
+        session = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response({
+                'status': 'error',
+                'message': 'Upload-Offset header and a non-empty body are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if offset < 0 or length <= 0:
+            return Response({'status': 'error', 'message': 'Invalid offset or empty chunk'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # The body is streamed from the request, never loaded as a whole
+            session = receive_chunk(session, offset, request.stream, length, request.headers.get('Upload-Checksum', ''))
+        except UploadError as e:
+            return upload_error_response(e)
+        return Response({'status': 'success', 'data': self.get_serializer(session).data})
 
-class TricycleViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        try:
+            livraison = finalize_session(self.get_object())
+        except UploadError as e:
+            return upload_error_response(e)
+        return Response({
+            'status': 'success',
+            'message': 'Upload complete',
+            'data': LivraisonSerializer(livraison, context=self.get_serializer_context()).data
+        })
+
+    def perform_destroy(self, instance):
+        abort_session(instance)
+
+
+class LogActiviteViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = LogActivite.objects.order_by('-timestamp', '-id')
+    serializer_class = LogActiviteSerializer
+    # Every user's IP addresses and actions: admins only
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = LogActiviteFilter
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-timestamp', '-id')
+    conditional_field = 'timestamp'
+
+
+class TricycleViewSet(TaggedCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Tricycle.objects.all()
+    cache_tags = ('Tricycle',)
     serializer_class = TricycleSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ['code', 'description']
+
+
+class CacheStatsView(APIView):
+    """Hit/miss counters of the tagged response cache."""
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response({'status': 'success', 'data': cache_stats()})